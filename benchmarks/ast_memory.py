@@ -0,0 +1,60 @@
+"""
+Benchmark for the memory used by the compiler on a big generated module.
+
+It reports the peak and retained memory (as measured by tracemalloc) of the
+import of the module (parsing, scope analysis and execution of the module
+body) and of its redshift, and how many AST nodes and Locs are alive at the
+end.
+
+Usage:
+    python -m benchmarks.ast_memory [NLINES]
+"""
+
+import sys
+import gc
+import time
+import tempfile
+import tracemalloc
+import py
+from spy import ast
+from spy.location import Loc
+from spy.vm.vm import SPyVM
+from benchmarks.parse_throughput import make_src
+
+def count_objects() -> tuple[int, int]:
+    nodes = locs = 0
+    for obj in gc.get_objects():
+        if isinstance(obj, ast.Node):
+            nodes += 1
+        elif isinstance(obj, Loc):
+            locs += 1
+    return nodes, locs
+
+def main(argv: list[str]) -> None:
+    nlines = int(argv[0]) if argv else 20_000
+    tmpdir = py.path.local(tempfile.mkdtemp())
+    tmpdir.join('big.spy').write(make_src(nlines))
+    vm = SPyVM()
+    vm.path.append(str(tmpdir))
+    tracemalloc.start()
+    a = time.perf_counter()
+    vm.import_('big')
+    b = time.perf_counter()
+    after_import, peak_import = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    vm.redshift()
+    c = time.perf_counter()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    nodes, locs = count_objects()
+    MB = 1024 * 1024
+    print(f'lines:         {nlines}')
+    print(f'import:        {b - a:.3f} s, peak {peak_import / MB:.1f} MB, '
+          f'retained {after_import / MB:.1f} MB')
+    print(f'redshift:      {c - b:.3f} s, peak {peak / MB:.1f} MB')
+    print(f'retained:      {current / MB:.1f} MB')
+    print(f'AST nodes:     {nodes}')
+    print(f'Locs:          {locs}')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
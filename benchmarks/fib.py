@@ -0,0 +1,70 @@
+"""
+Microbenchmark for call-heavy code: run a recursive fib() in interp mode.
+
+Usage:
+    python -m benchmarks.fib [N] [--no-ast-compile] [--redshift-threshold=K]
+                             [--python] [--bytecode]
+
+--python redshifts the module and runs it through spy.backend.python.
+--bytecode redshifts the module and runs it through spy.vm.bcinterp.
+"""
+
+import sys
+from typing import Optional
+import time
+import textwrap
+import tempfile
+import py
+from spy.vm.vm import SPyVM
+from spy.backend.python import PyBackend
+from spy.vm.bytecode import dump_module, load_module
+
+SRC = """
+def fib(n: i32) -> i32:
+    if n < 2:
+        return n
+    return fib(n-1) + fib(n-2)
+"""
+
+def run(n: int, ast_compile: bool,
+        redshift_threshold: Optional[int] = None,
+        python: bool = False, bytecode: bool = False) -> float:
+    tmpdir = py.path.local(tempfile.mkdtemp())
+    tmpdir.join('fib.spy').write(textwrap.dedent(SRC))
+    vm = SPyVM()
+    vm.ast_compile = ast_compile
+    vm.redshift_threshold = redshift_threshold
+    vm.path.append(str(tmpdir))
+    w_mod = vm.import_('fib')
+    if python:
+        vm.redshift()
+        PyBackend(vm).load_mod('fib')
+    elif bytecode:
+        vm.redshift()
+        data = dump_module(vm, 'fib')
+        vm = SPyVM()
+        w_mod = load_module(vm, data)
+    w_fib = w_mod.getattr('fib')
+    a = time.perf_counter()
+    w_res = vm.fast_call(w_fib, [vm.wrap(n)])
+    b = time.perf_counter()
+    print(f'fib({n}) = {vm.unwrap(w_res)}')
+    return b - a
+
+def main(argv: list[str]) -> None:
+    ast_compile = '--no-ast-compile' not in argv
+    redshift_threshold = None
+    for arg in argv:
+        if arg.startswith('--redshift-threshold='):
+            redshift_threshold = int(arg.split('=', 1)[1])
+    args = [arg for arg in argv if not arg.startswith('--')]
+    n = int(args[0]) if args else 20
+    python = '--python' in argv
+    bytecode = '--bytecode' in argv
+    t = run(n, ast_compile, redshift_threshold, python, bytecode)
+    print(f'ast_compile={ast_compile} '
+          f'redshift_threshold={redshift_threshold} '
+          f'python={python} bytecode={bytecode}: {t:.3f} s')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,70 @@
+"""
+Benchmark for the startup time of the `spy` command, for each action.
+
+For each action, it reports the wall-clock time of the whole command and the
+time spent in imports, as measured by `python -X importtime`.
+
+Usage:
+    python -m benchmarks.import_time [N]
+"""
+
+import sys
+import time
+import tempfile
+import subprocess
+import py
+import spy
+
+ACTIONS = [
+    ['--help'],
+    ['--pyparse'],
+    ['--parse'],
+    ['--symtable'],
+    ['--redshift'],
+    ['--cwrite'],
+    ['--execute'],
+]
+
+SRC = """
+def main() -> void:
+    print("hello world")
+"""
+
+def parse_importtime(stderr: str) -> tuple[int, float]:
+    """
+    Return the number of modules imported and the total import time
+    """
+    n = 0
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us = line.split('|')[0].split(':')[1]
+        total_us += int(self_us)
+        n += 1
+    return n, total_us / 1e6
+
+def run(argv: list[str]) -> tuple[float, int, float]:
+    env = {'PYTHONPATH': str(spy.ROOT.dirpath())}
+    cmd = [sys.executable, '-X', 'importtime', '-m', 'spy'] + argv
+    a = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    b = time.perf_counter()
+    n, t = parse_importtime(proc.stderr)
+    return b - a, n, t
+
+def main(argv: list[str]) -> None:
+    n = int(argv[0]) if argv else 3
+    tmpdir = py.path.local(tempfile.mkdtemp())
+    hello = tmpdir.join('hello.spy')
+    hello.write(SRC)
+    for action in ACTIONS:
+        args = action if action == ['--help'] else action + [str(hello)]
+        results = [run(args) for i in range(n)]
+        wall, nmods, t = min(results)
+        name = ' '.join(action)
+        print(f'{name:12s} wall: {wall:.3f} s   imports: {nmods:4d} '
+              f'modules, {t:.3f} s')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
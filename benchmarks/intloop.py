@@ -0,0 +1,47 @@
+"""
+Microbenchmark for integer-heavy code: run a tight i32 loop in interp mode.
+
+Usage:
+    python -m benchmarks.intloop [N] [--no-ast-compile]
+"""
+
+import sys
+import time
+import textwrap
+import tempfile
+import py
+from spy.vm.vm import SPyVM
+
+SRC = """
+def loop(n: i32) -> i32:
+    tot = 0
+    i = 0
+    while i < n:
+        tot = (tot + i * i) % 1000003
+        i = i + 1
+    return tot
+"""
+
+def run(n: int, ast_compile: bool) -> float:
+    tmpdir = py.path.local(tempfile.mkdtemp())
+    tmpdir.join('intloop.spy').write(textwrap.dedent(SRC))
+    vm = SPyVM()
+    vm.ast_compile = ast_compile
+    vm.path.append(str(tmpdir))
+    w_mod = vm.import_('intloop')
+    w_loop = w_mod.getattr('loop')
+    a = time.perf_counter()
+    w_res = vm.fast_call(w_loop, [vm.wrap(n)])
+    b = time.perf_counter()
+    print(f'loop({n}) = {vm.unwrap(w_res)}')
+    return b - a
+
+def main(argv: list[str]) -> None:
+    ast_compile = '--no-ast-compile' not in argv
+    args = [arg for arg in argv if not arg.startswith('--')]
+    n = int(args[0]) if args else 100000
+    t = run(n, ast_compile)
+    print(f'ast_compile={ast_compile}: {t:.3f} s')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,72 @@
+"""
+Benchmark for the parsing throughput, on a generated source file.
+
+It measures magic_py_parse (which turns the source into a Python AST), the
+full spy.parser.Parser (which also builds the SPy AST), and the time to load
+the AST and the symtables from spy.cache.ParseCache instead.
+
+Usage:
+    python -m benchmarks.parse_throughput [NLINES]
+"""
+
+import sys
+import time
+import tempfile
+import py
+from spy.magic_py_parse import magic_py_parse
+from spy.parser import Parser
+from spy.vm.vm import SPyVM
+from spy.irgen.irgen import parse_and_analyze
+from spy.cache import ParseCache
+
+def make_src(nlines: int) -> str:
+    lines = []
+    i = 0
+    while len(lines) < nlines:
+        lines.append(f'var g{i}: i32 = {i}')
+        lines.append(f'h{i}: f64 = {i}.5')
+        lines.append('')
+        lines.append(f'def fn{i}(x: i32, y: i32) -> i32:')
+        lines.append(f'    """')
+        lines.append(f'    docstring of fn{i}')
+        lines.append(f'    """')
+        lines.append(f'    var total: i32 = x + y * {i}')
+        lines.append(f'    if total > {i}:')
+        lines.append(f'        total = total - g{i}')
+        lines.append(f'    print("fn{i}")')
+        lines.append(f'    return total')
+        lines.append('')
+        i += 1
+    return '\n'.join(lines) + '\n'
+
+def measure(fn: object, n: int) -> float:
+    best = float('inf')
+    for i in range(n):
+        a = time.perf_counter()
+        fn()  # type: ignore
+        b = time.perf_counter()
+        best = min(best, b - a)
+    return best
+
+def main(argv: list[str]) -> None:
+    nlines = int(argv[0]) if argv else 50_000
+    src = make_src(nlines)
+    nlines = src.count('\n')
+    tmpdir = py.path.local(tempfile.mkdtemp())
+    f = tmpdir.join('big.spy')
+    f.write(src)
+    t1 = measure(lambda: magic_py_parse(src), 3)
+    t2 = measure(lambda: Parser(src, str(f)).parse(), 3)
+    vm = SPyVM()
+    t3 = measure(lambda: parse_and_analyze(vm, 'big', f), 3)
+    cache = ParseCache.for_file(f)
+    cache.store('big', f, *parse_and_analyze(vm, 'big', f))
+    t4 = measure(lambda: cache.load('big', f), 3)
+    print(f'lines: {nlines}')
+    print(f'magic_py_parse: {t1:.3f} s  ({nlines/t1:,.0f} lines/s)')
+    print(f'Parser.parse:   {t2:.3f} s  ({nlines/t2:,.0f} lines/s)')
+    print(f'parse + scopes: {t3:.3f} s  ({nlines/t3:,.0f} lines/s)')
+    print(f'ParseCache:     {t4:.3f} s  ({nlines/t4:,.0f} lines/s)')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,50 @@
+"""
+Benchmark for vm.redshift() on modules with many globals.
+
+Each generated module contains N global vars and N functions, each calling
+the previous one: the redshift of each call needs to find the FQN of the
+callee, so this measures how redshift scales with the number of globals.
+
+Usage:
+    python -m benchmarks.redshift_scaling [N1 N2 ...]
+"""
+
+import sys
+import time
+import tempfile
+import py
+from spy.vm.vm import SPyVM
+
+def make_src(n: int) -> str:
+    lines = []
+    for i in range(n):
+        lines.append(f'var g{i}: i32 = {i}')
+    lines.append('')
+    lines.append('def fn0(x: i32) -> i32:')
+    lines.append('    return x')
+    for i in range(1, n):
+        lines.append('')
+        lines.append(f'def fn{i}(x: i32) -> i32:')
+        lines.append(f'    return fn{i-1}(x) + fn{i-1}(g{i})')
+    return '\n'.join(lines) + '\n'
+
+def run(n: int) -> tuple[float, int]:
+    tmpdir = py.path.local(tempfile.mkdtemp())
+    modname = f'scaling{n}'
+    tmpdir.join(f'{modname}.spy').write(make_src(n))
+    vm = SPyVM()
+    vm.path.append(str(tmpdir))
+    vm.import_(modname)
+    a = time.perf_counter()
+    vm.redshift()
+    b = time.perf_counter()
+    return b - a, len(vm.globals_w)
+
+def main(argv: list[str]) -> None:
+    sizes = [int(arg) for arg in argv] or [250, 500, 1000, 2000]
+    for n in sizes:
+        t, nglobals = run(n)
+        print(f'N={n:6d} globals={nglobals:6d}: {t:.3f} s')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,34 @@
+"""
+Benchmark for the creation of SPyVMs, from scratch and from a snapshot.
+
+Usage:
+    python -m benchmarks.vm_creation [N]
+"""
+
+import sys
+import time
+from typing import Callable
+from spy.vm.vm import SPyVM
+
+def measure(n: int, fn: Callable[[], object]) -> float:
+    a = time.perf_counter()
+    for i in range(n):
+        fn()
+    b = time.perf_counter()
+    return (b - a) / n
+
+def main(argv: list[str]) -> None:
+    n = int(argv[0]) if argv else 500
+    snap = SPyVM().snapshot()
+    results = [
+        ('SPyVM()', measure(n, lambda: SPyVM())),
+        ('SPyVM() + ll', measure(n, lambda: SPyVM().ll)),
+        ('from_snapshot()', measure(n, lambda: SPyVM.from_snapshot(snap))),
+        ('from_snapshot() + ll',
+         measure(n, lambda: SPyVM.from_snapshot(snap).ll)),
+    ]
+    for name, t in results:
+        print(f'{name:22s} {t*1000:.3f} ms')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,90 @@
+"""
+Benchmark for the allocation of the hot VM objects.
+
+It runs the compiler tests with the interp and doppler backends, counts how
+many instances of the most allocated W_* classes are created, and estimates
+the memory they use (including their __dict__, if any).
+
+Usage:
+    python -m benchmarks.vm_objects [PYTEST_ARGS...]
+"""
+
+import sys
+import time
+from collections import Counter
+from typing import Any
+import pytest
+import spy
+from spy.vm.object import W_Object
+from spy.vm.primitive import W_I32, W_F64, W_Bool
+from spy.vm.str import W_Str
+from spy.vm.list import W_List
+from spy.vm.tuple import W_Tuple
+from spy.vm.opimpl import W_OpArg, W_OpImpl
+from spy.vm.func_adapter import W_FuncAdapter
+from spy.vm.modules.unsafe.ptr import W_Ptr
+
+CLASSES = [W_OpArg, W_I32, W_F64, W_Bool, W_Ptr, W_Str, W_List, W_Tuple,
+           W_OpImpl, W_FuncAdapter]
+
+def instance_size(w_obj: W_Object) -> int:
+    size = sys.getsizeof(w_obj)
+    d = getattr(w_obj, '__dict__', None)
+    if d is not None:
+        size += sys.getsizeof(d)
+    return size
+
+def count_allocations(args: list[str]) -> tuple[Counter, dict[type, int]]:
+    """
+    Run pytest with the given args, and count the instances of CLASSES
+    which are created. Return the counts and the (max) size of the
+    instances of each class.
+    """
+    counts: Counter = Counter()
+    sizes: dict[type, int] = {}
+    # a few samples for each class, to measure their size at the end. Don't
+    # keep too many: e.g. W_Str keeps its VM alive
+    samples: list[Any] = []
+
+    def counting_new(cls: type, *args: Any, **kwargs: Any) -> Any:
+        counts[cls] += 1
+        w_obj = object.__new__(cls)
+        if counts[cls] <= 10:
+            samples.append(w_obj)
+        return w_obj
+
+    for cls in CLASSES:
+        cls.__new__ = staticmethod(counting_new)  # type: ignore
+    try:
+        pytest.main(args)
+    finally:
+        for cls in CLASSES:
+            del cls.__new__  # type: ignore
+    for w_obj in samples:
+        cls = type(w_obj)
+        sizes[cls] = max(sizes.get(cls, 0), instance_size(w_obj))
+    return counts, sizes
+
+def main(argv: list[str]) -> None:
+    testdir = spy.ROOT.join('tests', 'compiler')
+    # faulthandler would replace the signal handlers of wasmtime, which are
+    # already installed at this point
+    args = argv or [str(testdir), '-q', '-p', 'no:cacheprovider',
+                    '-p', 'no:faulthandler',
+                    '-m', 'interp or doppler']
+    a = time.perf_counter()
+    counts, sizes = count_allocations(args)
+    b = time.perf_counter()
+    print()
+    print(f'{"class":15s} {"count":>10s} {"bytes":>6s} {"total":>10s}')
+    total = 0
+    for cls in CLASSES:
+        n = counts[cls]
+        size = sizes.get(cls, 0)
+        total += n * size
+        print(f'{cls.__name__:15s} {n:10d} {size:6d} '
+              f'{n * size / 1024 / 1024:7.1f} MB')
+    print(f'total: {total / 1024 / 1024:.1f} MB in {b - a:.2f} s')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -56,6 +56,11 @@ del AST
 # put them in dictionaries inside the typechecker. So, we must use eq=False ON
 # ALL AST NODES.
 #
+# Moreover, big modules contain a lot of nodes, and the doppler creates a new
+# node for every expression which is redshifted: to save memory we use
+# slots=True ON ALL AST NODES, including the abstract ones like Expr and Stmt
+# (else the subclasses get a __dict__ anyway).
+#
 # Ideally, I would like to do the following:
 #     def astnode():
 #         return dataclass (eq=False)
@@ -66,7 +71,7 @@ del AST
 #
 # But we can't because this pattern is not understood by mypy.
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Node:
     loc: Loc = field(repr=False)
 
@@ -123,7 +128,7 @@ class Node:
             for node in self.get_children():
                 node.visit(prefix, visitor, *args)
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Module(Node):
     filename: str
     decls: list['Decl']
@@ -147,27 +152,28 @@ class Module(Node):
         raise KeyError(name)
 
 
+@dataclass(eq=False, slots=True)
 class Decl(Node):
     pass
 
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class GlobalFuncDef(Decl):
     funcdef: 'FuncDef'
 
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class GlobalVarDef(Decl):
     vardef: 'VarDef'
     assign: 'Assign'
 
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class GlobalClassDef(Decl):
     classdef: 'ClassDef'
 
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Import(Decl):
     loc_asname: Loc
     fqn: FQN
@@ -175,7 +181,7 @@ class Import(Decl):
 
 # ====== Expr hierarchy ======
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Expr(Node):
     """
     Operator precedence table, see
@@ -206,16 +212,16 @@ class Expr(Node):
     precedence = '<Expr.precedence not set>' # type: int # type: ignore
 
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Name(Expr):
     precedence = 100 # the highest
     id: str
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Auto(Expr):
     precedence = 100 # the highest
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Constant(Expr):
     precedence = 100 # the highest
     value: object
@@ -223,7 +229,7 @@ class Constant(Expr):
     def __post_init__(self) -> None:
         assert type(self.value) is not str, 'use StrConst instead'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class StrConst(Expr):
     """
     Like Constant, but for strings.
@@ -234,36 +240,36 @@ class StrConst(Expr):
     precedence = 100 # the highest
     value: str
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class GetItem(Expr):
     precedence = 16
     value: Expr
     index: Expr
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class List(Expr):
     precedence = 17
     items: list[Expr]
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Tuple(Expr):
     precedence = 17
     items: list[Expr]
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Call(Expr):
     precedence = 16
     func: Expr
     args: list[Expr]
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class CallMethod(Expr):
     precedence = 17 # higher than GetAttr
     target: Expr
     method: StrConst
     args: list[Expr]
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class GetAttr(Expr):
     precedence = 16
     value: Expr
@@ -271,123 +277,123 @@ class GetAttr(Expr):
 
 # ====== BinOp sub-hierarchy ======
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class BinOp(Expr):
     op = ''
     left: Expr
     right: Expr
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Eq(BinOp):
     precedence = 6
     op = '=='
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class NotEq(BinOp):
     precedence = 6
     op = '!='
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Lt(BinOp):
     precedence = 6
     op = '<'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class LtE(BinOp):
     precedence = 6
     op = '<='
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Gt(BinOp):
     precedence = 6
     op = '>'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class GtE(BinOp):
     precedence = 6
     op = '>='
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Is(BinOp):
     precedence = 6
     op = 'is'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class IsNot(BinOp):
     precedence = 6
     op = 'is not'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class In(BinOp):
     precedence = 6
     op = 'in'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class NotIn(BinOp):
     precedence = 6
     op = 'not in'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Add(BinOp):
     precedence = 11
     op = '+'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Sub(BinOp):
     precedence = 11
     op = '-'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Mul(BinOp):
     precedence = 12
     op = '*'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Div(BinOp):
     precedence = 12
     op = '/'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class FloorDiv(BinOp):
     precedence = 12
     op = '//'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Mod(BinOp):
     precedence = 12
     op = '%'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Pow(BinOp):
     precedence = 14
     op = '**'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class LShift(BinOp):
     precedence = 10
     op = '<<'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class RShift(BinOp):
     precedence = 10
     op = '>>'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class BitXor(BinOp):
     precedence = 8
     op = '^'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class BitOr(BinOp):
     precedence = 7
     op = '|'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class BitAnd(BinOp):
     precedence = 9
     op = '&'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class MatMul(BinOp):
     precedence = 12
     op = '@'
@@ -395,27 +401,27 @@ class MatMul(BinOp):
 
 # ====== UnaryOp sub-hierarchy ======
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class UnaryOp(Expr):
     op = ''
     value: Expr
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class UnaryPos(UnaryOp):
     precedence = 13
     op = '+'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class UnaryNeg(UnaryOp):
     precedence = 13
     op = '-'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Invert(UnaryOp):
     precedence = 13
     op = '~'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Not(UnaryOp):
     precedence = 5
     op = 'not'
@@ -423,16 +429,16 @@ class Not(UnaryOp):
 
 # ====== Stmt hierarchy ======
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Stmt(Node):
     pass
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class FuncArg(Node):
     name: str
     type: 'Expr'
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class FuncDef(Stmt):
     color: Color
     name: str
@@ -449,7 +455,7 @@ class FuncDef(Stmt):
         """
         return Loc.combine(self.loc, self.return_type.loc)
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class ClassDef(Stmt):
     name: str
     kind: ClassKind
@@ -457,51 +463,51 @@ class ClassDef(Stmt):
     methods: list['FuncDef']
     symtable: Any = field(repr=False, default=None)
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Pass(Stmt):
     pass
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Return(Stmt):
     value: Expr
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class VarDef(Stmt):
     kind: VarKind
     name: str
     type: Expr
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class StmtExpr(Stmt):
     """
     An expr used as a statement
     """
     value: Expr
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Assign(Stmt):
     target: StrConst
     value: Expr
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class UnpackAssign(Stmt):
     targets: list[StrConst]
     value: Expr
 
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class SetAttr(Stmt):
     target: Expr
     attr: StrConst
     value: Expr
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class SetItem(Stmt):
     target: Expr
     index: Expr
     value: Expr
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class If(Stmt):
     test: Expr
     then_body: list[Stmt]
@@ -511,7 +517,7 @@ class If(Stmt):
     def has_else(self) -> bool:
         return len(self.else_body) > 0
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class While(Stmt):
     test: Expr
     body: list[Stmt]
@@ -524,7 +530,7 @@ class While(Stmt):
 # the proper AST-which-represent-the-syntax-of-the-language, but they are part
 # of the AST-which-we-use-as-IR
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class FQNConst(Expr):
     precedence = 100 # the highest
     fqn: FQN
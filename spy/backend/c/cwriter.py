@@ -29,11 +29,15 @@ class CModuleWriter:
     out_types: TextBuilder    # nested builder
     out_globals: TextBuilder  # nested builder for global declarations
     global_vars: set[str]
+    # if not None, emit only these FQNs, see Compiler.redshift
+    reachable: Optional[set[FQN]]
 
     def __init__(self, vm: SPyVM, w_mod: W_Module,
                  spyfile: py.path.local,
                  cfile: py.path.local,
-                 target: str) -> None:
+                 target: str,
+                 *,
+                 reachable: Optional[set[FQN]] = None) -> None:
         self.ctx = Context(vm)
         self.w_mod = w_mod
         self.spyfile = spyfile
@@ -44,6 +48,7 @@ class CModuleWriter:
         self.out_types = None     # type: ignore
         self.out_globals = None   # type: ignore
         self.global_vars = set()
+        self.reachable = reachable
 
     def write_c_source(self) -> None:
         c_src = self.emit_module()
@@ -98,6 +103,8 @@ class CModuleWriter:
         #
         for fqn, w_obj in self.w_mod.items_w():
             assert w_obj is not None, 'uninitialized global?'
+            if self.reachable is not None and fqn not in self.reachable:
+                continue
             # XXX we should mangle the name somehow
             if isinstance(w_obj, W_ASTFunc):
                 if w_obj.color == 'red':
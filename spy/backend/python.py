@@ -0,0 +1,491 @@
+"""
+SPy 'python' backend.
+
+Convert the redshifted functions of a module into the source code of a
+Python module, exec() it and use the resulting Python functions to execute
+the W_ASTFuncs (see W_ASTFunc.py_impl).
+
+Redshifted code is fully static: all the operators have been turned into
+direct calls to FQNConsts and all the conversions are explicit, so we don't
+need any of the dynamic dispatch done by ASTFrame. In particular:
+
+  - i32, f64 and bool values are represented as plain Python ints, floats
+    and bools, and they are boxed/unboxed only at the boundaries with the
+    rest of the VM. Any other value is represented by its W_Object;
+
+  - calls to the most common opimpls (e.g. operator::i32_add) are turned into
+    native Python expressions. i32 arithmetic is masked to 32 bits;
+
+  - calls to other redshifted functions of the same module are direct calls
+    to the corresponding Python function;
+
+  - red builtin functions are called directly, bypassing vm.fast_call;
+
+  - everything else goes through vm.fast_call.
+
+Functions which use features not supported by this backend are still
+executed by ASTFrame: we emit a stub which calls them via vm.fast_call.
+
+Note that FQNConsts are considered constant, exactly like in the C
+backend.
+"""
+
+from typing import Any
+from types import NoneType
+import math
+import builtins
+import linecache
+from spy import ast
+from spy.fqn import FQN
+from spy.location import Loc
+from spy.errors import SPyTypeError
+from spy.vm.vm import SPyVM
+from spy.vm.b import B
+from spy.vm.object import W_Type
+from spy.vm.primitive import W_I32, W_F64
+from spy.vm.list import W_List
+from spy.vm.function import W_ASTFunc, W_BuiltinFunc, W_Func
+from spy.textbuilder import TextBuilder
+from spy.util import magic_dispatch
+
+# an expression of the generated code, together with its SPy type
+PyExpr = tuple[str, W_Type]
+
+NATIVE_TYPES = (B.w_i32, B.w_f64, B.w_bool)
+
+def i32_mask(s: str) -> str:
+    # this is equivalent to spy.vm.primitive.i32_wrap, but inlined
+    return f'(((({s}) + 2147483648) & 4294967295) - 2147483648)'
+
+def no_return(loc: Loc) -> None:
+    msg = 'reached the end of the function without a `return`'
+    raise SPyTypeError.simple(msg, 'no return', loc)
+
+
+class PyBackend:
+    """
+    Convert the redshifted functions of a module into Python code.
+    """
+    vm: SPyVM
+    out: TextBuilder
+    namespace: dict[str, Any]
+    names: set[str]
+    consts: dict[int, str]
+    # fqn => name of the Python function, for all the functions of the module
+    funcnames: dict[FQN, str]
+    # fqn => name of the boxed entry point, for the successfully compiled
+    # functions
+    entries: dict[FQN, str]
+
+    FQN2BinOp = {
+        FQN('operator::i32_add'): ('+', True),
+        FQN('operator::i32_sub'): ('-', True),
+        FQN('operator::i32_mul'): ('*', True),
+        FQN('operator::i32_div'): ('//', True),
+        FQN('operator::i32_mod'): ('%', True),
+        FQN('operator::i32_lshift'): ('<<', True),
+        FQN('operator::i32_rshift'): ('>>', False),
+        FQN('operator::i32_and'): ('&', False),
+        FQN('operator::i32_or'): ('|', False),
+        FQN('operator::i32_xor'): ('^', False),
+        FQN('operator::i32_eq') : ('==', False),
+        FQN('operator::i32_ne') : ('!=', False),
+        FQN('operator::i32_lt') : ('<', False),
+        FQN('operator::i32_le') : ('<=', False),
+        FQN('operator::i32_gt') : ('>', False),
+        FQN('operator::i32_ge') : ('>=', False),
+        #
+        FQN('operator::f64_add'): ('+', False),
+        FQN('operator::f64_sub'): ('-', False),
+        FQN('operator::f64_mul'): ('*', False),
+        FQN('operator::f64_div'): ('/', False),
+        FQN('operator::f64_eq') : ('==', False),
+        FQN('operator::f64_ne') : ('!=', False),
+        FQN('operator::f64_lt') : ('<', False),
+        FQN('operator::f64_le') : ('<=', False),
+        FQN('operator::f64_gt') : ('>', False),
+        FQN('operator::f64_ge') : ('>=', False),
+    }
+
+    FQN2Conv = {
+        FQN('operator::i32_to_f64'): 'float({})',
+        FQN('operator::i32_to_bool'): 'bool({})',
+        FQN('operator::f64_to_i32'): i32_mask('int({})'),
+    }
+
+    def __init__(self, vm: SPyVM) -> None:
+        self.vm = vm
+        self.out = TextBuilder(use_colors=False)
+        self.namespace = {
+            'vm': vm,
+            'CALL': vm.fast_call,
+            'STORE': vm.store_global,
+            'G': vm.globals_w,
+            'I32': W_I32.make,
+            'F64': W_F64,
+            'LIST': W_List,
+            'TRUE': B.w_True,
+            'FALSE': B.w_False,
+            'NONE': B.w_None,
+            'no_return': no_return,
+        }
+        # the generated code uses the builtins (e.g. in FQN2Conv) and
+        # args_w (in the entry points): don't shadow them
+        self.names = set(self.namespace) | set(dir(builtins)) | {'args_w'}
+        self.consts = {}
+        self.funcnames = {}
+        self.entries = {}
+
+    def new_name(self, prefix: str) -> str:
+        """
+        Create an unique name for the generated module.
+
+        Names starting with 'v_' are reserved for the local variables.
+        """
+        prefix = ''.join(c if c.isalnum() else '_' for c in prefix)
+        if prefix.startswith('v_'):
+            prefix = '_' + prefix
+        name = prefix
+        i = 0
+        while name in self.names:
+            name = f'{prefix}_{i}'
+            i += 1
+        self.names.add(name)
+        return name
+
+    def const(self, obj: Any, prefix: str = 'k') -> str:
+        """
+        Make the given object available to the generated code, and return
+        its name.
+        """
+        name = self.consts.get(id(obj))
+        if name is None:
+            name = self.new_name(prefix)
+            self.namespace[name] = obj
+            self.consts[id(obj)] = name
+        return name
+
+    def compile_mod(self, modname: str) -> str:
+        """
+        Return the Python source code for the given module
+        """
+        w_mod = self.vm.modules_w[modname]
+        funcs = []
+        for fqn, w_obj in w_mod.items_w():
+            if (isinstance(w_obj, W_ASTFunc) and w_obj.color == 'red' and
+                w_obj.redshifted):
+                self.funcnames[fqn] = self.new_name(fqn.symbol_name)
+                funcs.append((fqn, w_obj))
+        for fqn, w_func in funcs:
+            self.emit_func(fqn, w_func)
+        return self.out.build()
+
+    def load_mod(self, modname: str) -> None:
+        """
+        Compile the given module, exec() it and use the resulting Python
+        functions to execute the corresponding W_ASTFuncs.
+        """
+        src = self.compile_mod(modname)
+        filename = f'<spy-python {modname}>'
+        # make the generated code visible in tracebacks
+        linecache.cache[filename] = (len(src), None, src.splitlines(True),
+                                     filename)
+        code = compile(src, filename, 'exec')
+        exec(code, self.namespace)
+        for fqn, entry in self.entries.items():
+            w_func = self.vm.lookup_global(fqn)
+            assert isinstance(w_func, W_ASTFunc)
+            w_func.py_impl = self.namespace[entry]
+
+    # ===== boxing and unboxing =====
+
+    def box(self, expr: PyExpr) -> str:
+        v, w_type = expr
+        if w_type is B.w_i32:
+            return f'I32({v})'
+        elif w_type is B.w_f64:
+            return f'F64({v})'
+        elif w_type is B.w_bool:
+            return f'(TRUE if {v} else FALSE)'
+        elif w_type is B.w_void:
+            # void exprs are either None or calls which we must evaluate
+            return 'NONE' if v == 'None' else f'({v}, NONE)[1]'
+        return v
+
+    def coerce(self, expr: PyExpr, w_type: W_Type) -> str:
+        """
+        Convert expr from its representation into the one of w_type
+        """
+        v, w_exptype = expr
+        if w_exptype is w_type:
+            return v
+        elif w_exptype in NATIVE_TYPES:
+            # e.g. i32 -> dynamic
+            return self.box(expr)
+        elif w_type in NATIVE_TYPES:
+            # e.g. dynamic -> i32
+            return f'{v}.value'
+        return v
+
+    def unbox(self, v: str, w_type: W_Type) -> str:
+        if w_type in NATIVE_TYPES:
+            return f'{v}.value'
+        return v
+
+    # ===== functions =====
+
+    def emit_func(self, fqn: FQN, w_func: W_ASTFunc) -> None:
+        name = self.funcnames[fqn]
+        params = w_func.w_functype.params
+        w_restype = w_func.w_functype.w_restype
+        argnames = [f'v_{p.name}' for p in params]
+        #
+        # first, try to emit the function into a detached builder: if we
+        # encounter something which we don't support, we emit a stub instead
+        fw = PyFuncWriter(self, w_func)
+        try:
+            fw.emit(name, argnames)
+        except NotImplementedError:
+            self.emit_stub(name, w_func, argnames)
+            return
+        self.out.attach_nested_builder(fw.out)
+        #
+        # boxed entry point, used by W_ASTFunc.raw_call
+        entry = self.new_name(f'{name}_entry')
+        args = ', '.join([self.unbox(f'args_w[{i}]', p.w_type)
+                          for i, p in enumerate(params)])
+        res = self.box((f'{name}({args})', w_restype))
+        if w_restype is B.w_void:
+            self.out.wb(f"""
+            def {entry}(args_w):
+                {name}({args})
+                return NONE
+            """)
+        else:
+            self.out.wb(f"""
+            def {entry}(args_w):
+                return {res}
+            """)
+        self.out.wl()
+        self.entries[fqn] = entry
+
+    def emit_stub(self, name: str, w_func: W_ASTFunc,
+                  argnames: list[str]) -> None:
+        g = self.const(w_func, 'w_func')
+        params = w_func.w_functype.params
+        args_w = ', '.join([self.box((argname, p.w_type))
+                            for argname, p in zip(argnames, params)])
+        res = self.unbox(f'CALL({g}, [{args_w}])',
+                         w_func.w_functype.w_restype)
+        self.out.wb(f"""
+        # {w_func.fqn} is not supported by this backend
+        def {name}({', '.join(argnames)}):
+            return {res}
+        """)
+        self.out.wl()
+
+
+class PyFuncWriter:
+    """
+    Emit the Python code for a single redshifted W_ASTFunc.
+    """
+    b: PyBackend
+    vm: SPyVM
+    out: TextBuilder
+    w_func: W_ASTFunc
+    locals_types_w: dict[str, W_Type]
+
+    def __init__(self, b: PyBackend, w_func: W_ASTFunc) -> None:
+        assert w_func.locals_types_w is not None
+        self.b = b
+        self.vm = b.vm
+        self.out = b.out.make_nested_builder(detached=True)
+        self.w_func = w_func
+        self.locals_types_w = w_func.locals_types_w
+
+    def emit(self, name: str, argnames: list[str]) -> None:
+        w_functype = self.w_func.w_functype
+        self.out.wl(f'def {name}({", ".join(argnames)}):')
+        with self.out.indent():
+            self.out.wl(f'# {self.w_func.fqn}')
+            self.emit_body(self.w_func.funcdef.body)
+            if w_functype.w_restype not in (B.w_void, B.w_dynamic):
+                loc = self.w_func.funcdef.loc.make_end_loc()
+                self.out.wl(f'no_return({self.b.const(loc, "loc")})')
+            elif w_functype.w_restype is B.w_dynamic:
+                self.out.wl('return NONE')
+        self.out.wl()
+
+    def emit_body(self, body: list[ast.Stmt]) -> None:
+        if not body:
+            self.out.wl('pass')
+        for stmt in body:
+            self.emit_stmt(stmt)
+
+    def emit_stmt(self, stmt: ast.Stmt) -> None:
+        magic_dispatch(self, 'emit_stmt', stmt)
+
+    def emit_stmt_NotImplemented(self, stmt: ast.Stmt) -> None:
+        raise NotImplementedError(stmt.__class__.__name__)
+
+    def fmt_expr(self, expr: ast.Expr) -> PyExpr:
+        return magic_dispatch(self, 'fmt_expr', expr)
+
+    def fmt_expr_NotImplemented(self, expr: ast.Expr) -> PyExpr:
+        raise NotImplementedError(expr.__class__.__name__)
+
+    # ===== statements =====
+
+    def emit_stmt_Pass(self, stmt: ast.Pass) -> None:
+        self.out.wl('pass')
+
+    def emit_stmt_Return(self, ret: ast.Return) -> None:
+        w_restype = self.w_func.w_functype.w_restype
+        v = self.fmt_expr(ret.value)
+        if w_restype is B.w_void:
+            if not isinstance(ret.value, ast.Constant):
+                self.out.wl(v[0])
+            self.out.wl('return None')
+        else:
+            self.out.wl(f'return {self.b.coerce(v, w_restype)}')
+
+    def emit_stmt_VarDef(self, vardef: ast.VarDef) -> None:
+        # nothing to do, locals are created by the first assignment
+        pass
+
+    def emit_stmt_Assign(self, assign: ast.Assign) -> None:
+        varname = assign.target.value
+        v = self.fmt_expr(assign.value)
+        sym = self.w_func.funcdef.symtable.lookup(varname)
+        if sym.is_local:
+            w_type = self.locals_types_w[varname]
+            self.out.wl(f'v_{varname} = {self.b.coerce(v, w_type)}')
+        else:
+            assert sym.fqn is not None
+            q = self.b.const(sym.fqn, 'fqn')
+            self.out.wl(f'STORE({q}, {self.b.box(v)})')
+
+    def emit_stmt_StmtExpr(self, stmt: ast.StmtExpr) -> None:
+        v, _ = self.fmt_expr(stmt.value)
+        self.out.wl(v)
+
+    def fmt_test(self, expr: ast.Expr) -> str:
+        v = self.fmt_expr(expr)
+        return self.b.coerce(v, B.w_bool)
+
+    def emit_stmt_If(self, if_node: ast.If) -> None:
+        self.out.wl(f'if {self.fmt_test(if_node.test)}:')
+        with self.out.indent():
+            self.emit_body(if_node.then_body)
+        if if_node.else_body:
+            self.out.wl('else:')
+            with self.out.indent():
+                self.emit_body(if_node.else_body)
+
+    def emit_stmt_While(self, while_node: ast.While) -> None:
+        self.out.wl(f'while {self.fmt_test(while_node.test)}:')
+        with self.out.indent():
+            self.emit_body(while_node.body)
+
+    # ===== expressions =====
+
+    def fmt_expr_Constant(self, const: ast.Constant) -> PyExpr:
+        T = type(const.value)
+        assert T in (int, float, bool, NoneType)
+        if T is NoneType:
+            return 'None', B.w_void
+        elif T is bool:
+            return repr(const.value), B.w_bool
+        elif T is int:
+            return repr(const.value), B.w_i32
+        else:
+            assert isinstance(const.value, float)
+            if math.isfinite(const.value):
+                return repr(const.value), B.w_f64
+            return self.b.const(const.value, 'f64'), B.w_f64
+
+    def fmt_expr_StrConst(self, const: ast.StrConst) -> PyExpr:
+        w_s = self.vm.wrap(const.value)
+        return self.b.const(w_s, 'str'), B.w_str
+
+    def fmt_expr_FQNConst(self, const: ast.FQNConst) -> PyExpr:
+        w_obj = self.vm.lookup_global(const.fqn)
+        assert w_obj is not None
+        w_type = self.vm.dynamic_type(w_obj)
+        if w_type in NATIVE_TYPES:
+            # same as doppler.make_const: i32 are unwrapped as FixedInt
+            value = self.vm.unwrap(w_obj)
+            if w_type is B.w_i32:
+                value = int(value)
+            return self.fmt_expr_Constant(ast.Constant(const.loc, value))
+        return self.b.const(w_obj, 'w_obj'), w_type
+
+    def fmt_expr_Name(self, name: ast.Name) -> PyExpr:
+        sym = self.w_func.funcdef.symtable.lookup(name.id)
+        if sym.is_local:
+            return f'v_{name.id}', self.locals_types_w[name.id]
+        assert sym.fqn is not None
+        w_val = self.vm.lookup_global(sym.fqn)
+        assert w_val is not None
+        w_type = self.vm.dynamic_type(w_val)
+        q = self.b.const(sym.fqn, 'fqn')
+        return self.b.unbox(f'G[{q}]', w_type), w_type
+
+    def fmt_expr_List(self, lst: ast.List) -> PyExpr:
+        items = [self.fmt_expr(item) for item in lst.items]
+        # this must compute the same type as ASTFrame.eval_expr_List
+        assert items
+        w_itemtype = items[0][1]
+        for _, w_type in items:
+            w_itemtype = self.vm.union_type(w_itemtype, w_type)
+        w_listtype = self.vm.make_list_type(w_itemtype)
+        t = self.b.const(w_listtype, 'listtype')
+        items_w = ', '.join([self.b.box(item) for item in items])
+        return f'LIST({t}, [{items_w}])', w_listtype
+
+    def fmt_expr_Call(self, call: ast.Call) -> PyExpr:
+        if not isinstance(call.func, ast.FQNConst):
+            raise NotImplementedError('indirect calls')
+        fqn = call.func.fqn
+        w_func = self.vm.lookup_global(fqn)
+        assert isinstance(w_func, W_Func)
+        w_functype = w_func.w_functype
+        w_restype = w_functype.w_restype
+        args = [self.fmt_expr(arg) for arg in call.args]
+
+        # some calls are special-cased and transformed into a Python expr
+        binop = self.b.FQN2BinOp.get(fqn)
+        if binop is not None:
+            op, mask = binop
+            assert len(args) == 2
+            l, r = args
+            v = f'{l[0]} {op} {r[0]}'
+            v = i32_mask(v) if mask else f'({v})'
+            return v, w_restype
+
+        conv = self.b.FQN2Conv.get(fqn)
+        if conv is not None:
+            assert len(args) == 1
+            return conv.format(args[0][0]), w_restype
+
+        if fqn in self.b.funcnames:
+            # direct call to another function of the module
+            name = self.b.funcnames[fqn]
+            args_v = [self.b.coerce(arg, p.w_type)
+                      for arg, p in zip(args, w_functype.params)]
+            return f'{name}({", ".join(args_v)})', w_restype
+
+        if w_functype.is_varargs:
+            args_w = ', '.join([self.b.box(arg) for arg in args])
+        else:
+            args_w = ', '.join([
+                self.b.box((self.b.coerce(arg, p.w_type), p.w_type))
+                for arg, p in zip(args, w_functype.params)])
+
+        if isinstance(w_func, W_BuiltinFunc) and w_func.color == 'red':
+            f = self.b.const(w_func._pyfunc, 'pyfunc')
+            v = f'{f}(vm, {args_w})'
+        else:
+            f = self.b.const(w_func, 'w_func')
+            v = f'CALL({f}, [{args_w}])'
+        return self.b.unbox(v, w_restype), w_restype
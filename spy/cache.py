@@ -0,0 +1,246 @@
+"""
+Persistent on-disk cache of redshifted modules.
+
+This is the SPy equivalent of __pycache__: the redshifted content of a module
+is stored as a .spyc (see spy.vm.bytecode) inside a __spycache__ directory
+next to the source file, so that a rebuild with unchanged sources can skip
+parsing, the execution of the module body and redshift.
+
+Entries are content-addressed: the name of the file contains a hash of the
+source code, of the SPy version and of the bytecode version, so a stale
+entry is never picked. Redshift might inline code coming from other .spy
+modules (e.g. the result of blue functions), so each entry also records the
+hash of all the .spy files which were imported when it was created, and it
+is ignored if any of them changed.
+
+Not all modules can be cached: if the redshifted code cannot be serialized
+(see Serializer) or refers to objects which don't exist in a fresh VM (e.g.
+structs), store() doesn't write the entry and the module is simply rebuilt
+from scratch.
+
+The same directory also contains the output of the frontend, i.e. the
+spy.ast.Module and its symtables as produced by Parser and ScopeAnalyzer
+(see ParseCache). They don't depend on other modules, so they can be reused
+also when the redshifted module cannot.
+"""
+
+import gc
+import hashlib
+import marshal
+import pickle
+import functools
+from typing import Optional, TYPE_CHECKING
+from importlib import metadata
+import py.path
+import spy
+from spy.errors import SPyImportError
+from spy.vm.module import W_Module
+from spy.vm.function import W_ASTFunc
+from spy.vm import bytecode
+if TYPE_CHECKING:
+    from spy.vm.vm import SPyVM
+    from spy import ast
+    from spy.irgen.symtable import SymTable
+
+CACHEDIR = '__spycache__'
+
+def get_spy_version() -> str:
+    try:
+        return metadata.version('spylang')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+FRONTEND_FILES = [
+    'ast.py', 'parser.py', 'magic_py_parse.py', 'location.py', 'fqn.py',
+    'irgen/scope.py', 'irgen/symtable.py',
+]
+
+@functools.cache
+def get_frontend_key() -> str:
+    """
+    Hash of the source code of the frontend. The pickled AST depends on the
+    exact layout of the classes, which might change also without bumping the
+    SPy version (e.g. in a development checkout).
+    """
+    h = hashlib.sha256()
+    for name in FRONTEND_FILES:
+        h.update(spy.ROOT.join(name).read_binary())
+    return h.hexdigest()
+
+def hash_file(f: py.path.local) -> str:
+    return hashlib.sha256(f.read_binary()).hexdigest()
+
+
+class RedshiftCache:
+    """
+    A directory containing redshifted modules, keyed by the hash of their
+    source.
+    """
+    cachedir: py.path.local
+
+    def __init__(self, cachedir: py.path.local) -> None:
+        self.cachedir = cachedir
+
+    @classmethod
+    def for_file(cls, file_spy: py.path.local) -> 'RedshiftCache':
+        return cls(file_spy.dirpath().join(CACHEDIR))
+
+    def get_key(self, file_spy: py.path.local) -> str:
+        h = hashlib.sha256()
+        h.update(get_spy_version().encode('utf-8'))
+        h.update(f'{bytecode.MAGIC}{bytecode.VERSION}'.encode('utf-8'))
+        h.update(file_spy.read_binary())
+        return h.hexdigest()
+
+    def get_path(self, modname: str,
+                 file_spy: py.path.local) -> py.path.local:
+        key = self.get_key(file_spy)
+        return self.cachedir.join(f'{modname}-{key[:16]}.spyc')
+
+    def load(self, vm: 'SPyVM', modname: str,
+             file_spy: py.path.local) -> Optional[W_Module]:
+        """
+        Load the redshifted module from the cache, or return None if it's
+        not there or it cannot be used.
+        """
+        path = self.get_path(modname, file_spy)
+        if not path.check(file=True):
+            return None
+        try:
+            deps, data = marshal.loads(path.read_binary())
+        except (EOFError, ValueError, TypeError):
+            return None
+        for filename, hexdigest in deps:
+            f = py.path.local(filename)
+            if not f.check(file=True) or hash_file(f) != hexdigest:
+                return None
+        try:
+            return bytecode.load_module(vm, data)
+        except SPyImportError:
+            return None
+
+    def store(self, vm: 'SPyVM', modname: str,
+              file_spy: py.path.local) -> bool:
+        """
+        Store the module into the cache. All its red functions must have been
+        redshifted.
+
+        Return False if the module cannot be cached.
+        """
+        w_mod = vm.modules_w[modname]
+        for fqn, w_obj in w_mod.items_w():
+            if (isinstance(w_obj, W_ASTFunc) and w_obj.color == 'red' and
+                not w_obj.redshifted):
+                return False
+        try:
+            data = bytecode.dump_module(vm, modname)
+        except NotImplementedError:
+            return False
+        if not self.can_load(data):
+            # the entry would be rewritten on every run, without ever being
+            # used
+            return False
+        deps = tuple(
+            (w_dep.filepath, hash_file(py.path.local(w_dep.filepath)))
+            for name, w_dep in vm.modules_w.items()
+            if name != modname and w_dep.filepath.endswith('.spy')
+        )
+        path = self.get_path(modname, file_spy)
+        self.cachedir.ensure(dir=True)
+        # remove the stale entries of this module
+        for old in self.cachedir.listdir(f'{modname}-*.spyc'):
+            old.remove()
+        # write to a temporary file and rename, so that a concurrent load()
+        # never sees a half-written entry
+        tmp = path.new(ext='.tmp')
+        tmp.write_binary(marshal.dumps((deps, data)))
+        tmp.rename(path)
+        return True
+
+
+    def can_load(self, data: bytes) -> bool:
+        """
+        Check whether load() can use the given module, i.e. whether it can be
+        loaded by a fresh VM
+        """
+        from spy.vm.vm import SPyVM
+        try:
+            bytecode.load_module(SPyVM(), data)
+        except SPyImportError:
+            return False
+        return True
+
+
+class ParseCache:
+    """
+    A directory containing parsed and scope-analyzed modules, keyed by the
+    hash of their source.
+
+    Entries are pickles of (mod, symtable): the symtables of the functions
+    and classes are reachable from mod through funcdef.symtable and
+    classdef.symtable.
+
+    Loading a pickle can execute arbitrary code, so the cache must not be
+    used on untrusted checkouts.
+    """
+    cachedir: py.path.local
+
+    def __init__(self, cachedir: py.path.local) -> None:
+        self.cachedir = cachedir
+
+    @classmethod
+    def for_file(cls, file_spy: py.path.local) -> 'ParseCache':
+        return cls(file_spy.dirpath().join(CACHEDIR))
+
+    def get_key(self, file_spy: py.path.local) -> str:
+        h = hashlib.sha256()
+        h.update(get_spy_version().encode('utf-8'))
+        h.update(get_frontend_key().encode('utf-8'))
+        # the filename is stored in all the Locs
+        h.update(str(file_spy).encode('utf-8'))
+        h.update(file_spy.read_binary())
+        return h.hexdigest()
+
+    def get_path(self, modname: str,
+                 file_spy: py.path.local) -> py.path.local:
+        key = self.get_key(file_spy)
+        return self.cachedir.join(f'{modname}-{key[:16]}.spyast')
+
+    def load(self, modname: str, file_spy: py.path.local
+             ) -> Optional[tuple['ast.Module', 'SymTable']]:
+        """
+        Load the AST and the module symtable from the cache, or return None
+        if they are not there.
+        """
+        path = self.get_path(modname, file_spy)
+        if not path.check(file=True):
+            return None
+        data = path.read_binary()
+        # unpickling creates lots of small objects, which trigger the GC
+        # over and over: without this it's ~4x slower
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            mod, symtable = pickle.loads(data)
+        except Exception:
+            # a corrupted entry can raise pretty much anything
+            return None
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return mod, symtable
+
+    def store(self, modname: str, file_spy: py.path.local,
+              mod: 'ast.Module', symtable: 'SymTable') -> None:
+        """
+        Store the result of the scope analysis into the cache. It must be
+        called before executing the module, which mutates the AST.
+        """
+        data = pickle.dumps((mod, symtable), protocol=pickle.HIGHEST_PROTOCOL)
+        path = self.get_path(modname, file_spy)
+        self.cachedir.ensure(dir=True)
+        for old in self.cachedir.listdir(f'{modname}-*.spyast'):
+            old.remove()
+        tmp = path.new(ext='.tmp')
+        tmp.write_binary(data)
+        tmp.rename(path)
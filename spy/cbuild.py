@@ -1,11 +1,21 @@
 from typing import Optional, Literal
+from enum import Enum
 import subprocess
 import py.path
-import spy.libspy
+import spy
 from spy.textbuilder import Color
 
 FORCE_COLORS=True
 BUILD_TYPE = Literal['release', 'debug']
+# NOTE: we don't import spy.libspy here, because it would import wasmtime,
+# and the CLI needs ToolchainType even for actions which don't compile
+LIBSPY = spy.ROOT.join('libspy')
+
+class ToolchainType(str, Enum):
+    zig = "zig"
+    clang = "clang"
+    emscripten = "emscripten"
+    native = "native"
 
 def get_toolchain(toolchain: str, *, build_type: BUILD_TYPE) -> 'Toolchain':
     if toolchain == 'zig':
@@ -38,14 +48,14 @@ class Toolchain:
 
     @property
     def CFLAGS(self) -> list[str]:
-        libspy_a = spy.libspy.BUILD.join(self.TARGET, 'libspy.a')
+        libspy_a = LIBSPY.join('build', self.TARGET, 'libspy.a')
         return [
             '-DSPY_TARGET_' + self.TARGET.upper(),
             '--std=c99',
             '-Werror=implicit-function-declaration',
             '-Wfatal-errors',
             #'-Werror',
-            '-I', str(spy.libspy.INCLUDE),
+            '-I', str(LIBSPY.join('include')),
         ]
 
     @property
@@ -58,7 +68,7 @@ class Toolchain:
 
     @property
     def LDFLAGS(self) -> list[str]:
-        libspy_dir = spy.libspy.BUILD.join(self.TARGET, self.build_type)
+        libspy_dir = LIBSPY.join('build', self.TARGET, self.build_type)
         return ['-L', str(libspy_dir), '-lspy']
 
     def cc(self,
@@ -222,7 +232,7 @@ class EmscriptenToolchain(Toolchain):
 
     @property
     def LDFLAGS(self) -> list[str]:
-        post_js = spy.libspy.SRC.join('emscripten_post.js')
+        post_js = LIBSPY.join('src', 'emscripten_post.js')
         return super().LDFLAGS + [
             "-sEXPORTED_FUNCTIONS=['_main']",
             "-sWASM_BIGINT",
@@ -1,25 +1,20 @@
 import sys
-from typing import Annotated, Any, no_type_check, Optional
+from typing import Annotated, Any, no_type_check, Optional, TYPE_CHECKING
 from pathlib import Path
 import time
-import traceback
 from dataclasses import dataclass
 import click
 import typer
 from typer import Option
-import py.path
-import pdb as stdlib_pdb # to distinguish from the "--pdb" option
 from spy.vendored.dataclass_typer import dataclass_typer
-from spy.magic_py_parse import magic_py_parse
 from spy.errors import SPyError
-from spy.parser import Parser
-from spy.backend.spy import SPyBackend, FQN_FORMAT
-from spy.compiler import Compiler, ToolchainType
-from spy.cbuild import get_toolchain, BUILD_TYPE
-from spy.irgen.scope import ScopeAnalyzer
-from spy.vm.b import B
-from spy.vm.vm import SPyVM
-from spy.vm.function import W_ASTFunc, W_Func, W_FuncType
+from spy.cbuild import ToolchainType
+if TYPE_CHECKING:
+    from spy.vm.vm import SPyVM, VMSnapshot
+
+# NOTE: the imports of the various subsystems are done lazily, so that each
+# action pays only for what it needs: e.g. --help and --parse don't need
+# wasmtime. See also TestImportTime in spy/tests/test_cli.py.
 
 app = typer.Typer(pretty_exceptions_enable=False)
 
@@ -48,6 +43,14 @@ class Arguments:
         "-r", "--redshift",
         help="Perform redshift and dump the result"
     )
+    pysrc: bool = Option(False,
+        "--pysrc",
+        help="Generate the Python code (see spy.backend.python) and dump it"
+    )
+    spyc: bool = Option(False,
+        "--spyc",
+        help="Generate the bytecode (see spy.vm.bytecode) and write a .spyc"
+    )
     cwrite: bool = Option(False,
         "-C", "--cwrite",
         help="Generate the C code"
@@ -69,6 +72,23 @@ class Arguments:
         '--release',
         help="enable release mode"
     )
+    tree_shake: bool = Option(False,
+        "--tree-shake",
+        help="Compile only the code reachable from main() and the exports. "
+             "Not compatible with --cache"
+    )
+    export: list[str] = Option([],
+        "--export",
+        metavar="NAME",
+        help="Export NAME from the compiled module (can be repeated)"
+    )
+    cache: bool = Option(False,
+        "--cache",
+        help="Reuse the parsed modules from __spycache__ if the sources "
+             "didn't change, and the redshifted module (for -r, -C and -c). "
+             "The parsed modules are stored as pickles: don't use it on "
+             "untrusted checkouts"
+    )
     toolchain: ToolchainType = Option("zig",
         "-t", "--toolchain",
         help="which compiler to use"
@@ -78,7 +98,12 @@ class Arguments:
     )
     timeit: bool = Option(False,
         "--timeit",
-        help="Print execution time"
+        help="Print execution time, or the redshift time of each function"
+    )
+    redshift_threshold: Optional[int] = Option(None,
+        "--redshift-threshold",
+        metavar="N",
+        help="When executing, redshift each function after N calls"
     )
     pdb: bool = Option(False,
         "--pdb",
@@ -87,13 +112,18 @@ class Arguments:
 
     def __post_init__(self) -> None:
         self.validate_actions()
+        if self.tree_shake and self.cache:
+            # the cache stores fully redshifted modules, while tree shaking
+            # leaves the unreachable functions red
+            raise typer.BadParameter(
+                "--tree-shake and --cache cannot be used together")
         if not self.filename.exists():
             raise typer.BadParameter(f"File {self.filename} does not exist")
 
     def validate_actions(self) -> None:
         # check that we specify at most one of the following options
         possible_actions = ["execute", "pyparse", "parse", "symtable",
-                            "redshift", "cwrite", "compile"]
+                            "redshift", "pysrc", "spyc", "cwrite", "compile"]
         actions = {a for a in possible_actions if getattr(self, a)}
         n = len(actions)
         if n == 0:
@@ -112,62 +142,109 @@ class Arguments:
 
 
 def do_pyparse(filename: str) -> None:
-    import ast as py_ast
+    from spy.magic_py_parse import magic_py_parse
     with open(filename) as f:
         src = f.read()
     mod = magic_py_parse(src)
     mod.pp()
 
-def dump_spy_mod(vm: SPyVM, modname: str, pretty: bool) -> None:
+def dump_spy_mod(vm: 'SPyVM', modname: str, pretty: bool) -> None:
+    from spy.backend.spy import SPyBackend, FQN_FORMAT
     fqn_format: FQN_FORMAT = 'short' if pretty else 'full'
     b = SPyBackend(vm, fqn_format=fqn_format)
     print(b.dump_mod(modname))
 
+def print_redshift_timings(vm: 'SPyVM', n: int = 10) -> None:
+    timings = sorted(vm.redshift_timings.items(), key=lambda item: -item[1])
+    total = sum(vm.redshift_timings.values())
+    print(f'redshift: {total:.3f} seconds', file=sys.stderr)
+    for fqn, t in timings[:n]:
+        print(f'    {t:.3f} {fqn}', file=sys.stderr)
+
 @no_type_check
 @app.command()
 @dataclass_typer
 def main(args: Arguments) -> None:
     ""
+    # spy.server passes a pre-initialized VM as the obj of the context
+    ctx = click.get_current_context(silent=True)
+    template = ctx.obj if ctx is not None else None
     try:
-        do_main(args)
+        do_main(args, template)
     except SPyError as e:
         print(e.format(use_colors=True))
         if args.pdb:
+            import pdb as stdlib_pdb # to distinguish from the "--pdb" option
             info = sys.exc_info()
             stdlib_pdb.post_mortem(info[2])
     except Exception as e:
         if not args.pdb:
             raise
 
+        import traceback
+        import pdb as stdlib_pdb
         traceback.print_exc()
         info = sys.exc_info()
         stdlib_pdb.post_mortem(info[2])
 
 
-def do_main(args: Arguments) -> None:
+def do_main(args: Arguments, template: Optional['VMSnapshot'] = None
+            ) -> None:
+    """
+    If template is given, the VM is created from it instead of from
+    scratch, so that we don't need to initialize the builtin modules again.
+    """
     if args.pyparse:
         do_pyparse(str(args.filename))
         return
 
+    if args.parse:
+        from spy.parser import Parser
+        parser = Parser.from_filename(str(args.filename))
+        mod = parser.parse()
+        mod.pp()
+        return
+
+    import py.path
+    from spy.vm.vm import SPyVM
+    from spy.vm.bytecode import load_module
     modname = args.filename.stem
     builddir = args.filename.parent
-    vm = SPyVM()
+    if template is None:
+        vm = SPyVM()
+    else:
+        vm = SPyVM.from_snapshot(template)
     vm.path.append(str(builddir))
+    vm.redshift_threshold = args.redshift_threshold
+    vm.parse_cache = args.cache
 
-    if args.parse or args.symtable:
+    if args.symtable:
+        from spy.parser import Parser
+        from spy.irgen.scope import ScopeAnalyzer
         parser = Parser.from_filename(str(args.filename))
         mod = parser.parse()
-        if args.parse:
-            mod.pp()
-        elif args.symtable:
-            scopes = ScopeAnalyzer(vm, modname, mod)
-            scopes.analyze()
-            scopes.pp()
+        scopes = ScopeAnalyzer(vm, modname, mod)
+        scopes.analyze()
+        scopes.pp()
         return
 
-    w_mod = vm.import_(modname)
+    cache = None
+    w_mod = None
+    if args.filename.suffix == '.spyc':
+        # precompiled module: it's already redshifted
+        w_mod = load_module(vm, args.filename.read_bytes())
+    elif args.cache and (args.redshift or args.cwrite or args.compile):
+        from spy.cache import RedshiftCache
+        cache = RedshiftCache.for_file(py.path.local(args.filename))
+        w_mod = cache.load(vm, modname, py.path.local(args.filename))
+        if w_mod is not None:
+            cache = None # cache hit, nothing to store
+    if w_mod is None:
+        w_mod = vm.import_(modname)
 
     if args.execute:
+        from spy.vm.b import B
+        from spy.vm.function import W_Func, W_FuncType
         w_main_functype = W_FuncType.parse('def() -> void')
         w_main = w_mod.getattr_maybe('main')
         if w_main is None:
@@ -184,21 +261,46 @@ def do_main(args: Arguments) -> None:
 
         return
 
+    if args.cwrite or args.compile:
+        from spy.compiler import Compiler
+        from spy.cbuild import get_toolchain, BUILD_TYPE
+        compiler = Compiler(vm, modname, py.path.local(builddir),
+                            dump_c=False, exports=args.export or None)
+        compiler.redshift(tree_shake=args.tree_shake)
+        if args.timeit:
+            print_redshift_timings(vm)
+        if cache:
+            cache.store(vm, modname, py.path.local(args.filename))
+        if args.cwrite:
+            build_type: BUILD_TYPE = ("release" if args.release_mode
+                                      else "debug")
+            t = get_toolchain(args.toolchain, build_type=build_type)
+            compiler.cwrite(t.TARGET)
+        else:
+            compiler.cbuild(
+                opt_level=args.opt_level,
+                debug_symbols=args.debug_symbols,
+                toolchain_type=args.toolchain,
+                release_mode=args.release_mode,
+            )
+        return
+
     vm.redshift()
+    if args.timeit:
+        print_redshift_timings(vm)
+    if cache:
+        cache.store(vm, modname, py.path.local(args.filename))
     if args.redshift:
         dump_spy_mod(vm, modname, args.pretty)
         return
 
-    compiler = Compiler(vm, modname, py.path.local(builddir),
-                        dump_c=False)
-    if args.cwrite:
-        build_type: BUILD_TYPE = "release" if args.release_mode else "debug"
-        t = get_toolchain(args.toolchain, build_type=build_type)
-        compiler.cwrite(t.TARGET)
-    else:
-        compiler.cbuild(
-            opt_level=args.opt_level,
-            debug_symbols=args.debug_symbols,
-            toolchain_type=args.toolchain,
-            release_mode=args.release_mode,
-        )
+    if args.pysrc:
+        from spy.backend.python import PyBackend
+        print(PyBackend(vm).compile_mod(modname))
+        return
+
+    if args.spyc:
+        from spy.vm.bytecode import dump_module
+        builddir.joinpath(f'{modname}.spyc').write_bytes(
+            dump_module(vm, modname))
+        return
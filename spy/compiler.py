@@ -1,8 +1,9 @@
 import os
-from enum import Enum
+from typing import Optional
 import py.path
+from spy.fqn import FQN
 from spy.backend.c.cwriter import CModuleWriter
-from spy.cbuild import get_toolchain, BUILD_TYPE
+from spy.cbuild import get_toolchain, BUILD_TYPE, ToolchainType
 from spy.vm.vm import SPyVM
 from spy.vm.module import W_Module
 from spy.vm.function import W_ASTFunc
@@ -11,12 +12,6 @@ from spy.util import highlight_C_maybe
 
 DUMP_WASM = False
 
-class ToolchainType(str, Enum):
-    zig = "zig"
-    clang = "clang"
-    emscripten = "emscripten"
-    native = "native"
-
 class Compiler:
     """
     Take a module inside a VM and compile it to C/WASM.
@@ -26,25 +21,66 @@ class Compiler:
     builddir: py.path.local
     file_c: py.path.local    # output file
     file_wasm: py.path.local # output file
+    # names which are exported from the module, in addition to main(). If
+    # None, all red functions and i32 variables are exported.
+    exports: Optional[list[str]]
+    # if not None, only these FQNs are emitted, see redshift()
+    reachable: Optional[set[FQN]]
 
     def __init__(self, vm: SPyVM, modname: str,
                  builddir: py.path.local,
                  *,
-                 dump_c: bool) -> None:
+                 dump_c: bool,
+                 exports: Optional[list[str]] = None) -> None:
         self.vm = vm
         self.dump_c = dump_c
         self.w_mod = vm.modules_w[modname]
+        self.exports = exports
+        self.reachable = None
         basename = modname
         self.file_c = builddir.join(f'{basename}.c')
         self.file_wasm = builddir.join(f'{basename}.wasm')
 
+    def redshift(self, *, tree_shake: bool = False) -> None:
+        """
+        Redshift the code to compile.
+
+        If tree_shake is True, only the functions which are reachable from
+        main() and the exported names are redshifted, and everything else
+        is left out of the C code.
+        """
+        if tree_shake:
+            self.reachable = self.vm.redshift_reachable(self.get_roots())
+        else:
+            self.vm.redshift()
+
+    def get_roots(self) -> list[FQN]:
+        names = ['main'] + (self.exports or [])
+        return [FQN([self.w_mod.name, name]) for name in names
+                if self.w_mod.getattr_maybe(name) is not None]
+
+    def get_exports(self) -> list[str]:
+        if self.exports is None and self.reachable is None:
+            # ok, this logic is wrong: we cannot know which names we want to
+            # export by simply looking at their type: for example, in case of
+            # variables we want to export "red variables" but we don't want
+            # to export "blue variabes" (I guess?). For now, let's just
+            # include red functions and integers
+            return [
+                fqn.c_name
+                for fqn, w_obj in self.w_mod.items_w()
+                if (isinstance(w_obj, W_ASTFunc) and w_obj.color == 'red' or
+                    isinstance(w_obj, W_I32))
+            ]
+        return [fqn.c_name for fqn in self.get_roots()]
+
     def cwrite(self, target: str) -> py.path.local:
         """
         Convert the W_Module into a .c file
         """
         file_spy = py.path.local(self.w_mod.filepath)
         self.cwriter = CModuleWriter(self.vm, self.w_mod, file_spy, self.file_c,
-                                     target)
+                                     target, reachable=self.reachable)
         self.cwriter.write_c_source()
         #
         if self.dump_c:
@@ -67,17 +103,7 @@ class Compiler:
         toolchain = get_toolchain(toolchain_type, build_type=build_type)
         file_c = self.cwrite(toolchain.TARGET)
         if toolchain.TARGET == 'wasi':
-            # ok, this logic is wrong: we cannot know which names we want to
-            # export by simply looking at their type: for example, in case of
-            # variables we want to export "red variables" but we don't want to
-            # export "blue variabes" (I guess?). For now, let's just include
-            # red functions and integers
-            exports = [
-                fqn.c_name
-                for fqn, w_obj in self.w_mod.items_w()
-                if (isinstance(w_obj, W_ASTFunc) and w_obj.color == 'red' or
-                    isinstance(w_obj, W_I32))
-            ]
+            exports = self.get_exports()
             file_wasm = toolchain.c2wasm(file_c, self.file_wasm,
                                          exports=exports,
                                          opt_level=opt_level,
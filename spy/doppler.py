@@ -1,4 +1,4 @@
-from typing import Any, Optional, TYPE_CHECKING
+from typing import Any, Optional, Iterator, TYPE_CHECKING
 from types import NoneType
 from fixedint import FixedInt
 from spy import ast
@@ -23,6 +23,27 @@ def redshift(vm: 'SPyVM', w_func: W_ASTFunc) -> W_ASTFunc:
     return dop.redshift()
 
 
+def get_references(w_func: W_ASTFunc) -> Iterator[FQN]:
+    """
+    Yield the FQNs of the globals referenced by a redshifted function, i.e.
+    FQNConsts and names of global variables.
+    """
+    assert w_func.redshifted
+    symtable = w_func.funcdef.symtable
+    for stmt in w_func.funcdef.body:
+        for node in stmt.walk():
+            if isinstance(node, ast.FQNConst):
+                yield node.fqn
+            elif isinstance(node, ast.Name):
+                sym = symtable.lookup(node.id)
+                if sym.is_global:
+                    yield sym.fqn
+            elif isinstance(node, ast.Assign):
+                sym = symtable.lookup(node.target.value)
+                if sym.is_global:
+                    yield sym.fqn
+
+
 def make_const(vm: 'SPyVM', loc: Loc, w_val: W_Object) -> ast.Expr:
     """
     Create an AST node to represent a constant of the given w_val.
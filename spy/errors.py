@@ -3,7 +3,6 @@ from dataclasses import dataclass
 import linecache
 from spy.location import Loc
 from spy.textbuilder import ColorFormatter
-from spy.libspy import SPyPanicError
 
 Level = Literal["error", "note"]
 
@@ -125,5 +124,11 @@ class SPyNameError(SPyError):
 class SPyRuntimeError(Exception):
     pass
 
+class SPyPanicError(Exception):
+    """
+    Python-level exception raised when a WASM module aborts with a call to
+    spy_panic().
+    """
+
 class SPyRuntimeAbort(SPyRuntimeError):
     pass
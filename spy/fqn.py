@@ -139,6 +139,10 @@ class FQN:
             fqn.suffix = suffix
             return fqn
 
+    def __getnewargs_ex__(self) -> tuple[tuple, dict[str, Any]]:
+        # needed by pickle, see spy.cache.ParseCache
+        return (self.parts,), {'suffix': self.suffix}
+
     def with_suffix(self, suffix: str) -> 'FQN':
         res = FQN(self.parts)
         res.suffix = suffix
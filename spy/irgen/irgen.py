@@ -1,13 +1,15 @@
-from typing import Any
+from typing import Any, Optional
 import py.path
 import spy.ast
 from spy.fqn import FQN
 from spy.parser import Parser
 from spy.irgen.scope import ScopeAnalyzer
+from spy.irgen.symtable import SymTable
 from spy.vm.modframe import ModFrame
 
 from spy.vm.vm import SPyVM
 from spy.vm.module import W_Module
+from spy.cache import ParseCache
 
 
 def make_w_mod_from_file(vm: SPyVM, f: py.path.local) -> W_Module:
@@ -15,13 +17,36 @@ def make_w_mod_from_file(vm: SPyVM, f: py.path.local) -> W_Module:
     Glue together all the various pieces which are necessary to convert SPy
     source code into an W_Module.
     """
-    parser = Parser.from_filename(str(f))
-    mod = parser.parse()
     modname = f.purebasename
-    scopes = ScopeAnalyzer(vm, modname, mod)
-    scopes.analyze()
-    symtable = scopes.by_module()
+    cache: Optional[ParseCache] = None
+    res = None
+    if vm.parse_cache:
+        cache = ParseCache.for_file(f)
+        res = cache.load(modname, f)
+    if res is not None and imports_exist(vm, res[0]):
+        mod, symtable = res
+    else:
+        mod, symtable = parse_and_analyze(vm, modname, f)
+        if cache and res is None:
+            cache.store(modname, f, mod, symtable)
     fqn = FQN(modname)
     modframe = ModFrame(vm, fqn, symtable, mod)
     w_mod = modframe.run()
     return w_mod
+
+def parse_and_analyze(vm: SPyVM, modname: str,
+                      f: py.path.local) -> tuple[spy.ast.Module, SymTable]:
+    parser = Parser.from_filename(str(f))
+    mod = parser.parse()
+    scopes = ScopeAnalyzer(vm, modname, mod)
+    scopes.analyze()
+    return mod, scopes.by_module()
+
+def imports_exist(vm: SPyVM, mod: spy.ast.Module) -> bool:
+    """
+    Check that all the names imported by mod exist. ScopeAnalyzer reports
+    an error if they don't, so we cannot use the cached symtables.
+    """
+    return all(vm.lookup_global(decl.fqn) is not None
+               for decl in mod.decls
+               if isinstance(decl, spy.ast.Import))
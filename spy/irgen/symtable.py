@@ -40,6 +40,12 @@ class Symbol:
     level: int
     fqn: Optional[FQN] = None
 
+    # index of the local variable inside the frame which owns the symbol,
+    # assigned by SymTable.add. Captured symbols (level > 0) keep the slot of
+    # their definition, so that they can be found in the closure of the
+    # function.
+    slot: int = -1
+
     def replace(self, **kwargs: Any) -> 'Symbol':
         return replace(self, **kwargs)
 
@@ -64,10 +70,12 @@ class SymTable:
     """
     name: str  # just for debugging
     _symbols: dict[str, Symbol]
+    n_slots: int  # number of definitions, i.e. of locals of the frame
 
     def __init__(self, name: str) -> None:
         self.name = name
         self._symbols = {}
+        self.n_slots = 0
 
     @classmethod
     def from_builtins(cls, vm: 'SPyVM') -> 'SymTable':
@@ -113,6 +121,10 @@ class SymTable:
 
     def add(self, sym: Symbol) -> None:
         assert sym.name not in self._symbols
+        if sym.is_local:
+            assert sym.slot == -1
+            sym.slot = self.n_slots
+            self.n_slots += 1
         self._symbols[sym.name] = sym
 
     def has_definition(self, name: str) -> bool:
@@ -2,6 +2,7 @@ from typing import Any, Optional
 import wasmtime as wt
 import spy
 from spy.llwasm import LLWasmModule, LLWasmInstance, HostModule
+from spy.errors import SPyPanicError
 #from spy.vm.str import ll_spy_Str_read
 
 SRC = spy.ROOT.join('libspy', 'src')
@@ -14,7 +15,28 @@ LIBSPY_WASM = spy.ROOT.join('libspy', 'build', 'wasi', 'debug', 'libspy.wasm')
 # what to do when we do e.g. spy -c --release fine sine
 
 
-LLMOD = LLWasmModule(LIBSPY_WASM)
+_LLMOD: Optional[LLWasmModule] = None
+_INITIAL_MEMORY: Optional[bytes] = None
+
+def get_LLMOD() -> LLWasmModule:
+    """
+    Return the compiled libspy.wasm. It is loaded lazily, so that importing
+    spy.libspy is cheap.
+    """
+    global _LLMOD
+    if _LLMOD is None:
+        _LLMOD = LLWasmModule(LIBSPY_WASM, cache=True)
+    return _LLMOD
+
+def get_initial_memory() -> bytes:
+    """
+    Return the content of the linear memory of a freshly instantiated
+    libspy.
+    """
+    global _INITIAL_MEMORY
+    if _INITIAL_MEMORY is None:
+        _INITIAL_MEMORY = LLSPyInstance(get_LLMOD()).mem.read_all()
+    return _INITIAL_MEMORY
 
 class LibSPyHost(HostModule):
     log: list[str]
@@ -47,13 +69,6 @@ class LibSPyHost(HostModule):
         ba = self.ll.mem.read_cstr(ptr)
         self.panic_message = ba.decode('utf-8')
 
-
-class SPyPanicError(Exception):
-    """
-    Python-level exception raised when a WASM module aborts with a call to
-    spy_panic().
-    """
-
 class LLSPyInstance(LLWasmInstance):
     """
     A specialized version of LLWasmInstance which automatically link against
@@ -11,6 +11,8 @@ It is called 'LL' for two reasons:
     been very confusing :)
 """
 
+import os
+import hashlib
 from typing import Any, Optional, Literal
 from typing_extensions import Self
 import py.path
@@ -19,14 +21,81 @@ import struct
 
 LLWasmType = Literal[None, 'void *', 'int32_t', 'int16_t']
 ENGINE = wt.Engine()
+PAGE_SIZE = 65536
+
+def _default_cache_dir() -> Optional[py.path.local]:
+    d = os.environ.get('SPY_WASM_CACHE')
+    if d is not None:
+        return py.path.local(d) if d else None
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return py.path.local(base).join('spy', 'wasmtime')
+
+# Directory where the compiled modules are cached, see compile_module. It can
+# be changed by setting SPY_WASM_CACHE, or disabled by setting it to ''.
+# Entries are never evicted, so only stable artifacts (e.g. libspy.wasm)
+# should be cached.
+WASM_CACHE_DIR = _default_cache_dir()
+
+def _get_engine_key() -> bytes:
+    """
+    The serialized modules can be loaded only by the same version of
+    wasmtime, on the same platform and with the same Config: ENGINE uses the
+    default one.
+
+    wasmtime-py doesn't expose its version (and importlib.metadata is slow to
+    import), so we identify it by the native library which it loaded: its
+    path contains the platform, and its size and mtime change whenever a
+    different version is installed.
+    """
+    libfile = wt._ffi.filename  # type: ignore
+    st = os.stat(libfile)
+    key = f'{libfile} {st.st_size} {st.st_mtime_ns} default-config'
+    return key.encode('utf-8')
+
+ENGINE_KEY = _get_engine_key()
+
+def compile_module(f: py.path.local, *, cache: bool = False) -> wt.Module:
+    """
+    Compile the given .wasm file. If cache is True, load the precompiled
+    module from WASM_CACHE_DIR.
+
+    The entries of the cache are keyed by the hash of the wasm and of
+    ENGINE_KEY, so they never need to be invalidated. On the other hand,
+    they are never removed: modules which are rebuilt often (e.g. the
+    output of the C backend) should not be cached.
+    """
+    wasm = f.read_binary()
+    if not cache or WASM_CACHE_DIR is None:
+        return wt.Module(ENGINE, wasm)
+    key = hashlib.sha256(ENGINE_KEY + wasm).hexdigest()
+    cached = WASM_CACHE_DIR.join(f'{key}.cwasm')
+    if cached.check(file=True):
+        try:
+            # NOTE: deserialize_file would mmap the file, and the loaded
+            # modules would crash if the entry is overwritten in place
+            return wt.Module.deserialize(ENGINE, cached.read_binary())
+        except wt.WasmtimeError:
+            pass # corrupted or incompatible: compile it again
+    mod = wt.Module(ENGINE, wasm)
+    try:
+        WASM_CACHE_DIR.ensure(dir=True)
+        # write to a temporary file and rename, so that concurrent processes
+        # never see a half-written entry
+        tmp = cached.new(ext=f'.{os.getpid()}.tmp')
+        tmp.write_binary(mod.serialize())
+        tmp.rename(cached)
+    except OSError:
+        pass # the cache is not writable, nothing to do
+    return mod
+
 
 class LLWasmModule:
     f: py.path.local
     mod: wt.Module
 
-    def __init__(self, f: py.path.local) -> None:
+    def __init__(self, f: py.path.local, *, cache: bool = False) -> None:
         self.f = f
-        self.mod = wt.Module.from_file(ENGINE, str(f))
+        self.mod = compile_module(f, cache=cache)
 
     def __repr__(self) -> str:
         return f'<LLWasmModule {self.f}>'
@@ -217,6 +286,22 @@ class LLWasmMemory:
         """
         return self.mem.read(self.store, addr, addr+n)
 
+    def read_all(self) -> bytes:
+        """
+        Return a copy of the whole memory
+        """
+        return bytes(self.read(0, self.mem.data_len(self.store)))
+
+    def write_all(self, data: bytes) -> None:
+        """
+        Overwrite the memory with the given image, e.g. one obtained by
+        read_all(). The memory is grown if needed.
+        """
+        size = self.mem.data_len(self.store)
+        if len(data) > size:
+            self.mem.grow(self.store, (len(data) - size) // PAGE_SIZE)
+        self.write(0, data)
+
     def read_i32(self, addr: int) -> int:
         rawbytes = self.read(addr, 4)
         return struct.unpack('i', rawbytes)[0]
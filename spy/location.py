@@ -1,20 +1,89 @@
 import sys
 import inspect
 import linecache
-import dataclasses
-from dataclasses import dataclass
-from typing import Callable
+from typing import Callable, Any
+
+# All the Locs of a file share the same filename: we store it only once in
+# FILENAMES, and the Locs refer to it by its index
+FILENAMES: list[str] = []
+FILE_IDS: dict[str, int] = {}
+
+def get_file_id(filename: str) -> int:
+    file_id = FILE_IDS.get(filename)
+    if file_id is None:
+        file_id = FILE_IDS[filename] = len(FILENAMES)
+        FILENAMES.append(filename)
+    return file_id
+
+# line and col numbers are packed into a single int, FIELD_BITS each. col_end
+# can be -1 (see Loc.here), so we store col_end + 1.
+FIELD_BITS = 32
+FIELD_MASK = (1 << FIELD_BITS) - 1
 
-@dataclass
 class Loc:
     """
-    Represent a location inside the source code
+    Represent a location inside the source code.
+
+    There is one Loc for every AST node, so they need to be compact: instead
+    of the filename and four ints, each Loc stores the index of the filename
+    in FILENAMES and a single packed int. The usual attributes (filename,
+    line_start, etc.) are computed on demand.
     """
-    filename: str
-    line_start: int
-    line_end: int
-    col_start: int
-    col_end: int
+    __slots__ = ('_file_id', '_packed')
+    _file_id: int
+    _packed: int
+
+    def __init__(self, filename: str, line_start: int, line_end: int,
+                 col_start: int, col_end: int) -> None:
+        self._file_id = get_file_id(filename)
+        self._packed = self.pack(line_start, line_end, col_start, col_end)
+
+    @staticmethod
+    def pack(line_start: int, line_end: int,
+             col_start: int, col_end: int) -> int:
+        col_end += 1
+        assert 0 <= line_start <= FIELD_MASK and 0 <= line_end <= FIELD_MASK
+        assert 0 <= col_start <= FIELD_MASK and 0 <= col_end <= FIELD_MASK
+        return (line_start |
+                line_end << FIELD_BITS |
+                col_start << 2*FIELD_BITS |
+                col_end << 3*FIELD_BITS)
+
+    def _get(self, i: int) -> int:
+        return (self._packed >> (i * FIELD_BITS)) & FIELD_MASK
+
+    @property
+    def filename(self) -> str:
+        return FILENAMES[self._file_id]
+
+    @property
+    def line_start(self) -> int:
+        return self._get(0)
+
+    @property
+    def line_end(self) -> int:
+        return self._get(1)
+
+    @property
+    def col_start(self) -> int:
+        return self._get(2)
+
+    @property
+    def col_end(self) -> int:
+        return self._get(3) - 1
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Loc):
+            return NotImplemented
+        return (self._file_id == other._file_id and
+                self._packed == other._packed)
+
+    # like a non-frozen dataclass, Locs compare by value but are not hashable
+    __hash__ = None  # type: ignore
+
+    def __reduce__(self) -> tuple:
+        # _file_id is valid only in the current process
+        return (_unpickle_loc, (self.filename, self._packed))
 
     @classmethod
     def here(cls, level: int = -1) -> 'Loc':
@@ -75,7 +144,14 @@ class Loc:
         )
 
     def replace(self, **kwargs: int) -> 'Loc':
-        return dataclasses.replace(self, **kwargs)
+        fields = dict(
+            line_start = self.line_start,
+            line_end = self.line_end,
+            col_start = self.col_start,
+            col_end = self.col_end,
+        )
+        fields.update(kwargs)
+        return Loc(self.filename, **fields)
 
     def make_end_loc(self) -> 'Loc':
         """
@@ -115,3 +191,48 @@ class Loc:
         ann = Annotation('note', '', self)
         fmt.emit_annotation(ann)
         print(fmt.build())
+
+def _unpickle_loc(filename: str, packed: int) -> Loc:
+    loc = Loc.__new__(Loc)
+    loc._file_id = get_file_id(filename)
+    loc._packed = packed
+    return loc
+
+
+class LazyLoc:
+    """
+    A cheaper version of Loc.here(), for hot paths.
+
+    Creating a full Loc for every W_OpArg is expensive, and most of the time
+    the Loc is never used: it's needed only to format error messages. A
+    LazyLoc records only the filename and the line number, and it is turned
+    into the very same Loc which Loc.here() would return by materialize().
+    """
+    __slots__ = ('filename', 'lineno')
+    filename: str
+    lineno: int
+
+    def __init__(self, filename: str, lineno: int) -> None:
+        self.filename = filename
+        self.lineno = lineno
+
+    @classmethod
+    def here(cls, level: int = -1) -> 'LazyLoc':
+        """
+        Like Loc.here()
+        """
+        assert level < 0
+        f = sys._getframe(-level)
+        return cls(f.f_code.co_filename, f.f_lineno)
+
+    def __repr__(self) -> str:
+        return f"<LazyLoc: '{self.filename} {self.lineno}'>"
+
+    def materialize(self) -> Loc:
+        return Loc(
+            filename = self.filename,
+            line_start = self.lineno,
+            line_end = self.lineno,
+            col_start = 0,
+            col_end = -1 # whole line
+        )
@@ -8,103 +8,182 @@ We want to reuse the Python parser, but the line above is not valid syntax.
 
 The idea is the following:
 
-1. tokenize the source
-
-2. search for pairs of NAMEs starting with 'var' (from the point of view of
-   the tokenizer, 'var' is a plain NAME
-
-3. remove the 'var' token, and keep track of the location in which it was seen
-
-4. turn back the (modified) tokens into source code
-
-5. parse the generated source code into an AST
-
-6. add a new field "is_var: bool" to all ast.Name nodes, using the infos
-   gathered at point (3)
-
-It is important to make sure that whitespace is preserved as much as possible,
-because we want the AST to contain location info which match the actual file
-on disk. For this, we use the `untokenize` module (available on PyPI) which
-does exactly that.
+1. search for the 'var' keywords which are followed by a NAME at the
+   beginning of a line
+
+2. rewrite them in place, moving the NAME where the 'var' was, and keep track
+   of the (line, col) of the NAME in its new position. Basically, we want to
+   turn:
+       var x: i32 = 100
+   into:
+       x    : i32 = 100
+
+3. parse the modified source code into an AST
+
+4. add a new field "is_var: bool" to ast.Name nodes: it's False by default,
+   and we set it to True on the targets of the assignments whose (line, col)
+   was recorded at point (2)
+
+Since the rewrite doesn't change the length of the line, all the other
+tokens keep their position, so the AST contains location info which match
+the actual file on disk.
+
+Step (1) is done with a regexp, which is much faster than tokenizing the
+whole source, but it cannot distinguish e.g. a 'var x' which happens to be at
+the beginning of a line inside a multiline string. We detect this case
+because in step (4) some of the recorded locations are not found (or because
+step (3) raises SyntaxError, e.g. for a 'var' which is not at the beginning
+of a line), and we fall back to preprocess_tokenize(), which uses the
+tokenizer to find the real 'var' tokens. In that case, we tag all the
+ast.Name at the recorded locations, not only the targets of the assignments.
 """
 
-from dataclasses import dataclass
+import re
+import keyword
 import ast as py_ast
-from tokenize import tokenize, NUMBER, STRING, NAME, OP, TokenInfo
+from tokenize import tokenize, NAME, TokenInfo
 from io import BytesIO
-from spy.vendored import untokenize
+from typing import Iterator
 import spy.ast_dump
 
-@dataclass(frozen=True)
-class LocInfo:
-    lineno: int
-    end_lineno: int
-    col_offset: int
-    end_col_offset: int
+# the (line, col) of the NAMEs which follow a 'var', after the rewrite. col
+# is the offset in bytes, as in the Python AST.
+VarLocs = set[tuple[int, int]]
+
+# see the stubs for _ast.Name
+py_ast.Name.is_var = False
+
+VAR_RE = re.compile(r'^([ \t]*)var[ \t]+([A-Za-z_][A-Za-z0-9_]*)',
+                    re.MULTILINE)
 
 def magic_py_parse(src: str) -> py_ast.Module:
     """
     Like ast.parse, but supports the new "var" syntax. See the module
     docstring for more info.
     """
+    if 'var' not in src:
+        return py_ast.parse(src)
     src2, var_locs = preprocess(src)
-    py_mod = py_ast.parse(src2)
+    try:
+        py_mod = py_ast.parse(src2)
+        ok = tag_vars(py_mod, var_locs)
+    except SyntaxError:
+        ok = False
+    if not ok:
+        # some of the matches are not real 'var' (e.g., they are inside a
+        # string), or there are 'var' which are not at the beginning of a
+        # line: use the slow but precise path
+        src2, var_locs = preprocess_tokenize(src)
+        py_mod = py_ast.parse(src2)
+        tag_names(py_mod, var_locs)
+    return py_mod
 
-    for node in py_ast.walk(py_mod):
-        if isinstance(node, py_ast.Name):
-            assert node.end_lineno is not None
-            assert node.end_col_offset is not None
-            loc = LocInfo(node.lineno, node.end_lineno,
-                          node.col_offset, node.end_col_offset)
-            node.is_var = loc in var_locs
+def rewrite_var(line: str, var_c: int, name_c: int, name: str) -> str:
+    """
+    Move the name at position name_c to position var_c, padding with spaces
+    """
+    name_end = name_c + len(name)
+    spaces = ' ' * (name_c - var_c)
+    return line[:var_c] + name + spaces + line[name_end:]
 
-    return py_mod
+def preprocess(src: str) -> tuple[str, VarLocs]:
+    """
+    Rewrite the 'var' declarations, see the module docstring. Return the new
+    source and the locations of the declared names.
+    """
+    var_locs: VarLocs = set()
+    parts = []
+    lineno = 1
+    pos = 0
+    for m in VAR_RE.finditer(src):
+        name = m.group(2)
+        if keyword.iskeyword(name):
+            continue # e.g. 'var in x': it's not a declaration
+        lineno += src.count('\n', pos, m.start())
+        # the line contains only whitespace before 'var', so character and
+        # byte offsets are the same
+        var_c = len(m.group(1))
+        name_c = m.start(2) - m.start()
+        parts.append(src[pos:m.start()])
+        parts.append(rewrite_var(m.group(0), var_c, name_c, name))
+        pos = m.end()
+        var_locs.add((lineno, var_c))
+    parts.append(src[pos:])
+    return ''.join(parts), var_locs
+
+def preprocess_tokenize(src: str) -> tuple[str, VarLocs]:
+    """
+    Like preprocess(), but it uses the tokenizer to find the 'var' tokens
+    """
+    lines = src.splitlines(keepends=True)
+    var_locs: VarLocs = set()
+    tokens = get_tokens(src)
+    for tok0, tok1 in zip(tokens, tokens[1:]):
+        if (tok0.type == NAME and tok0.string == 'var' and
+            tok1.type == NAME and not keyword.iskeyword(tok1.string)):
+            var_l, var_c = tok0.start
+            name_l, name_c = tok1.start
+            assert var_l == name_l, 'multiline var not supported'
+            line = lines[var_l - 1]
+            lines[var_l - 1] = rewrite_var(line, var_c, name_c, tok1.string)
+            # tokenize gives offsets in characters, the AST in bytes
+            var_col = len(line[:var_c].encode('utf-8'))
+            var_locs.add((var_l, var_col))
+    return ''.join(lines), var_locs
 
 def get_tokens(src: str) -> list[TokenInfo]:
     readline = BytesIO(src.encode('utf-8')).readline
     return list(tokenize(readline))
 
-def preprocess(src: str) -> tuple[str, set[LocInfo]]:
-    tokens = get_tokens(src)
-    newtokens = []
-    i = 0
-    N = len(tokens)
-    var_locs = set()
-
-    while i < N-1:
-        tok0 = tokens[i]
-        tok1 = tokens[i+1]
-        if tok0.type == NAME and tok0.string == 'var' and tok1.type == NAME:
-            # tok0 is 'var'
-            # tok1 is the name
-            # basically, we want to turn:
-            #     var x: i32 = 100
-            # into:
-            #     x    : i32 = 100
-            #
-            # so that the Locs in the final AST maps to the correct places in
-            # the original source code.
-            var_l0, var_c0 = tok0.start
-            var_l1, var_c1 = tok0.end
-            name_l0, name_c0 = tok1.start
-            name_l1, name_c1 = tok1.end
-            assert var_l0 == var_l1 == name_l0 == name_l1, \
-                'multiline var not supported'
-            spaces = ' ' * (name_c0 - var_c0)
-            newtok = TokenInfo(NAME, tok1.string + spaces,
-                               tok0.start, tok1.end, tok1.line)
-            newtokens.append(newtok)
-            # compute the location info of the future ast.Name
-            loc = LocInfo(
-                lineno = var_l0,
-                end_lineno = var_l0,
-                col_offset = var_c0,
-                end_col_offset = var_c0 + len(tok1.string)
-            )
-            var_locs.add(loc)
-            i += 1
+def iter_stmts(stmts: list[py_ast.stmt]) -> Iterator[py_ast.stmt]:
+    """
+    Iterate over all the statements, recursively, without visiting the
+    expressions
+    """
+    for stmt in stmts:
+        yield stmt
+        for field in ('body', 'orelse', 'finalbody'):
+            body = getattr(stmt, field, None)
+            if body:
+                yield from iter_stmts(body)
+        for handler in getattr(stmt, 'handlers', ()):
+            yield from iter_stmts(handler.body)
+        for case in getattr(stmt, 'cases', ()):
+            yield from iter_stmts(case.body)
+
+def tag_vars(py_mod: py_ast.Module, var_locs: VarLocs) -> bool:
+    """
+    Set is_var on the targets of the assignments which are in var_locs.
+    Return False if some of the var_locs were not found.
+    """
+    if not var_locs:
+        return True
+    found = 0
+    target: py_ast.expr
+    for stmt in iter_stmts(py_mod.body):
+        if isinstance(stmt, py_ast.AnnAssign):
+            target = stmt.target
+        elif isinstance(stmt, py_ast.Assign):
+            target = stmt.targets[0]
         else:
-            newtokens.append(tok0)
-        i += 1
-    src2 = untokenize.untokenize(newtokens)
-    return src2, var_locs
+            continue
+        if not isinstance(target, py_ast.Name):
+            continue
+        if (target.lineno, target.col_offset) in var_locs:
+            target.is_var = True
+            found += 1
+    return found == len(var_locs)
+
+def tag_names(py_mod: py_ast.Module, var_locs: VarLocs) -> None:
+    """
+    Set is_var on all the Names which are in var_locs, wherever they are.
+    This is slower than tag_vars, but it also tags the 'var' which are not
+    simple assignments (e.g. 'for var i in ...'): the parser reports a
+    proper error for them.
+    """
+    if not var_locs:
+        return
+    for node in py_ast.walk(py_mod):
+        if (isinstance(node, py_ast.Name) and
+            (node.lineno, node.col_offset) in var_locs):
+            node.is_var = True
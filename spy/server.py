@@ -0,0 +1,218 @@
+"""
+Warm compile server.
+
+Each invocation of the `spy` command pays for importing all the Python
+modules, compiling libspy.wasm with wasmtime and initializing the builtin
+modules. The server pays these costs only once and then accepts requests over
+a Unix socket, which makes it possible for editors and build systems to get a
+much faster turnaround: each request gets a fresh VM, cloned from a
+pre-initialized one (see SPyVM.snapshot).
+
+Start it with:
+
+    python -m spy.server /path/to/spy.sock
+
+The protocol is line-based: each request is a JSON object on a single line,
+and the server replies with a JSON object on a single line:
+
+    request:  {"argv": ["-C", "foo.spy"], "cwd": "/path/to/project"}
+    response: {"status": 0, "stdout": "...", "stderr": "...", "cached": false}
+
+`argv` are the same arguments accepted by the `spy` command (see spy.cli), so
+all the actions are available (--parse, --redshift, --cwrite, --compile,
+--execute, etc.), apart from --pdb. `cwd` is optional, and it's used to
+resolve relative paths.
+
+If the directory which contains the source file did not change since a
+previous identical request (i.e., no file was added, removed or modified),
+the previous response is returned without doing any work. Requests which
+execute code, or which print timings, are never cached.
+
+Requests are served one at a time: this is needed because each request
+changes the cwd and redirects sys.stdout and sys.stderr.
+"""
+
+import os
+import sys
+import io
+import json
+import socket
+import socketserver
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+from pathlib import Path
+from typing import Any, Optional
+import click
+import typer
+from spy.cli import app as cli_app
+from spy.vm.vm import SPyVM, VMSnapshot
+# spy.cli imports the various subsystems lazily, but we want them to be warm
+import spy.parser
+import spy.irgen.scope
+import spy.compiler
+import spy.backend.spy
+import spy.backend.python
+
+# the actions whose result can be reused if the sources didn't change
+CACHEABLE_ACTIONS = ["pyparse", "parse", "symtable", "redshift", "pysrc",
+                     "spyc", "cwrite", "compile"]
+
+DirSnapshot = dict[str, int]
+
+def snapshot_dir(d: Path) -> DirSnapshot:
+    """
+    Return the mtime of all the files in the given directory
+    """
+    return {
+        entry.name: entry.stat().st_mtime_ns
+        for entry in os.scandir(d)
+        if entry.is_file()
+    }
+
+
+class SPyServer(socketserver.UnixStreamServer):
+    """
+    Serve the requests for the `spy` command over a Unix socket.
+    """
+    command: click.Command
+    # a VM with the builtin modules already initialized: each request
+    # creates its VM from it, see spy.cli.do_main
+    template: VMSnapshot
+    # (cwd, argv) -> (snapshot, response)
+    cache: dict[tuple[str, tuple[str, ...]], tuple[DirSnapshot, dict]]
+
+    def __init__(self, socket_path: str) -> None:
+        self.command = typer.main.get_command(cli_app)
+        self.cache = {}
+        # warm up: this initializes all the builtin modules and libspy
+        vm = SPyVM()
+        vm.ll
+        self.template = vm.snapshot()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, SPyRequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):  # type: ignore
+            os.unlink(self.server_address)  # type: ignore
+
+    def handle_request_data(self, req: dict) -> dict:
+        argv = [str(arg) for arg in req['argv']]
+        cwd = req.get('cwd') or os.getcwd()
+        old_cwd = os.getcwd()
+        os.chdir(cwd)
+        try:
+            return self.run_command(cwd, argv)
+        finally:
+            os.chdir(old_cwd)
+
+    def run_command(self, cwd: str, argv: list[str]) -> dict:
+        out = io.StringIO()
+        err = io.StringIO()
+        status = 0
+        key = (cwd, tuple(argv))
+        snapshot = None
+        with redirect_stdout(out), redirect_stderr(err):
+            try:
+                ctx = self.command.make_context('spy', argv,
+                                                obj=self.template)
+                if ctx.params['pdb']:
+                    # it would block the server waiting for stdin
+                    raise click.UsageError('--pdb is not supported by the '
+                                           'server')
+                snapshot = self.get_snapshot(ctx.params)
+                if snapshot is not None and key in self.cache:
+                    old_snapshot, response = self.cache[key]
+                    if old_snapshot == snapshot:
+                        return dict(response, cached=True)
+                with ctx:
+                    self.command.invoke(ctx)
+            except click.ClickException as e:
+                e.show()
+                status = e.exit_code
+                snapshot = None
+            except click.exceptions.Exit as e:
+                # e.g. --help
+                status = e.exit_code
+                snapshot = None
+            except Exception:
+                traceback.print_exc()
+                status = 1
+                snapshot = None
+        response = {
+            'status': status,
+            'stdout': out.getvalue(),
+            'stderr': err.getvalue(),
+            'cached': False,
+        }
+        if snapshot is not None:
+            # take a new snapshot, which includes the files we just wrote
+            filename = Path(ctx.params['filename'])
+            self.cache[key] = (snapshot_dir(filename.parent), response)
+        return response
+
+    def get_snapshot(self, params: dict[str, Any]) -> Optional[DirSnapshot]:
+        """
+        Return the snapshot of the directory containing the file, or None if
+        the result of the command cannot be cached.
+        """
+        if params['execute'] or params['timeit'] or params['pdb']:
+            return None
+        if not any(params[action] for action in CACHEABLE_ACTIONS):
+            return None # it's an implicit --execute
+        filename = Path(params['filename'])
+        if not filename.exists():
+            return None
+        return snapshot_dir(filename.parent)
+
+
+class SPyRequestHandler(socketserver.StreamRequestHandler):
+    server: SPyServer
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                req = json.loads(line)
+                response = self.server.handle_request_data(req)
+            except (ValueError, KeyError, TypeError) as e:
+                response = {
+                    'status': 2,
+                    'stdout': '',
+                    'stderr': f'invalid request: {e}\n',
+                    'cached': False,
+                }
+            data = json.dumps(response) + '\n'
+            self.wfile.write(data.encode('utf-8'))
+            self.wfile.flush()
+
+
+def send_request(socket_path: str, argv: list[str],
+                 cwd: Optional[str] = None) -> dict:
+    """
+    Send a single request to a running server and return the response
+    """
+    req = {'argv': argv, 'cwd': cwd or os.getcwd()}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socket_path)
+        with s.makefile('rwb') as f:
+            f.write(json.dumps(req).encode('utf-8') + b'\n')
+            f.flush()
+            line = f.readline()
+    return json.loads(line)
+
+
+app = typer.Typer(pretty_exceptions_enable=False)
+
+@app.command()
+def main(socket_path: Path) -> None:
+    "Start a warm compile server listening on SOCKET_PATH"
+    with SPyServer(str(socket_path)) as server:
+        print(f'spy server listening on {socket_path}', file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == '__main__':
+    app()
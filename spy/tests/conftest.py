@@ -44,8 +44,27 @@ def pytest_addoption(parser):
         "--dump-redshift", action="store_true", default=False,
         help="Dump the redshifted module"
     )
+    parser.addoption(
+        "--no-ast-compile", action="store_true", default=False,
+        help="Run ASTFrames without compiling them into closures"
+    )
+    parser.addoption(
+        "--redshift-threshold", type=int, default=None, metavar="N",
+        help="Lazily redshift red functions after N calls"
+    )
 
 
+@pytest.fixture(scope='session', autouse=True)
+def wasm_cache_dir(tmp_path_factory):
+    """
+    Don't write the compiled wasm modules into the cache of the user
+    """
+    from spy import llwasm
+    with pytest.MonkeyPatch.context() as mp:
+        cachedir = py.path.local(tmp_path_factory.mktemp('wasmcache'))
+        mp.setattr(llwasm, 'WASM_CACHE_DIR', cachedir)
+        yield cachedir
+
 @pytest.fixture(autouse=True)
 def skip_if_no_emcc(request):
     if request.node.get_closest_marker("emscripten") and not HAVE_EMCC:
@@ -7,17 +7,28 @@ import py.path
 from spy import ast
 from spy.compiler import Compiler, ToolchainType
 from spy.backend.interp import InterpModuleWrapper
+from spy.backend.python import PyBackend
 from spy.backend.c.wrapper import WasmModuleWrapper
 from spy.cbuild import Toolchain, ZigToolchain
 from spy.errors import SPyError
 from spy.fqn import FQN
-from spy.vm.vm import SPyVM
+from spy.vm.vm import SPyVM, VMSnapshot
 from spy.vm.module import W_Module
 from spy.vm.function import W_FuncType
 
 Backend = Literal['interp', 'doppler', 'C']
 ALL_BACKENDS = Backend.__args__  # type: ignore
 
+# the tests create thousands of VMs: cloning a pre-initialized one is much
+# faster than creating each of them from scratch
+_VM_SNAPSHOT: Optional[VMSnapshot] = None
+
+def new_vm() -> SPyVM:
+    global _VM_SNAPSHOT
+    if _VM_SNAPSHOT is None:
+        _VM_SNAPSHOT = SPyVM().snapshot()
+    return SPyVM.from_snapshot(_VM_SNAPSHOT)
+
 def params_with_marks(params):
     """
     Small helper to automatically apply to each param a pytest.mark with the
@@ -111,8 +122,12 @@ class CompilerTest:
         self.tmpdir = tmpdir
         self.builddir = self.tmpdir.join('build').ensure(dir=True)
         self.backend = compiler_backend
-        self.vm = SPyVM()
+        self.vm = new_vm()
         self.vm.path.append(str(self.tmpdir))
+        if request.config.getoption('--no-ast-compile'):
+            self.vm.ast_compile = False
+        self.vm.redshift_threshold = request.config.getoption(
+            '--redshift-threshold')
 
     def write_file(self, filename: str, src: str) -> Any:
         """
@@ -160,6 +175,7 @@ class CompilerTest:
             self.vm.redshift()
             if self.dump_redshift:
                 self.dump_module(modname)
+            PyBackend(self.vm).load_mod(modname)
             interp_mod = InterpModuleWrapper(self.vm, self.w_mod)
             return interp_mod
         elif self.backend == 'C':
@@ -0,0 +1,158 @@
+from typing import Any
+import pytest
+import textwrap
+from spy import ast
+from spy.fqn import FQN
+from spy.backend.python import PyBackend, PyFuncWriter
+from spy.vm.b import B
+from spy.vm.function import W_ASTFunc
+from spy.errors import SPyTypeError
+from spy.util import print_diff
+from spy.tests.support import CompilerTest, only_interp
+
+@only_interp
+class TestPyBackend(CompilerTest):
+
+    def redshift(self, src: str) -> Any:
+        mod = self.compile(src)
+        self.vm.redshift()
+        b = PyBackend(self.vm)
+        b.load_mod('test')
+        return mod
+
+    def assert_src(self, expected: str, *, modname: str = 'test') -> None:
+        b = PyBackend(self.vm)
+        got = b.compile_mod(modname).strip()
+        expected = textwrap.dedent(expected).strip()
+        if got != expected:
+            print_diff(expected, got, 'expected', 'got')
+            pytest.fail('assert_src failed')
+
+    def test_i32_ops(self):
+        self.compile("""
+        def add(x: i32, y: i32) -> i32:
+            return x + y
+
+        def lt(x: i32, y: i32) -> bool:
+            return x < y
+        """)
+        self.vm.redshift()
+        self.assert_src("""
+        def add(v_x, v_y):
+            # test::add
+            return ((((v_x + v_y) + 2147483648) & 4294967295) - 2147483648)
+            no_return(loc)
+
+        def add_entry(args_w):
+            return I32(add(args_w[0].value, args_w[1].value))
+
+        def lt(v_x, v_y):
+            # test::lt
+            return (v_x < v_y)
+            no_return(loc_0)
+
+        def lt_entry(args_w):
+            return (TRUE if lt(args_w[0].value, args_w[1].value) else FALSE)
+        """)
+
+    def test_execute(self):
+        mod = self.redshift("""
+        var counter: i32 = 0
+
+        def fib(n: i32) -> i32:
+            if n < 2:
+                return n
+            return fib(n-1) + fib(n-2)
+
+        def loop(n: i32) -> f64:
+            i = 0
+            tot = 0.0
+            while i < n:
+                counter = counter + 1
+                tot = tot + fib(i) / 2
+                i = i + 1
+            return tot
+        """)
+        assert mod.fib.w_func.py_impl is not None
+        assert mod.fib(20) == 6765
+        assert mod.loop(10) == 41.0
+        assert mod.counter == 10
+
+    def test_i32_wraparound(self):
+        mod = self.redshift("""
+        def mul(x: i32, y: i32) -> i32:
+            return x * y
+        """)
+        assert mod.mul(1 << 20, 1 << 12) == 0
+        assert mod.mul(65536, 32768) == -(1 << 31)
+
+    def test_builtins_and_strings(self, capsys):
+        mod = self.redshift("""
+        def hello(name: str) -> str:
+            return "hello " + name
+
+        def main() -> void:
+            print(hello("world"))
+            print(abs(-5))
+        """)
+        assert mod.hello('SPy') == 'hello SPy'
+        mod.main()
+        out, err = capsys.readouterr()
+        assert out == 'hello world\n5\n'
+
+    def test_no_return(self):
+        mod = self.redshift("""
+        def foo(x: i32) -> i32:
+            if x:
+                return 1
+        """)
+        assert mod.foo(1) == 1
+        with pytest.raises(SPyTypeError,
+                           match='reached the end of the function'):
+            mod.foo(0)
+
+    def test_shadow_builtins(self):
+        # the conversion i32 => f64 uses float()
+        mod = self.redshift("""
+        def float(x: i32) -> i32:
+            return x + 100
+
+        def half(x: i32) -> f64:
+            return x / 2.0
+        """)
+        assert mod.half(3) == 1.5
+        assert mod.float(1) == 101
+
+    def test_name_clash_with_locals(self):
+        mod = self.redshift("""
+        def v_x() -> i32:
+            return 1
+
+        def foo(x: i32) -> i32:
+            return x + v_x()
+        """)
+        assert mod.foo(41) == 42
+        assert mod.v_x() == 1
+
+    def test_FQNConst(self):
+        self.compile("""
+        var x: i32 = 5
+        var y: f64 = 1.5
+        var z: bool = True
+
+        def foo() -> void:
+            pass
+        """)
+        self.vm.redshift()
+        w_foo = self.vm.lookup_global(FQN('test::foo'))
+        assert isinstance(w_foo, W_ASTFunc)
+        w = PyFuncWriter(PyBackend(self.vm), w_foo)
+        loc = w_foo.funcdef.loc
+
+        def fmt(name: str) -> Any:
+            const = ast.FQNConst(loc, FQN(f'test::{name}'))
+            return w.fmt_expr_FQNConst(const)
+
+        assert fmt('x') == ('5', B.w_i32)
+        assert fmt('y') == ('1.5', B.w_f64)
+        assert fmt('z') == ('True', B.w_bool)
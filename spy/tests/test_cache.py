@@ -0,0 +1,275 @@
+import textwrap
+import pytest
+from spy.fqn import FQN
+from spy.vm.vm import SPyVM
+from spy.vm.function import W_ASTFunc
+from spy.compiler import Compiler
+from spy.backend.spy import SPyBackend
+from spy.cache import RedshiftCache, ParseCache
+from spy.errors import SPyImportError
+
+
+@pytest.mark.usefixtures('init')
+class TestRedshiftCache:
+
+    @pytest.fixture
+    def init(self, tmpdir):
+        self.tmpdir = tmpdir
+        self.file_spy = tmpdir.join('test.spy')
+        self.cache = RedshiftCache.for_file(self.file_spy)
+
+    def new_vm(self) -> SPyVM:
+        vm = SPyVM()
+        vm.path.append(str(self.tmpdir))
+        return vm
+
+    def write(self, src: str) -> None:
+        self.file_spy.write(textwrap.dedent(src))
+
+    def build(self, *deps: str) -> SPyVM:
+        vm = self.new_vm()
+        for modname in deps:
+            vm.import_(modname)
+        vm.import_('test')
+        vm.redshift()
+        assert self.cache.store(vm, 'test', self.file_spy)
+        return vm
+
+    def load(self) -> SPyVM:
+        vm = self.new_vm()
+        w_mod = self.cache.load(vm, 'test', self.file_spy)
+        assert w_mod is not None
+        return vm
+
+    def cwrite(self, vm: SPyVM) -> str:
+        builddir = self.tmpdir.join('build').ensure(dir=True)
+        compiler = Compiler(vm, 'test', builddir, dump_c=False)
+        compiler.redshift()
+        csrc = compiler.cwrite('wasi').read()
+        assert isinstance(csrc, str)
+        return csrc
+
+    def test_hit(self):
+        self.write("""
+        var x: i32 = 42
+
+        def add(a: i32, b: i32) -> i32:
+            return a + b
+
+        def main() -> void:
+            print(add(x, 1))
+        """)
+        vm1 = self.build()
+        assert self.tmpdir.join('__spycache__').listdir('test-*.spyc')
+        vm2 = self.load()
+        w_main = vm2.lookup_global(FQN('test::main'))
+        assert isinstance(w_main, W_ASTFunc)
+        assert w_main.redshifted
+        # the C code is the same as the one of a fresh build
+        c1 = self.cwrite(vm1)
+        c2 = self.cwrite(vm2)
+        assert vm2.redshift_timings == {}
+        assert c1 == c2
+
+    def test_hit_control_flow(self):
+        # a hit must produce exactly the same code as a miss, also when the
+        # decompiler has to reconstruct nested loops and branches
+        self.write("""
+        def foo(a: bool, n: i32) -> i32:
+            res = 0
+            if a:
+                i = 0
+                while i < n:
+                    if i > 1:
+                        res = res + i
+                    i = i + 1
+            else:
+                while n > 0:
+                    j = 0
+                    while j < n:
+                        res = res + 1
+                        j = j + 1
+                    n = n - 1
+            if res > 10:
+                while res > 10:
+                    res = res - 10
+            return res
+
+        def main() -> void:
+            print(foo(True, 5))
+            print(foo(False, 3))
+        """)
+        vm1 = self.build()
+        vm2 = self.load()
+        b1 = SPyBackend(vm1)
+        b2 = SPyBackend(vm2)
+        assert b1.dump_mod('test') == b2.dump_mod('test')
+        assert self.cwrite(vm1) == self.cwrite(vm2)
+
+    def test_miss(self):
+        self.write("""
+        def main() -> void:
+            pass
+        """)
+        vm = self.new_vm()
+        assert self.cache.load(vm, 'test', self.file_spy) is None
+        self.build()
+        self.write("""
+        def main() -> void:
+            print('hello')
+        """)
+        assert self.cache.load(vm, 'test', self.file_spy) is None
+        # the old entry is replaced by the new one
+        self.build()
+        assert len(self.tmpdir.join('__spycache__').listdir('*.spyc')) == 1
+
+    def test_dependency_changed(self):
+        dep = self.tmpdir.join('dep.spy')
+        dep.write(textwrap.dedent("""
+        @blue
+        def ANSWER() -> i32:
+            return 42
+        """))
+        self.write("""
+        from dep import ANSWER
+
+        def main() -> i32:
+            return ANSWER()
+        """)
+        self.build('dep')
+        self.load()
+        dep.write(dep.read().replace('42', '43'))
+        assert self.cache.load(self.new_vm(), 'test', self.file_spy) is None
+
+    def test_not_cacheable(self):
+        # list[i32]::getitem exists only in the VM which did the redshift,
+        # so the entry could not be loaded: it's not stored, and the module
+        # must be rebuilt
+        self.write("""
+        def foo() -> i32:
+            l = [1, 2, 3]
+            return l[1]
+        """)
+        vm = self.new_vm()
+        vm.import_('test')
+        vm.redshift()
+        assert not self.cache.store(vm, 'test', self.file_spy)
+        assert not self.tmpdir.join('__spycache__').check()
+        vm = self.new_vm()
+        assert self.cache.load(vm, 'test', self.file_spy) is None
+        assert 'test' not in vm.modules_w
+        w_mod = vm.import_('test')
+        assert w_mod.getattr_maybe('foo') is not None
+
+    def test_struct_not_cacheable(self):
+        # the struct types don't exist in a fresh VM: __spycache__ must not
+        # be rewritten on every build
+        self.write("""
+        from unsafe import gc_alloc, ptr
+
+        @struct
+        class Point:
+            x: i32
+            y: i32
+
+        def main() -> void:
+            p = gc_alloc(Point)(1)
+            p.x = 1
+            print(p.x)
+        """)
+        for i in range(2):
+            vm = self.new_vm()
+            vm.import_('test')
+            vm.redshift()
+            assert not self.cache.store(vm, 'test', self.file_spy)
+            assert not self.tmpdir.join('__spycache__').check()
+
+
+@pytest.mark.usefixtures('init')
+class TestParseCache:
+
+    @pytest.fixture
+    def init(self, tmpdir):
+        self.tmpdir = tmpdir
+        self.file_spy = tmpdir.join('test.spy')
+        self.cache = ParseCache.for_file(self.file_spy)
+
+    def new_vm(self) -> SPyVM:
+        vm = SPyVM()
+        vm.path.append(str(self.tmpdir))
+        vm.parse_cache = True
+        return vm
+
+    def write(self, src: str) -> None:
+        self.file_spy.write(textwrap.dedent(src))
+
+    def call_foo(self) -> int:
+        vm = self.new_vm()
+        w_foo = vm.import_('test').getattr('foo')
+        assert isinstance(w_foo, W_ASTFunc)
+        return vm.unwrap(vm.fast_call(w_foo, []))
+
+    def test_hit(self, monkeypatch):
+        self.write("""
+        var x: i32 = 42
+
+        def add(a: i32, b: i32) -> i32:
+            return a + b
+
+        def get_x() -> i32:
+            return add(x, 1)
+        """)
+        vm1 = self.new_vm()
+        vm1.import_('test')
+        assert self.tmpdir.join('__spycache__').listdir('test-*.spyast')
+        # the second time, we don't parse the source nor store the entry
+        monkeypatch.setattr('spy.parser.Parser.parse', None)
+        monkeypatch.setattr(ParseCache, 'store', None)
+        vm2 = self.new_vm()
+        vm2.import_('test')
+        w_get_x = vm2.lookup_global(FQN('test::get_x'))
+        assert isinstance(w_get_x, W_ASTFunc)
+        assert w_get_x.funcdef.symtable.lookup('x').fqn == FQN('test::x')
+        assert vm2.unwrap(vm2.fast_call(w_get_x, [])) == 43
+
+    def test_miss(self):
+        self.write("""
+        def foo() -> i32:
+            return 1
+        """)
+        assert self.cache.load('test', self.file_spy) is None
+        self.new_vm().import_('test')
+        assert self.cache.load('test', self.file_spy) is not None
+        self.write("""
+        def foo() -> i32:
+            return 2
+        """)
+        assert self.cache.load('test', self.file_spy) is None
+        assert self.call_foo() == 2
+        assert len(self.tmpdir.join('__spycache__').listdir('*.spyast')) == 1
+
+    def test_corrupted(self):
+        self.write("""
+        def foo() -> i32:
+            return 1
+        """)
+        self.new_vm().import_('test')
+        entry = self.cache.get_path('test', self.file_spy)
+        entry.write_binary(b'garbage')
+        assert self.cache.load('test', self.file_spy) is None
+        assert self.call_foo() == 1
+        # the entry has been replaced
+        assert self.cache.load('test', self.file_spy) is not None
+
+    def test_import_not_found(self):
+        dep = self.tmpdir.join('dep.spy')
+        dep.write('def foo() -> i32:\n    return 1\n')
+        self.write("""
+        from dep import foo
+        """)
+        vm = self.new_vm()
+        vm.import_('dep')
+        vm.import_('test')
+        # the entry exists, but the import error must be reported anyway
+        with pytest.raises(SPyImportError, match="module `dep` does not exist"):
+            self.new_vm().import_('test')
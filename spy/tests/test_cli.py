@@ -1,9 +1,12 @@
 from typing import Any
 import re
+import sys
 import textwrap
+import subprocess
 from subprocess import getstatusoutput
 import pytest
 from typer.testing import CliRunner
+import spy
 from spy.cli import app
 
 
@@ -69,10 +72,42 @@ class TestMain:
         res, stdout = self.run(self.foo_spy)
         assert stdout == "hello world\n"
 
+    def test_execute_redshift_threshold(self):
+        self.foo_spy.write(textwrap.dedent("""
+        def add(x: i32, y: i32) -> i32:
+            return x + y
+
+        def main() -> void:
+            i = 0
+            while i < 5:
+                print(add(i, 1))
+                i = i + 1
+        """))
+        res, stdout = self.run('--redshift-threshold', '2', self.foo_spy)
+        assert stdout == "1\n2\n3\n4\n5\n"
+
     def test_redshift(self):
         res, stdout = self.run('--redshift', self.foo_spy)
         assert stdout.startswith('def add(x: i32, y: i32) -> i32:')
 
+    def test_redshift_timeit(self):
+        res, stdout = self.run('--redshift', '--timeit', self.foo_spy)
+        assert 'redshift: ' in res.output
+        assert 'foo::add' in res.output
+
+    def test_pysrc(self):
+        res, stdout = self.run('--pysrc', self.foo_spy)
+        assert stdout.startswith('def add(v_x, v_y):')
+
+    def test_spyc(self):
+        res, stdout = self.run('--spyc', self.main_spy)
+        main_spyc = self.tmpdir.join('main.spyc')
+        assert main_spyc.exists()
+        res, stdout = self.run('--redshift', main_spyc)
+        assert stdout.startswith('def main() -> void:')
+        res, stdout = self.run(main_spyc)
+        assert stdout == 'hello world\n'
+
     def test_cwrite(self):
         res, stdout = self.run('--cwrite', self.foo_spy)
         foo_c = self.tmpdir.join('foo.c')
@@ -80,6 +115,43 @@ class TestMain:
         csrc = foo_c.read()
         assert csrc.startswith('#include <spy.h>')
 
+    def test_cwrite_tree_shake(self):
+        self.main_spy.write(textwrap.dedent("""
+        def unused() -> void:
+            pass
+
+        def exported() -> i32:
+            return 42
+
+        def main() -> void:
+            print("hello world")
+        """))
+        res, stdout = self.run('--cwrite', '--tree-shake',
+                               '--export', 'exported', self.main_spy)
+        csrc = self.tmpdir.join('main.c').read()
+        assert 'spy_main$exported' in csrc
+        assert 'spy_main$unused' not in csrc
+
+    def test_tree_shake_cache(self):
+        res = self.runner.invoke(app, ['--cwrite', '--tree-shake', '--cache',
+                                       str(self.main_spy)])
+        assert res.exit_code == 2
+        assert 'cannot be used together' in decolorize(res.output)
+        assert not self.tmpdir.join('__spycache__').check()
+
+    def test_cwrite_cache(self):
+        res, stdout = self.run('--cwrite', '--cache', self.main_spy)
+        cachedir = self.tmpdir.join('__spycache__')
+        assert cachedir.listdir('main-*.spyc')
+        entries = {f: f.mtime() for f in cachedir.listdir()}
+        csrc1 = self.tmpdir.join('main.c').read()
+        # the second time, nothing is redshifted nor written into the cache
+        res, stdout = self.run('--cwrite', '--cache', '--timeit',
+                               self.main_spy)
+        assert 'redshift: 0.000 seconds' in res.output
+        assert self.tmpdir.join('main.c').read() == csrc1
+        assert {f: f.mtime() for f in cachedir.listdir()} == entries
+
     def test_build_wasm(self):
         res, stdout = self.run("--compile", self.foo_spy)
         foo_wasm = self.tmpdir.join('foo.wasm')
@@ -110,3 +182,44 @@ class TestMain:
         status, out = getstatusoutput(cmd)
         assert status == 0
         assert out == "hello world"
+
+
+class TestImportTime:
+    """
+    Check that each action of the CLI imports only the subsystems which it
+    needs, by looking at the output of `python -X importtime`.
+
+    We don't check the absolute timings, which depend on the machine, but
+    the number of imported modules is a good proxy for them. Use
+    benchmarks/import_time.py to see the actual numbers.
+    """
+
+    # modules which are slow to import and must not be imported
+    NO_VM = ['wasmtime', 'spy.vm.vm', 'spy.backend.c.cwriter', 'pdb']
+    NO_PARSER = NO_VM + ['spy.parser', 'spy.ast']
+
+    def get_imported_modules(self, argv: list[str]) -> list[str]:
+        env = {'PYTHONPATH': str(spy.ROOT.dirpath())}
+        cmd = [sys.executable, '-X', 'importtime', '-m', 'spy'] + argv
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        assert proc.returncode == 0, proc.stderr
+        modules = []
+        for line in proc.stderr.splitlines():
+            if line.startswith('import time:') and 'self [us]' not in line:
+                modules.append(line.split('|')[2].strip())
+        return modules
+
+    @pytest.mark.parametrize("action, forbidden, budget", [
+        ('--help',    NO_PARSER, 200),
+        ('--pyparse', NO_VM,     200),
+        ('--parse',   NO_VM,     200),
+        ('--cwrite',  [],        350),
+    ])
+    def test_import_budget(self, tmpdir, action, forbidden, budget):
+        hello = tmpdir.join('hello.spy')
+        hello.write('def main() -> void:\n    print("hello")\n')
+        argv = [action] if action == '--help' else [action, str(hello)]
+        modules = self.get_imported_modules(argv)
+        for modname in forbidden:
+            assert modname not in modules
+        assert len(modules) <= budget
@@ -0,0 +1,100 @@
+import textwrap
+import pytest
+from spy.fqn import FQN
+from spy.vm.vm import SPyVM
+from spy.vm.function import W_ASTFunc
+from spy.compiler import Compiler
+
+
+@pytest.mark.usefixtures('init')
+class TestCompiler:
+
+    @pytest.fixture
+    def init(self, tmpdir):
+        self.tmpdir = tmpdir
+        self.vm = SPyVM()
+        self.vm.path.append(str(self.tmpdir))
+
+    def compiler(self, src: str, **kwargs) -> Compiler:
+        self.tmpdir.join('test.spy').write(textwrap.dedent(src))
+        self.vm.import_('test')
+        return Compiler(self.vm, 'test', self.tmpdir, dump_c=False, **kwargs)
+
+    def redshifted(self, name: str) -> bool:
+        w_func = self.vm.lookup_global(FQN(['test', name]))
+        assert isinstance(w_func, W_ASTFunc)
+        return w_func.redshifted
+
+    def test_tree_shake(self):
+        compiler = self.compiler("""
+        var counter: i32 = 0
+        var unused_var: i32 = 0
+
+        @blue
+        def make_fn():
+            def fn(x: i32) -> i32:
+                return x * 2
+            return fn
+
+        def helper(x: i32) -> i32:
+            counter = counter + 1
+            return make_fn()(x)
+
+        def exported() -> i32:
+            return 42
+
+        def unused(x: i32) -> i32:
+            return helper(x)
+
+        def main() -> void:
+            print(helper(21))
+        """, exports=['exported'])
+        compiler.redshift(tree_shake=True)
+        assert compiler.reachable is not None
+        assert self.redshifted('main')
+        assert self.redshifted('helper')
+        assert self.redshifted('exported')
+        assert not self.redshifted('unused')
+        assert FQN('test::make_fn::fn#0') in compiler.reachable
+        assert FQN('test::counter') in compiler.reachable
+        assert FQN('test::unused_var') not in compiler.reachable
+        assert compiler.get_exports() == ['spy_test$main', 'spy_test$exported']
+        #
+        csrc = compiler.cwrite('wasi').read()
+        assert 'spy_test$helper' in csrc
+        assert 'spy_test$exported' in csrc
+        assert 'spy_test$make_fn$fn$0' in csrc
+        assert 'spy_test$counter' in csrc
+        assert 'spy_test$unused' not in csrc
+
+    def test_tree_shake_worklist(self):
+        compiler = self.compiler("""
+        def unused(x: i32) -> i32:
+            return x
+
+        def main() -> void:
+            pass
+        """)
+        compiler.redshift(tree_shake=True)
+        # only the unreachable functions are left to redshift
+        fqns = [fqn for fqn, w_func in self.vm.redshift_worklist]
+        assert fqns == [FQN('test::unused')]
+        self.vm.redshift()
+        assert self.redshifted('unused')
+        assert set(self.vm.redshift_timings) == {FQN('test::main'),
+                                                 FQN('test::unused')}
+
+    def test_no_tree_shake(self):
+        compiler = self.compiler("""
+        def unused(x: i32) -> i32:
+            return x
+
+        def main() -> void:
+            pass
+        """)
+        compiler.redshift()
+        assert compiler.reachable is None
+        assert self.redshifted('unused')
+        assert compiler.get_exports() == ['spy_test$unused', 'spy_test$main']
+        csrc = compiler.cwrite('wasi').read()
+        assert 'spy_test$unused' in csrc
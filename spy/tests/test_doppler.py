@@ -1,6 +1,7 @@
 import textwrap
 import pytest
 from spy import ast
+from spy.fqn import FQN
 from spy.vm.vm import SPyVM
 from spy.vm.function import W_ASTFunc
 from spy.backend.spy import SPyBackend, FQN_FORMAT
@@ -139,6 +140,27 @@ class TestDoppler:
             return x * 2
         """)
 
+    def test_worklist(self):
+        self.redshift("""
+        @blue
+        def make_fn():
+            def fn(x: i32) -> i32:
+                return x * 2
+            return fn
+
+        def foo() -> i32:
+            return make_fn()(21)
+        """)
+        # the closure is created by the redshift of foo, and redshifted too
+        assert not self.vm.redshift_worklist
+        timings = self.vm.redshift_timings
+        assert FQN('test::foo') in timings
+        assert FQN('test::make_fn::fn#0') in timings
+        assert FQN('test::make_fn') not in timings
+        w_fn = self.vm.lookup_global(FQN('test::make_fn::fn#0'))
+        assert isinstance(w_fn, W_ASTFunc)
+        assert w_fn.redshifted
+
     def test_call_func_already_redshifted(self):
         self.redshift("""
         @blue
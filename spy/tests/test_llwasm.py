@@ -1,4 +1,5 @@
 import pytest
+from spy import llwasm
 from spy.llwasm import LLWasmModule, LLWasmInstance, HostModule
 from spy.tests.support import CTest
 
@@ -133,3 +134,28 @@ class TestLLWasm(CTest):
         ll = LLWasmInstance(llmod, [math, recorder])
         assert ll.call('compute') == 900
         assert recorder.log == [100, 200]
+
+    def test_module_cache(self, monkeypatch):
+        cachedir = self.tmpdir.join('wasmcache')
+        monkeypatch.setattr(llwasm, 'WASM_CACHE_DIR', cachedir)
+        src = r"""
+        int add(int x, int y) {
+            return x+y;
+        }
+        """
+        test_wasm = self.compile(src, exports=['add'])
+        # by default, modules are not cached
+        LLWasmModule(test_wasm)
+        assert not cachedir.check()
+        LLWasmModule(test_wasm, cache=True)
+        entries = cachedir.listdir('*.cwasm')
+        assert len(entries) == 1
+        # the second time, the module is loaded from the cache
+        llmod = LLWasmModule(test_wasm, cache=True)
+        ll = LLWasmInstance(llmod)
+        assert ll.call('add', 4, 8) == 12
+        # corrupted entries are replaced
+        entries[0].write_binary(b'garbage')
+        llmod = LLWasmModule(test_wasm, cache=True)
+        assert LLWasmInstance(llmod).call('add', 4, 8) == 12
+        assert entries[0].read_binary() != b'garbage'
@@ -1,4 +1,4 @@
-from spy.location import Loc
+from spy.location import Loc, LazyLoc
 from spy.errors import Annotation
 
 def myfunc() -> Loc:
@@ -11,6 +11,24 @@ def test_Loc_here():
     exp = '    loc = Loc.here()'
     assert src == exp
 
+def test_LazyLoc_here():
+    def get_locs() -> tuple[Loc, LazyLoc]:
+        return Loc.here(-2), LazyLoc.here(-2)
+    loc, lazy = get_locs()
+    assert lazy.materialize() == loc
+    assert loc.get_src() == '    loc, lazy = get_locs()'
+
+def test_OpArg_lazy_loc():
+    from spy.vm.vm import SPyVM
+    from spy.vm.opimpl import W_OpArg
+    vm = SPyVM()
+    wop = W_OpArg.from_w_obj(vm, vm.wrap(42))
+    assert isinstance(wop._loc, LazyLoc)
+    assert wop.loc.get_src() == '    wop = W_OpArg.from_w_obj(vm, vm.wrap(42))'
+    assert wop.loc is wop.loc
+    # as_red() shares the lazy loc
+    assert wop.as_red(vm).loc == wop.loc
+
 def test_Loc_from_pyfunc():
     def decorator(fn):
         return fn
@@ -30,3 +48,22 @@ def test_Loc_from_pyfunc():
     loc = Loc.from_pyfunc(bar)
     src = loc.get_src()
     exp = '    def bar():'
+
+def test_Loc_packed():
+    loc = Loc('foo.spy', 100_000, 100_001, 0, -1)
+    assert loc.filename == 'foo.spy'
+    assert (loc.line_start, loc.line_end) == (100_000, 100_001)
+    assert (loc.col_start, loc.col_end) == (0, -1)
+    assert loc == Loc('foo.spy', 100_000, 100_001, 0, -1)
+    assert loc != Loc('bar.spy', 100_000, 100_001, 0, -1)
+    assert loc.replace(col_end=5) == Loc('foo.spy', 100_000, 100_001, 0, 5)
+    # the filename is stored only once
+    loc2 = Loc('foo.spy', 1, 1, 1, 1)
+    assert loc2._file_id == loc._file_id
+
+def test_Loc_pickle():
+    import pickle
+    loc = Loc('foo.spy', 1, 2, 3, 4)
+    loc2 = pickle.loads(pickle.dumps(loc))
+    assert loc2 == loc
+    assert repr(loc2) == "<Loc: 'foo.spy 1:3 2:4'>"
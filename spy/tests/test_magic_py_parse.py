@@ -1,4 +1,7 @@
+from typing import Any
 import textwrap
+import ast as py_ast
+import pytest
 from spy.magic_py_parse import magic_py_parse, preprocess
 from spy.ast_dump import dump
 
@@ -49,3 +52,62 @@ def test_magic_py_parse():
     )
     """)
     assert dumped.strip() == expected.strip()
+
+def get_var_names(py_mod: py_ast.Module) -> list[str]:
+    return [node.id for node in py_ast.walk(py_mod)
+            if isinstance(node, py_ast.Name) and node.is_var]
+
+def test_var_locs():
+    src = textwrap.dedent("""
+    def foo() -> void:
+        var    x: i32 = 100
+    """)
+    py_mod: Any = magic_py_parse(src)
+    stmt = py_mod.body[0].body[0]
+    assert stmt.target.is_var
+    assert (stmt.lineno, stmt.col_offset) == (3, 4)
+    # the annotation is not moved
+    assert (stmt.annotation.lineno, stmt.annotation.col_offset) == (3, 14)
+
+def test_var_in_string():
+    # the fast path finds 'var y' inside the string, and falls back to the
+    # tokenizer
+    src = textwrap.dedent('''
+    var x: i32 = 1
+    s: str = """
+    var y = 2
+    """
+    ''')
+    py_mod: Any = magic_py_parse(src)
+    assert get_var_names(py_mod) == ['x']
+    assert py_mod.body[1].value.value == '\nvar y = 2\n'
+
+def test_var_not_at_line_start():
+    src = textwrap.dedent("""
+    if True: var x = 'è'; var y = 2
+    """)
+    py_mod: Any = magic_py_parse(src)
+    assert get_var_names(py_mod) == ['x', 'y']
+    assign_y = py_mod.body[0].body[1]
+    assert assign_y.targets[0].col_offset == len("if True: var x = 'è'; "
+                                                 .encode('utf-8'))
+
+def test_var_as_identifier():
+    src = textwrap.dedent("""
+    var = 1
+    var in x
+    """)
+    py_mod = magic_py_parse(src)
+    assert get_var_names(py_mod) == []
+
+@pytest.mark.parametrize('src', [
+    'var x += 1',
+    'var x',
+    'var x, y = 1, 2',
+    'for var x in range(3):\n    pass',
+])
+def test_var_unusual_targets(src):
+    # these are not simple assignments: the parser reports an error or
+    # ignores them, but magic_py_parse must tag them anyway
+    py_mod = magic_py_parse(src + '\n')
+    assert get_var_names(py_mod) == ['x']
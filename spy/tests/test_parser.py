@@ -1002,3 +1002,11 @@ class TestParser:
         )
         """
         self.assert_dump(classdef, expected)
+
+def test_ast_nodes_have_slots():
+    # a single class without slots=True would give a __dict__ to all its
+    # subclasses
+    for name in dir(ast):
+        cls = getattr(ast, name)
+        if isinstance(cls, type) and issubclass(cls, ast.Node):
+            assert cls.__dictoffset__ == 0, f'{name} has a __dict__'
@@ -235,3 +235,23 @@ class TestScopeAnalyzer:
         assert a._symbols['x'] == MatchSymbol('x', 'red', level=0)
         assert b._symbols['x'] == MatchSymbol('x', 'red', level=1)
         assert c._symbols['x'] == MatchSymbol('x', 'red', level=2)
+
+    def test_slots(self):
+        scopes = self.analyze("""
+        def a(x: i32, y: i32) -> dynamic:
+            z = x + y
+            def b() -> i32:
+                w = 0
+                return z
+            return b
+        """)
+        funcdef = self.mod.get_funcdef('a')
+        a = scopes.by_funcdef(funcdef)
+        assert a.n_slots == 5  # x, y, @return, z, b
+        slots = [a.lookup(name).slot for name in ('x', 'y', '@return', 'z', 'b')]
+        assert sorted(slots) == list(range(5))
+        # captured symbols keep the slot of their definition
+        b = scopes.inner_scopes[funcdef.body[1]]  # type: ignore
+        assert b.n_slots == 2  # @return, w
+        assert b.lookup('z').level == 1
+        assert b.lookup('z').slot == a.lookup('z').slot
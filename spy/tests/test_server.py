@@ -0,0 +1,101 @@
+import textwrap
+import threading
+import pytest
+from spy.server import SPyServer, send_request
+from spy.vm.vm import SPyVM
+
+
+@pytest.mark.usefixtures('init')
+class TestServer:
+
+    @pytest.fixture
+    def init(self, tmpdir):
+        self.tmpdir = tmpdir
+        self.foo_spy = tmpdir.join('foo.spy')
+        self.foo_spy.write(textwrap.dedent("""
+        def add(x: i32, y: i32) -> i32:
+            return x + y
+
+        def main() -> void:
+            print(add(1, 2))
+        """))
+        self.socket_path = str(tmpdir.join('spy.sock'))
+        self.server = SPyServer(self.socket_path)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        yield
+        self.server.shutdown()
+        thread.join()
+        self.server.server_close()
+
+    def request(self, *argv: str) -> dict:
+        return send_request(self.socket_path, list(argv), str(self.tmpdir))
+
+    def test_redshift(self):
+        res = self.request('--redshift', 'foo.spy')
+        assert res['status'] == 0
+        assert res['stdout'].startswith('def add(x: i32, y: i32) -> i32:')
+        assert not res['cached']
+        #
+        res2 = self.request('--redshift', 'foo.spy')
+        assert res2['cached']
+        assert res2['stdout'] == res['stdout']
+
+    def test_source_changed(self):
+        res = self.request('--redshift', 'foo.spy')
+        assert 'return x + y' in res['stdout']
+        self.foo_spy.write(self.foo_spy.read().replace('x + y', 'x * y'))
+        res = self.request('--redshift', 'foo.spy')
+        assert not res['cached']
+        assert 'return x * y' in res['stdout']
+
+    def test_cwrite(self):
+        res = self.request('--cwrite', 'foo.spy')
+        assert res['status'] == 0
+        foo_c = self.tmpdir.join('foo.c')
+        assert foo_c.exists()
+        assert self.request('--cwrite', 'foo.spy')['cached']
+        # if the output is removed, we need to write it again
+        foo_c.remove()
+        res = self.request('--cwrite', 'foo.spy')
+        assert not res['cached']
+        assert foo_c.exists()
+
+    def test_execute(self):
+        res = self.request('foo.spy')
+        assert res['stdout'] == '3\n'
+        res = self.request('foo.spy')
+        assert res['stdout'] == '3\n'
+        assert not res['cached']
+
+    def test_error(self):
+        res = self.request('--parse', '--redshift', 'foo.spy')
+        assert res['status'] == 2
+        assert 'Too many actions' in res['stderr']
+        #
+        res = self.request('--nonexistent-option', 'foo.spy')
+        assert res['status'] == 2
+
+    def test_help(self):
+        res = self.request('--help')
+        assert res['status'] == 0
+        assert 'Usage:' in res['stdout']
+        assert res['stderr'] == ''
+
+    def test_pdb(self):
+        res = self.request('--pdb', 'foo.spy')
+        assert res['status'] == 2
+        assert '--pdb is not supported' in res['stderr']
+
+    def test_template(self, monkeypatch):
+        # the VMs are created from the template, without initializing the
+        # builtin modules again
+        def fail(*args, **kwargs):
+            raise AssertionError('SPyVM() called')
+        monkeypatch.setattr(SPyVM, '__init__', fail)
+        res = self.request('foo.spy')
+        assert res['status'] == 0
+        assert res['stdout'] == '3\n'
+        # the template is not modified by the requests
+        assert all(fqn.modname != 'foo'
+                   for fqn in self.server.template.globals_w)
@@ -0,0 +1,47 @@
+import pytest
+from spy.errors import SPyNameError
+from spy.tests.support import CompilerTest, only_interp
+
+
+class TestASTCompiler(CompilerTest):
+    SRC = """
+    var counter: i32 = 0
+
+    def fib(n: i32) -> i32:
+        if n < 2:
+            return n
+        return fib(n-1) + fib(n-2)
+
+    def loop(n: i32) -> i32:
+        i = 0
+        while i < n:
+            counter = counter + fib(i)
+            i = i + 1
+        return counter
+
+    def undefined() -> i32:
+        return x
+    """
+
+    @only_interp
+    def test_compiled_body_is_cached(self):
+        self.vm.ast_compile = True
+        mod = self.compile(self.SRC)
+        assert mod.fib(10) == 55
+        w_fib = mod.fib.w_func
+        body = w_fib.compiled_body
+        assert body is not None
+        assert len(body) == 2
+        assert mod.fib(5) == 5
+        assert w_fib.compiled_body is body
+
+    @only_interp
+    @pytest.mark.parametrize('ast_compile', [True, False])
+    def test_parity(self, ast_compile):
+        self.vm.ast_compile = ast_compile
+        mod = self.compile(self.SRC)
+        assert mod.loop(10) == 88
+        assert mod.loop(3) == 90
+        assert (mod.fib.w_func.compiled_body is not None) == ast_compile
+        with pytest.raises(SPyNameError, match='name `x` is not defined'):
+            mod.undefined()
@@ -0,0 +1,65 @@
+from spy.location import Loc
+from spy.vm.vm import SPyVM
+from spy.vm.b import B
+from spy.vm.list import W_List
+from spy.vm.opimpl import W_OpArg
+from spy.vm.builtin import builtin_func
+from spy.vm.primitive import W_I32
+
+
+class TestBlueCache:
+
+    def test_lookup_record(self):
+        vm = SPyVM()
+        cache = vm.bluecache
+        w_func = B.w_abs  # any W_Func is fine, it's never called
+        w_a = vm.wrap(1)
+        w_b = vm.wrap('hello')
+        assert cache.lookup(w_func, [w_a, w_b]) is None
+        cache.record(w_func, [w_a, w_b], B.w_True)
+        assert cache.lookup(w_func, [vm.wrap(1), vm.wrap('hello')]) is B.w_True
+        assert cache.lookup(w_func, [vm.wrap(2), vm.wrap('hello')]) is None
+        assert cache.lookup(w_func, [vm.wrap(1)]) is None
+        assert cache.lookup(B.w_print, [w_a, w_b]) is None
+
+    def test_oparg_key(self):
+        vm = SPyVM()
+        loc = Loc.fake()
+        w_func = B.w_abs
+        wop_red = W_OpArg(vm, 'red', B.w_i32, vm.wrap(1), loc)
+        wop_blue = W_OpArg(vm, 'blue', B.w_i32, vm.wrap(1), loc)
+        vm.bluecache.record(w_func, [wop_red], B.w_True)
+        # red opargs compare only the static type
+        wop_red2 = W_OpArg(vm, 'red', B.w_i32, vm.wrap(2), loc)
+        assert vm.bluecache.lookup(w_func, [wop_red2]) is B.w_True
+        assert vm.bluecache.lookup(w_func, [wop_blue]) is None
+        #
+        vm.bluecache.record(w_func, [wop_blue], B.w_False)
+        wop_blue2 = W_OpArg(vm, 'blue', B.w_i32, vm.wrap(1), loc)
+        wop_blue3 = W_OpArg(vm, 'blue', B.w_i32, vm.wrap(3), loc)
+        assert vm.bluecache.lookup(w_func, [wop_blue2]) is B.w_False
+        assert vm.bluecache.lookup(w_func, [wop_blue3]) is None
+
+    def test_unhashable(self):
+        vm = SPyVM()
+        w_func = B.w_abs
+        w_listtype = vm.make_list_type(B.w_i32)
+        w_l1: W_List = W_List(w_listtype, [vm.wrap(1), vm.wrap(2)])
+        w_l2: W_List = W_List(w_listtype, [vm.wrap(1), vm.wrap(2)])
+        assert w_l1.spy_key(vm) is None
+        vm.bluecache.record(w_func, [w_l1], B.w_True)
+        assert vm.bluecache.lookup(w_func, [w_l2]) is B.w_True
+
+    def test_blue_func_called_once(self):
+        vm = SPyVM()
+        log = []
+
+        @builtin_func('test', color='blue')
+        def w_foo(vm: 'SPyVM', w_x: W_I32) -> W_I32:
+            log.append(vm.unwrap(w_x))
+            return w_x
+
+        vm.fast_call(w_foo, [vm.wrap(1)])
+        vm.fast_call(w_foo, [vm.wrap(1)])
+        vm.fast_call(w_foo, [vm.wrap(2)])
+        assert log == [1, 2]
@@ -0,0 +1,193 @@
+from typing import Any
+import pytest
+from spy.fqn import FQN
+from spy.errors import SPyImportError, SPyTypeError
+from spy.backend.spy import SPyBackend
+from spy.vm.vm import SPyVM
+from spy.vm.bytecode import compile_func, dump_module, load_module
+from spy.vm.bcinterp import BytecodeImpl
+from spy.tests.support import CompilerTest, only_interp
+
+
+@only_interp
+class TestBytecode(CompilerTest):
+
+    def load_in_new_vm(self, modname: str = 'test') -> SPyVM:
+        self.vm.redshift()
+        data = dump_module(self.vm, modname)
+        vm2 = SPyVM()
+        load_module(vm2, data)
+        return vm2
+
+    def lookup(self, vm: SPyVM, name: str) -> Any:
+        w_obj = vm.lookup_global(FQN(f'test::{name}'))
+        assert w_obj is not None
+        return w_obj
+
+    def call(self, vm: SPyVM, name: str, *args: Any) -> Any:
+        w_func = self.lookup(vm, name)
+        w_res = vm.fast_call(w_func, [vm.wrap(arg) for arg in args])
+        return vm.unwrap(w_res)
+
+    def test_disassemble(self):
+        self.compile("""
+        def add(x: i32, y: i32) -> i32:
+            return x + y
+        """)
+        self.vm.redshift()
+        w_add = self.lookup(self.vm, 'add')
+        code = compile_func(self.vm, w_add)
+        assert code.varnames == ['x', 'y', '@if', '@while', '@return']
+        assert code.fqns == [FQN('operator::i32_add')]
+        assert code.disassemble().splitlines() == [
+            '   0 CALL 5 0 2 0 1',
+            '   6 RETURN 5',
+            '   8 END',
+        ]
+
+    def test_execute(self):
+        self.compile("""
+        var counter: i32 = 0
+
+        def fib(n: i32) -> i32:
+            if n < 2:
+                return n
+            return fib(n-1) + fib(n-2)
+
+        def loop(n: i32) -> f64:
+            i = 0
+            tot: f64 = 0.0
+            while i < n:
+                if i % 2 == 0:
+                    tot = tot + fib(i) / 2
+                else:
+                    tot = tot - 1.0
+                i = i + 1
+            return tot
+
+        def bump() -> void:
+            counter = counter + 1
+        """)
+        vm2 = self.load_in_new_vm()
+        w_fib = self.lookup(vm2, 'fib')
+        assert isinstance(w_fib.py_impl, BytecodeImpl)
+        assert self.call(vm2, 'fib', 20) == 6765
+        assert self.call(vm2, 'loop', 10) == 10.0
+        self.call(vm2, 'bump')
+        self.call(vm2, 'bump')
+        assert vm2.unwrap(self.lookup(vm2, 'counter')) == 2
+
+    def test_no_return(self):
+        self.compile("""
+        def foo(x: i32) -> i32:
+            if x:
+                return 1
+        """)
+        vm2 = self.load_in_new_vm()
+        assert self.call(vm2, 'foo', 1) == 1
+        with pytest.raises(SPyTypeError,
+                           match='reached the end of the function'):
+            self.call(vm2, 'foo', 0)
+
+    def assert_roundtrip(self) -> SPyVM:
+        self.vm.redshift()
+        expected = SPyBackend(self.vm).dump_mod('test')
+        vm2 = self.load_in_new_vm()
+        got = SPyBackend(vm2).dump_mod('test')
+        assert got == expected
+        return vm2
+
+    def test_roundtrip(self):
+        self.compile("""
+        def foo(x: i32, y: f64) -> f64:
+            a: f64 = 0.0
+            while x > 0:
+                if x % 3 == 0:
+                    a = a + y
+                elif x % 3 == 1:
+                    pass
+                else:
+                    print("hello")
+                x = x - 1
+            return a
+
+        def main() -> void:
+            print(foo(10, 1.5))
+        """)
+        self.assert_roundtrip()
+
+    def test_roundtrip_while_in_if(self):
+        self.compile("""
+        def foo(c: bool, n: i32) -> i32:
+            i = 0
+            if c:
+                while i < n:
+                    i = i + 1
+            return i
+        """)
+        vm2 = self.assert_roundtrip()
+        assert self.call(vm2, 'foo', False, 3) == 0
+        assert self.call(vm2, 'foo', True, 3) == 3
+
+    def test_roundtrip_if_in_while(self):
+        self.compile("""
+        def foo(n: i32) -> i32:
+            i = 0
+            tot = 0
+            while i < n:
+                if i % 2 == 0:
+                    tot = tot + i
+                i = i + 1
+            return tot
+        """)
+        vm2 = self.assert_roundtrip()
+        assert self.call(vm2, 'foo', 5) == 6
+
+    def test_roundtrip_if_else_ending_in_while(self):
+        self.compile("""
+        def foo(c: bool, n: i32) -> i32:
+            i = 0
+            if c:
+                while i < n:
+                    i = i + 1
+            else:
+                while i < n:
+                    i = i + 2
+            return i
+        """)
+        vm2 = self.assert_roundtrip()
+        assert self.call(vm2, 'foo', True, 3) == 3
+        assert self.call(vm2, 'foo', False, 3) == 4
+
+    def test_roundtrip_list(self):
+        # list[i32]::getitem is created by the redshift, so we can load the
+        # module only in a VM where it exists
+        self.compile("""
+        def foo() -> i32:
+            l = [1, 2, 3]
+            return l[1]
+        """)
+        self.vm.redshift()
+        expected = SPyBackend(self.vm).dump_mod('test')
+        data = dump_module(self.vm, 'test')
+        with pytest.raises(SPyImportError, match='not found'):
+            load_module(SPyVM(), data)
+        #
+        # load it again in the same VM
+        vm = self.vm
+        del vm.modules_w['test']
+        del vm.globals_w[FQN('test::foo')]
+        load_module(vm, data)
+        assert SPyBackend(vm).dump_mod('test') == expected
+        assert self.call(vm, 'foo') == 2
+
+    def test_invalid_file(self):
+        self.compile("""
+        def foo() -> void:
+            pass
+        """)
+        self.vm.redshift()
+        data = dump_module(self.vm, 'test')
+        data = data.replace(b'SPYC', b'XXXX')
+        with pytest.raises(SPyImportError, match='invalid .spyc file'):
+            load_module(SPyVM(), data)
@@ -0,0 +1,89 @@
+from spy import ast
+from spy.fqn import FQN
+from spy.location import Loc
+from spy.vm.vm import SPyVM
+from spy.vm.b import B
+from spy.vm.opcache import OpCache
+from spy.vm.opimpl import W_OpArg
+from spy.vm.modules.operator import OP
+from spy.tests.support import CompilerTest, no_C, only_interp
+
+
+class TestOpCache(CompilerTest):
+
+    def count_call_OP(self) -> list[int]:
+        vm = self.vm
+        orig_call_OP = vm.call_OP
+        counter = [0]
+        def call_OP(w_OP, args_wop):
+            counter[0] += 1
+            return orig_call_OP(w_OP, args_wop)
+        vm.call_OP = call_OP  # type: ignore
+        return counter
+
+    @no_C
+    def test_loop(self):
+        mod = self.compile("""
+        def foo(n: i32) -> i32:
+            i = 0
+            tot = 0
+            while i < n:
+                tot = tot + i * 2
+                i = i + 1
+            return tot
+        """)
+        counter = self.count_call_OP()
+        assert mod.foo(10) == 90
+        n = counter[0]
+        assert mod.foo(1000) == 999000
+        assert counter[0] == n
+
+    @only_interp
+    def test_invalidation(self):
+        # redshifted functions call their opimpls directly without going
+        # through the opcache, so this makes sense only for plain interp
+        self.vm.redshift_threshold = None
+        mod = self.compile("""
+        def inc(x: i32) -> i32:
+            return x + 1
+
+        def foo(x: i32) -> i32:
+            return inc(x)
+        """)
+        assert mod.foo(1) == 2
+        w_foo = mod.foo.w_func
+        opcache = w_foo.opcache
+        assert opcache is not None
+        assert opcache.nodes
+        version = self.vm.globals_version
+        # storing the same object doesn't invalidate anything
+        fqn = FQN('test::inc')
+        w_inc = self.vm.lookup_global(fqn)
+        assert w_inc is not None
+        self.vm.store_global(fqn, w_inc)
+        assert self.vm.globals_version == version
+        # redefining a function does
+        self.vm.store_global(fqn, B.w_abs)
+        assert self.vm.globals_version == version + 1
+        assert mod.foo(-5) == 5
+        assert opcache.version == version + 1
+
+
+class TestOpCacheUnit:
+
+    def test_megamorphic(self):
+        vm = SPyVM()
+        opcache = OpCache(vm)
+        loc = Loc.fake()
+        node = ast.Pass(loc)
+        types_w = [B.w_i32, B.w_f64, B.w_str, B.w_dynamic,
+                   vm.make_list_type(B.w_i32)]
+        for i, w_type in enumerate(types_w):
+            wop = W_OpArg(vm, 'red', w_type, None, loc)
+            w_opimpl = opcache.call_OP(node, OP.w_EQ, [wop, wop])
+            assert w_opimpl is vm.call_OP(OP.w_EQ, [wop, wop])
+            entries = opcache.nodes[node]
+            if i < OpCache.MAX_ENTRIES:
+                assert entries is not None
+                assert len(entries) == i+1
+        assert opcache.nodes[node] is None
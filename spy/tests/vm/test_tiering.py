@@ -0,0 +1,76 @@
+import pytest
+from spy.errors import SPyTypeError
+from spy.fqn import FQN
+from spy.tests.support import CompilerTest, only_interp
+
+
+@only_interp
+class TestTiering(CompilerTest):
+
+    def test_tier_up(self):
+        self.vm.redshift_threshold = 2
+        mod = self.compile("""
+        def fib(n: i32) -> i32:
+            if n < 2:
+                return n
+            return fib(n-1) + fib(n-2)
+        """)
+        w_fib = mod.fib.w_func
+        assert not w_fib.redshifted
+        assert mod.fib(1) == 1
+        assert mod.fib(1) == 1
+        assert w_fib.w_redshifted is None
+        assert mod.fib(10) == 55
+        w_newfib = w_fib.w_redshifted
+        assert w_newfib is not None
+        assert w_newfib.redshifted
+        assert self.vm.lookup_global(FQN('test::fib')) is w_newfib
+        # calling the old function executes the redshifted one
+        assert w_fib.tier_up_maybe(self.vm, 2) is w_newfib
+        assert mod.fib(20) == 6765
+
+    def test_disabled(self):
+        self.vm.redshift_threshold = None
+        mod = self.compile("""
+        def inc(x: i32) -> i32:
+            return x + 1
+        """)
+        for i in range(10):
+            assert mod.inc(i) == i + 1
+        w_inc = mod.inc.w_func
+        assert w_inc.ncalls == 0
+        assert w_inc.w_redshifted is None
+
+    def test_lazy_errors(self):
+        # in interp mode, the error is raised only if the offending code is
+        # executed, so a failed redshift must not change the behavior
+        self.vm.redshift_threshold = 0
+        mod = self.compile("""
+        def foo(flag: bool) -> i32:
+            if flag:
+                return 1 + "hello"
+            return 42
+        """)
+        assert mod.foo(False) == 42
+        w_foo = mod.foo.w_func
+        assert w_foo.redshift_failed
+        assert w_foo.w_redshifted is None
+        assert mod.foo(False) == 42
+        with pytest.raises(SPyTypeError):
+            mod.foo(True)
+
+    def test_internal_error(self, monkeypatch):
+        # only the errors of the program make the redshift fail silently:
+        # bugs in the redshift are propagated
+        from spy import doppler
+        def buggy_redshift(vm, w_func):
+            raise KeyError('bug')
+        monkeypatch.setattr(doppler, 'redshift', buggy_redshift)
+        self.vm.redshift_threshold = 0
+        mod = self.compile("""
+        def foo() -> i32:
+            return 42
+        """)
+        with pytest.raises(KeyError, match='bug'):
+            mod.foo()
+        assert not mod.foo.w_func.redshift_failed
@@ -1,13 +1,13 @@
 import fixedint
 import pytest
-from spy.vm.primitive import W_I32, W_Bool, W_Void
+from spy.vm.primitive import W_I32, W_F64, W_Bool, W_Void
 from spy.vm.vm import SPyVM
 from spy.vm.b import B
 from spy.fqn import FQN
 from spy.errors import SPyTypeError
 from spy.vm.object import W_Object, W_Type
 from spy.vm.str import W_Str
-from spy.vm.function import W_BuiltinFunc
+from spy.vm.function import W_BuiltinFunc, W_FuncType
 from spy.vm.module import W_Module
 from spy.vm.builtin import builtin_type
 from spy.tests.support import expect_errors
@@ -122,6 +122,45 @@ class TestVM:
         assert vm.union_type(w_b, w_c) is w_a
         assert vm.union_type(w_b, B.w_i32) is B.w_object
 
+    def test_mro(self):
+        @builtin_type('test', 'A')
+        class W_A(W_Object):
+            pass
+        #
+        @builtin_type('test', 'B', lazy_definition=True)
+        class W_B(W_A):
+            pass
+        #
+        w_a = W_A._w
+        w_b = W_B._w
+        assert B.w_object.mro_w == (B.w_object,)
+        assert B.w_dynamic.mro_w == (B.w_dynamic,)
+        assert w_a.mro_w == (w_a, B.w_object)
+        # the mro of a declared type cannot be computed
+        with pytest.raises(Exception, match='declared but not defined'):
+            w_b.mro_w
+        w_b.define(W_B)
+        assert w_b.mro_w == (w_b, w_a, B.w_object)
+        assert w_b.has_ancestor(w_a)
+        assert not w_a.has_ancestor(w_b)
+
+    def test_mro_user_types(self):
+        from spy.vm.object import ClassBody
+        from spy.vm.modules.unsafe.struct import W_StructType
+        from spy.vm.modules.types import W_LiftedType
+        vm = SPyVM()
+        w_point = W_StructType.declare(FQN('test::Point'))
+        w_point.define_from_classbody(
+            ClassBody(fields={'x': B.w_i32}, methods={}))
+        w_myint = W_LiftedType.declare(FQN('test::MyInt'))
+        w_myint.define_from_classbody(
+            ClassBody(fields={'__ll__': B.w_i32}, methods={}))
+        assert w_point.mro_w == (w_point, B.w_object)
+        assert w_myint.mro_w == (w_myint, B.w_object)
+        assert vm.issubclass(w_point, B.w_object)
+        assert not vm.issubclass(w_point, w_myint)
+        assert vm.union_type(w_point, w_myint) is B.w_object
+
     def test_cannot_wrap(self):
         vm = SPyVM()
         class Foo:
@@ -161,6 +200,18 @@ class TestVM:
         z = vm.unwrap(w_z)
         assert z == -1
 
+    def test_W_I32_make(self):
+        assert W_I32.make(2**31).value == -2**31
+        assert W_I32.make(-2**31 - 1).value == 2**31 - 1
+        assert W_I32.make(0xffffffff).value == -1
+        assert W_I32.make(2**40 + 5).value == 5
+        # small ints are cached, big ints are not
+        assert W_I32.make(42) is W_I32.make(42)
+        assert W_I32.make(-1) is W_I32.make(-1)
+        assert W_I32.make(100000) is not W_I32.make(100000)
+        vm = SPyVM()
+        assert vm.wrap(42) is W_I32.make(42)
+
     def test_W_Bool(self):
         vm = SPyVM()
         w_True = vm.wrap(True)
@@ -244,3 +295,112 @@ class TestVM:
         assert vm.lookup_global(fqn) is w_x
         with pytest.raises(ValueError, match="'builtins::x' already exists"):
             vm.add_global(fqn, vm.wrap(43))
+
+    def test_reverse_lookup_global(self):
+        vm = SPyVM()
+        fqn_x = FQN('builtins::x')
+        fqn_y = FQN('builtins::y')
+        w_a = vm.wrap(42)
+        w_b = vm.wrap(43)
+        assert vm.reverse_lookup_global(w_a) is None
+        vm.add_global(fqn_x, w_a)
+        vm.add_global(fqn_y, w_a)
+        assert vm.reverse_lookup_global(w_a) == fqn_x
+        vm.store_global(fqn_x, w_b)
+        assert vm.reverse_lookup_global(w_a) == fqn_y
+        assert vm.reverse_lookup_global(w_b) == fqn_x
+        vm.store_global(fqn_y, w_b)
+        assert vm.reverse_lookup_global(w_a) is None
+        assert vm.reverse_lookup_global(w_b) == fqn_x
+        # types are looked up by value
+        w_ft1 = W_FuncType.parse('def(x: i32) -> i32')
+        w_ft2 = W_FuncType.parse('def(x: i32) -> i32')
+        assert w_ft1 is not w_ft2
+        fqn = vm.make_fqn_const(w_ft1)
+        assert vm.reverse_lookup_global(w_ft2) == fqn
+
+    def test_module_keys(self):
+        vm = SPyVM()
+        w_mod = W_Module(vm, 'mymod', '<mymod>')
+        vm.register_module(w_mod)
+        w_a = vm.wrap(1)
+        w_b = vm.wrap(2)
+        vm.add_global(FQN('mymod::b'), w_a)
+        vm.add_global(FQN('mymod::a'), w_a)
+        vm.add_global(FQN('builtins::c'), w_a)
+        vm.store_global(FQN('mymod::b'), w_b)
+        assert list(w_mod.keys()) == [FQN('mymod::b'), FQN('mymod::a')]
+        assert list(w_mod.items_w()) == [(FQN('mymod::b'), w_b),
+                                         (FQN('mymod::a'), w_a)]
+
+    def test_get_unique_FQN(self):
+        vm = SPyVM()
+        fqn = FQN('builtins::foo')
+        fqn0 = vm.get_unique_FQN(fqn)
+        assert fqn0 == FQN('builtins::foo#0')
+        vm.add_global(fqn0, vm.wrap(0))
+        # e.g. loaded from a .spyc
+        vm.add_global(FQN('builtins::foo#1'), vm.wrap(1))
+        assert vm.get_unique_FQN(fqn) == FQN('builtins::foo#2')
+        # suffixes are never reused, even if they are not in the globals
+        assert vm.get_unique_FQN(fqn) == FQN('builtins::foo#3')
+        assert vm.get_unique_FQN(FQN('builtins::bar')) == FQN('builtins::bar#0')
+
+    def test_clone(self):
+        vm1 = SPyVM()
+        w_mod = W_Module(vm1, 'mymod', '<mymod>')
+        vm1.register_module(w_mod)
+        vm1.add_global(FQN('mymod::a'), vm1.wrap(1))
+        w_listtype = vm1.make_list_type(B.w_i32)
+        vm2 = vm1.clone()
+        w_a = vm1.lookup_global(FQN('mymod::a'))
+        assert vm2.lookup_global(FQN('mymod::a')) is w_a
+        # the bluecache is copied, so the types are the same
+        assert vm2.make_list_type(B.w_i32) is w_listtype
+        # the modules and the globals are independent
+        w_mod2 = vm2.modules_w['mymod']
+        assert w_mod2 is not w_mod
+        assert w_mod2.vm is vm2
+        vm2.add_global(FQN('mymod::b'), vm2.wrap(2))
+        assert vm1.lookup_global(FQN('mymod::b')) is None
+        assert list(w_mod.keys()) == [FQN('mymod::a')]
+        assert list(w_mod2.keys()) == [FQN('mymod::a'), FQN('mymod::b')]
+
+    def test_clone_memory(self):
+        vm1 = SPyVM()
+        ptr = vm1.ll.call('spy_gc_alloc_mem', 4)
+        vm1.ll.mem.write_i32(ptr, 42)
+        snap = vm1.snapshot()
+        assert snap.mem is not None
+        vm2 = SPyVM.from_snapshot(snap)
+        vm3 = SPyVM.from_snapshot(snap)
+        assert vm2.ll.mem.read_i32(ptr) == 42
+        vm2.ll.mem.write_i32(ptr, 43)
+        assert vm1.ll.mem.read_i32(ptr) == 42
+        assert vm3.ll.mem.read_i32(ptr) == 42
+        # a fresh VM doesn't need to store the memory
+        assert SPyVM().snapshot().mem is None
+
+    def test_cannot_snapshot(self):
+        vm = SPyVM()
+        vm.add_global(FQN('builtins::s'), vm.wrap('hello'))
+        with pytest.raises(ValueError, match='cannot snapshot'):
+            vm.snapshot()
+
+    def test_slots(self):
+        from spy.vm.list import W_List
+        from spy.vm.tuple import W_Tuple
+        from spy.vm.opimpl import W_OpArg, W_OpImpl
+        from spy.vm.func_adapter import W_FuncAdapter
+        from spy.vm.modules.unsafe.ptr import W_Ptr
+        # the hot classes must not have a __dict__, see W_Object
+        for pyclass in [W_OpArg, W_I32, W_F64, W_Bool, W_Ptr, W_Str, W_List,
+                        W_Tuple, W_OpImpl, W_FuncAdapter]:
+            assert pyclass.__dictoffset__ == 0, pyclass.__name__
+        # the other classes still work as usual
+        assert W_BuiltinFunc.__dictoffset__ != 0
+        vm = SPyVM()
+        w_x = vm.wrap(1000)
+        assert vm.dynamic_type(w_x) is B.w_i32
+        with pytest.raises(AttributeError):
+            w_x.foo = 42  # type: ignore
@@ -1,5 +0,0 @@
-from typing import Iterable
-from tokenize import TokenInfo
-
-def untokenize(tokens: Iterable[TokenInfo]) -> str:
-    ...
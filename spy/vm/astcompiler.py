@@ -0,0 +1,321 @@
+"""
+Compile the body of a W_ASTFunc into a tree of Python closures.
+
+The "plain" way of executing a function is to walk its AST and use
+magic_dispatch to find the right eval_expr_*/exec_stmt_* method for each
+node. This is simple, but slow: magic_dispatch computes the name of the
+method and does a getattr for every single node evaluation.
+
+ASTCompiler does the dispatch only once: each node is turned into a closure
+which directly captures the closures of its children, and all the
+information which is known statically (e.g. the symbol of a Name, or the
+OPERATOR of a BinOp) is computed in advance. The result is cached on the
+W_ASTFunc and reused for every call.
+
+The closures delegate all the non-trivial logic to the very same methods of
+AbstractFrame which are used by the plain evaluator, so that the two modes
+stay in sync. Nodes which are rare or complicated (e.g. FuncDef, ClassDef)
+are not compiled at all: for them we just call frame.exec_stmt() or
+frame.eval_expr().
+"""
+
+from typing import TYPE_CHECKING, Callable, Optional, Sequence
+from spy import ast
+from spy.errors import SPyNameError
+from spy.fqn import FQN
+from spy.vm.b import B
+from spy.vm.object import W_Object
+from spy.vm.function import W_Func
+from spy.vm.primitive import W_Bool
+from spy.vm.opimpl import W_OpArg
+from spy.vm.modules.operator import OP, OP_from_token
+from spy.util import magic_dispatch
+if TYPE_CHECKING:
+    from spy.vm.vm import SPyVM
+    from spy.vm.function import W_ASTFunc
+    from spy.vm.astframe import ASTFrame
+
+# like AbstractFrame.exec_stmt, a STMT returns None to continue with the
+# next statement, or the value to return from the function
+STMT = Callable[['ASTFrame'], Optional[W_Object]]
+EXPR = Callable[['ASTFrame'], W_OpArg]
+
+
+def run_stmts(frame: 'ASTFrame', stmts: Sequence[STMT]) -> Optional[W_Object]:
+    for stmt in stmts:
+        w_res = stmt(frame)
+        if w_res is not None:
+            return w_res
+    return None
+
+
+class ASTCompiler:
+    """
+    Compile a W_ASTFunc into a list of STMT closures, one for each
+    statement of its body.
+    """
+    vm: 'SPyVM'
+    w_func: 'W_ASTFunc'
+
+    def __init__(self, vm: 'SPyVM', w_func: 'W_ASTFunc') -> None:
+        self.vm = vm
+        self.w_func = w_func
+
+    def compile(self) -> list[STMT]:
+        return self.compile_body(self.w_func.funcdef.body)
+
+    def compile_body(self, body: list[ast.Stmt]) -> list[STMT]:
+        return [self.compile_stmt(stmt) for stmt in body]
+
+    def compile_stmt(self, stmt: ast.Stmt) -> STMT:
+        return magic_dispatch(self, 'compile_stmt', stmt)
+
+    def compile_expr(self, expr: ast.Expr, *,
+                     varname: Optional[str] = None) -> EXPR:
+        """
+        Compile the given expr. If varname is given, the resulting closure
+        also does the typecheck/conversion, like ASTFrame.eval_expr.
+        """
+        fn = magic_dispatch(self, 'compile_expr', expr)
+        if varname is None:
+            return fn
+
+        def eval_and_convert(frame: 'ASTFrame') -> W_OpArg:
+            return frame.convert_maybe(fn(frame), varname)
+        return eval_and_convert
+
+    # ==== statements ====
+
+    def compile_stmt_NotImplemented(self, stmt: ast.Stmt) -> STMT:
+        def exec_stmt(frame: 'ASTFrame') -> Optional[W_Object]:
+            return frame.exec_stmt(stmt)
+        return exec_stmt
+
+    def compile_stmt_Pass(self, stmt: ast.Pass) -> STMT:
+        def exec_Pass(frame: 'ASTFrame') -> None:
+            pass
+        return exec_Pass
+
+    def compile_stmt_Return(self, ret: ast.Return) -> STMT:
+        value = self.compile_expr(ret.value, varname='@return')
+        def exec_Return(frame: 'ASTFrame') -> W_Object:
+            return value(frame).w_val
+        return exec_Return
+
+    def compile_stmt_StmtExpr(self, stmt: ast.StmtExpr) -> STMT:
+        value = self.compile_expr(stmt.value)
+        def exec_StmtExpr(frame: 'ASTFrame') -> None:
+            value(frame)
+        return exec_StmtExpr
+
+    def compile_stmt_Assign(self, assign: ast.Assign) -> STMT:
+        target = assign.target
+        varname = target.value
+        sym = self.w_func.funcdef.symtable.lookup(varname)
+        if sym.is_local:
+            slot = sym.slot
+            value = self.compile_expr(assign.value)
+            value_conv = self.compile_expr(assign.value, varname=varname)
+            def exec_Assign_local(frame: 'ASTFrame') -> None:
+                if varname in frame.locals_types_w:
+                    wop = value_conv(frame)
+                else:
+                    # first assignment, implicit declaration
+                    wop = value(frame)
+                    frame.declare_local(varname, wop.w_static_type)
+                frame._locals[slot] = wop.w_val
+            return exec_Assign_local
+        elif sym.is_global and sym.color == 'red':
+            assert sym.fqn is not None
+            fqn = sym.fqn
+            value = self.compile_expr(assign.value)
+            def exec_Assign_global(frame: 'ASTFrame') -> None:
+                wop = value(frame)
+                frame.vm.store_global(fqn, wop.w_val)
+            return exec_Assign_global
+        else:
+            # errors and unsupported cases
+            return self.compile_stmt_NotImplemented(assign)
+
+    def compile_stmt_SetAttr(self, node: ast.SetAttr) -> STMT:
+        target = self.compile_expr(node.target)
+        attr = self.compile_expr(node.attr)
+        value = self.compile_expr(node.value)
+        def exec_SetAttr(frame: 'ASTFrame') -> None:
+            args_wop = [target(frame), attr(frame), value(frame)]
+            w_opimpl = frame.call_OP(node, OP.w_SETATTR, args_wop)
+            frame.eval_opimpl(node, w_opimpl, args_wop)
+        return exec_SetAttr
+
+    def compile_stmt_SetItem(self, node: ast.SetItem) -> STMT:
+        target = self.compile_expr(node.target)
+        index = self.compile_expr(node.index)
+        value = self.compile_expr(node.value)
+        def exec_SetItem(frame: 'ASTFrame') -> None:
+            args_wop = [target(frame), index(frame), value(frame)]
+            w_opimpl = frame.call_OP(node, OP.w_SETITEM, args_wop)
+            frame.eval_opimpl(node, w_opimpl, args_wop)
+        return exec_SetItem
+
+    def compile_stmt_If(self, if_node: ast.If) -> STMT:
+        test = self.compile_expr(if_node.test, varname='@if')
+        then_body = self.compile_body(if_node.then_body)
+        else_body = self.compile_body(if_node.else_body)
+        def exec_If(frame: 'ASTFrame') -> Optional[W_Object]:
+            w_cond = test(frame).w_val
+            assert isinstance(w_cond, W_Bool)
+            if frame.vm.is_True(w_cond):
+                return run_stmts(frame, then_body)
+            else:
+                return run_stmts(frame, else_body)
+        return exec_If
+
+    def compile_stmt_While(self, while_node: ast.While) -> STMT:
+        test = self.compile_expr(while_node.test, varname='@while')
+        body = self.compile_body(while_node.body)
+        def exec_While(frame: 'ASTFrame') -> Optional[W_Object]:
+            vm = frame.vm
+            while True:
+                w_cond = test(frame).w_val
+                assert isinstance(w_cond, W_Bool)
+                if vm.is_False(w_cond):
+                    return None
+                w_res = run_stmts(frame, body)
+                if w_res is not None:
+                    return w_res
+        return exec_While
+
+    # ==== expressions ====
+
+    def compile_expr_NotImplemented(self, expr: ast.Expr) -> EXPR:
+        def eval_expr(frame: 'ASTFrame') -> W_OpArg:
+            return frame.eval_expr(expr)
+        return eval_expr
+
+    def compile_expr_Constant(self, const: ast.Constant) -> EXPR:
+        # wrapped constants are immutable, so we can wrap them only once
+        w_val = self.vm.wrap(const.value)
+        w_type = self.vm.dynamic_type(w_val)
+        loc = const.loc
+        def eval_Constant(frame: 'ASTFrame') -> W_OpArg:
+            return W_OpArg(frame.vm, 'blue', w_type, w_val, loc)
+        return eval_Constant
+
+    def compile_expr_StrConst(self, const: ast.StrConst) -> EXPR:
+        w_val = self.vm.wrap(const.value)
+        loc = const.loc
+        def eval_StrConst(frame: 'ASTFrame') -> W_OpArg:
+            return W_OpArg(frame.vm, 'blue', B.w_str, w_val, loc)
+        return eval_StrConst
+
+    def compile_expr_Name(self, name: ast.Name) -> EXPR:
+        sym = self.w_func.funcdef.symtable.lookup_maybe(name.id)
+        if sym is None:
+            def eval_Name_undefined(frame: 'ASTFrame') -> W_OpArg:
+                msg = f"name `{name.id}` is not defined"
+                raise SPyNameError.simple(msg, "not found in this scope",
+                                          name.loc)
+            return eval_Name_undefined
+        elif sym.fqn is not None:
+            def eval_Name_global(frame: 'ASTFrame') -> W_OpArg:
+                return frame.eval_Name_global(name, sym)
+            return eval_Name_global
+        elif sym.is_local:
+            varname = name.id
+            color = sym.color
+            slot = sym.slot
+            loc = name.loc
+            def eval_Name_local(frame: 'ASTFrame') -> W_OpArg:
+                w_type = frame.locals_types_w[varname]
+                w_val = frame.load_local_slot(slot)
+                return W_OpArg(frame.vm, color, w_type, w_val, loc, sym=sym)
+            return eval_Name_local
+        else:
+            def eval_Name_outer(frame: 'ASTFrame') -> W_OpArg:
+                return frame.eval_Name_outer(name, sym)
+            return eval_Name_outer
+
+    def compile_expr_BinOp(self, binop: ast.BinOp) -> EXPR:
+        w_OP = OP_from_token(binop.op) # e.g., w_ADD, w_MUL, etc.
+        left = self.compile_expr(binop.left)
+        right = self.compile_expr(binop.right)
+        def eval_BinOp(frame: 'ASTFrame') -> W_OpArg:
+            args_wop = [left(frame), right(frame)]
+            w_opimpl = frame.call_OP(binop, w_OP, args_wop)
+            return frame.eval_opimpl(binop, w_opimpl, args_wop)
+        return eval_BinOp
+
+    compile_expr_Add = compile_expr_BinOp
+    compile_expr_Sub = compile_expr_BinOp
+    compile_expr_Mul = compile_expr_BinOp
+    compile_expr_Div = compile_expr_BinOp
+    compile_expr_Mod = compile_expr_BinOp
+    compile_expr_LShift = compile_expr_BinOp
+    compile_expr_RShift = compile_expr_BinOp
+    compile_expr_BitAnd = compile_expr_BinOp
+    compile_expr_BitOr = compile_expr_BinOp
+    compile_expr_BitXor = compile_expr_BinOp
+    compile_expr_Eq = compile_expr_BinOp
+    compile_expr_NotEq = compile_expr_BinOp
+    compile_expr_Lt = compile_expr_BinOp
+    compile_expr_LtE = compile_expr_BinOp
+    compile_expr_Gt = compile_expr_BinOp
+    compile_expr_GtE = compile_expr_BinOp
+
+    def compile_expr_Call(self, call: ast.Call) -> EXPR:
+        if self.w_func.redshifted and isinstance(call.func, ast.FQNConst):
+            return self.compile_Call_direct(call, call.func.fqn)
+        func = self.compile_expr(call.func)
+        args = [self.compile_expr(arg) for arg in call.args]
+        def eval_Call(frame: 'ASTFrame') -> W_OpArg:
+            wop_func = func(frame)
+            # STATIC_TYPE is special
+            if wop_func.color == 'blue' and wop_func.w_val is B.w_STATIC_TYPE:
+                return frame._eval_STATIC_TYPE(wop_func, call)
+            args_wop = [wop_func] + [arg(frame) for arg in args]
+            w_opimpl = frame.call_OP(call, OP.w_CALL, args_wop)
+            return frame.eval_opimpl(call, w_opimpl, args_wop)
+        return eval_Call
+
+    def compile_Call_direct(self, call: ast.Call, fqn: FQN) -> EXPR:
+        """
+        In redshifted functions, all the calls to FQNConsts are direct calls
+        to opimpls whose arguments have already been converted (this is what
+        the C backend relies on), so we can skip OP.w_CALL.
+        """
+        args = [self.compile_expr(arg) for arg in call.args]
+        def eval_Call_direct(frame: 'ASTFrame') -> W_OpArg:
+            w_func = frame.vm.lookup_global(fqn)
+            assert isinstance(w_func, W_Func)
+            args_wop = [arg(frame) for arg in args]
+            return frame.eval_opimpl(call, w_func, args_wop)
+        return eval_Call_direct
+
+    def compile_expr_CallMethod(self, op: ast.CallMethod) -> EXPR:
+        target = self.compile_expr(op.target)
+        method = self.compile_expr(op.method)
+        args = [self.compile_expr(arg) for arg in op.args]
+        def eval_CallMethod(frame: 'ASTFrame') -> W_OpArg:
+            args_wop = [target(frame), method(frame)]
+            args_wop += [arg(frame) for arg in args]
+            w_opimpl = frame.call_OP(op, OP.w_CALL_METHOD, args_wop)
+            return frame.eval_opimpl(op, w_opimpl, args_wop)
+        return eval_CallMethod
+
+    def compile_expr_GetItem(self, op: ast.GetItem) -> EXPR:
+        value = self.compile_expr(op.value)
+        index = self.compile_expr(op.index)
+        def eval_GetItem(frame: 'ASTFrame') -> W_OpArg:
+            args_wop = [value(frame), index(frame)]
+            w_opimpl = frame.call_OP(op, OP.w_GETITEM, args_wop)
+            return frame.eval_opimpl(op, w_opimpl, args_wop)
+        return eval_GetItem
+
+    def compile_expr_GetAttr(self, op: ast.GetAttr) -> EXPR:
+        value = self.compile_expr(op.value)
+        attr = self.compile_expr(op.attr)
+        def eval_GetAttr(frame: 'ASTFrame') -> W_OpArg:
+            args_wop = [value(frame), attr(frame)]
+            w_opimpl = frame.call_OP(op, OP.w_GETATTR, args_wop)
+            return frame.eval_opimpl(op, w_opimpl, args_wop)
+        return eval_GetAttr
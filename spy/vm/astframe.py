@@ -18,6 +18,8 @@ from spy.vm.tuple import W_Tuple
 from spy.vm.modules.types import W_LiftedType
 from spy.vm.modules.unsafe.struct import W_StructType
 from spy.vm.opimpl import W_OpImpl, W_OpArg
+from spy.vm.opcache import OpCache
+from spy.vm.astcompiler import ASTCompiler, STMT, run_stmts
 from spy.vm.modules.operator import OP, OP_from_token
 from spy.vm.modules.operator.convop import CONVERT_maybe
 from spy.util import magic_dispatch
@@ -25,13 +27,6 @@ if TYPE_CHECKING:
     from spy.vm.vm import SPyVM
 
 
-class Return(Exception):
-    w_value: W_Object
-
-    def __init__(self, w_value: W_Object) -> None:
-        self.w_value = w_value
-
-
 class AbstractFrame:
     """
     Frame which is able to run AST expressions/statements.
@@ -45,6 +40,7 @@ class AbstractFrame:
     symtable: SymTable
     _locals: Namespace
     locals_types_w: dict[str, W_Type]
+    opcache: Optional[OpCache]
 
     def __init__(self, vm: 'SPyVM', fqn: FQN, symtable: SymTable,
                  closure: CLOSURE) -> None:
@@ -53,8 +49,9 @@ class AbstractFrame:
         self.fqn = fqn
         self.symtable = symtable
         self.closure = closure
-        self._locals = {}
+        self._locals = [None] * symtable.n_slots
         self.locals_types_w = {}
+        self.opcache = None
 
     # overridden by DopplerFrame
     @property
@@ -85,17 +82,47 @@ class AbstractFrame:
         self.locals_types_w[name] = w_type
 
     def store_local(self, name: str, w_value: W_Object) -> None:
-        self._locals[name] = w_value
+        sym = self.symtable.lookup(name)
+        assert sym.is_local
+        self._locals[sym.slot] = w_value
 
     def load_local(self, name: str) -> W_Object:
-        w_obj = self._locals.get(name)
+        sym = self.symtable.lookup(name)
+        assert sym.is_local
+        return self.load_local_slot(sym.slot)
+
+    def load_local_slot(self, slot: int) -> W_Object:
+        w_obj = self._locals[slot]
         if w_obj is None:
             raise SPyRuntimeError('read from uninitialized local')
         return w_obj
 
-    def exec_stmt(self, stmt: ast.Stmt) -> None:
+    def exec_stmt(self, stmt: ast.Stmt) -> Optional[W_Object]:
+        """
+        Execute the given statement.
+
+        Return None to continue the execution with the next statement, or the
+        value which the function must return, if we executed a `return`.
+        """
         return magic_dispatch(self, 'exec_stmt', stmt)
 
+    def exec_body(self, body: list[ast.Stmt]) -> Optional[W_Object]:
+        for stmt in body:
+            w_res = self.exec_stmt(stmt)
+            if w_res is not None:
+                return w_res
+        return None
+
+    def call_OP(self, node: ast.Node, w_OP: W_Func,
+                args_wop: list[W_OpArg]) -> W_Func:
+        """
+        Like vm.call_OP, but use the inline cache of the current function,
+        if we have one.
+        """
+        if self.opcache is None:
+            return self.vm.call_OP(w_OP, args_wop)
+        return self.opcache.call_OP(node, w_OP, args_wop)
+
     def typecheck_maybe(self, wop: W_OpArg,
                         varname: Optional[str]) -> Optional[W_Func]:
         if varname is None:
@@ -120,6 +147,13 @@ class AbstractFrame:
                   varname: Optional[str] = None
                   ) -> W_OpArg:
         wop = magic_dispatch(self, 'eval_expr', expr)
+        return self.convert_maybe(wop, varname)
+
+    def convert_maybe(self, wop: W_OpArg, varname: Optional[str]) -> W_OpArg:
+        """
+        Typecheck wop against the declared type of varname (if any), and
+        apply the needed conversion.
+        """
         w_typeconv = self.typecheck_maybe(wop, varname)
 
         if isinstance(self, ASTFrame) and self.w_func.redshifted:
@@ -163,9 +197,9 @@ class AbstractFrame:
     def exec_stmt_Pass(self, stmt: ast.Pass) -> None:
         pass
 
-    def exec_stmt_Return(self, ret: ast.Return) -> None:
+    def exec_stmt_Return(self, ret: ast.Return) -> W_Object:
         wop = self.eval_expr(ret.value, varname='@return')
-        raise Return(wop.w_val)
+        return wop.w_val
 
     def exec_stmt_FuncDef(self, funcdef: ast.FuncDef) -> None:
         # sanity check: if it's the global __INIT__, it must be @blue
@@ -305,52 +339,67 @@ class AbstractFrame:
                 f"Wrong number of values to unpack: expected {exp}, got {got}"
             )
         for i, target in enumerate(unpack.targets):
-            # fabricate an expr to get an individual item of the tuple
-            expr = ast.GetItem(
+            expr = self._unpack_item_expr(unpack, i)
+            self._exec_assign(target, expr)
+
+    def _unpack_item_expr(self, unpack: ast.UnpackAssign, i: int) -> ast.Expr:
+        """
+        Fabricate an expr to get an individual item of the tuple.
+
+        If we have an opcache, we reuse the same node every time, else the
+        cache would fill up with nodes which are never seen again.
+        """
+        if self.opcache is not None:
+            expr = self.opcache.fabricated.get((unpack, i))
+            if expr is not None:
+                return expr
+        expr = ast.GetItem(
+            loc = unpack.value.loc,
+            value = unpack.value,
+            index = ast.Constant(
                 loc = unpack.value.loc,
-                value = unpack.value,
-                index = ast.Constant(
-                    loc = unpack.value.loc,
-                    value = i
-                )
+                value = i
             )
-            self._exec_assign(target, expr)
+        )
+        if self.opcache is not None:
+            self.opcache.fabricated[(unpack, i)] = expr
+        return expr
 
     def exec_stmt_SetAttr(self, node: ast.SetAttr) -> None:
         wop_obj = self.eval_expr(node.target)
         wop_attr = self.eval_expr(node.attr)
         wop_value = self.eval_expr(node.value)
-        w_opimpl = self.vm.call_OP(OP.w_SETATTR, [wop_obj, wop_attr, wop_value])
+        w_opimpl = self.call_OP(node, OP.w_SETATTR,
+                                [wop_obj, wop_attr, wop_value])
         self.eval_opimpl(node, w_opimpl, [wop_obj, wop_attr, wop_value])
 
     def exec_stmt_SetItem(self, node: ast.SetItem) -> None:
         wop_obj = self.eval_expr(node.target)
         wop_i = self.eval_expr(node.index)
         wop_v = self.eval_expr(node.value)
-        w_opimpl = self.vm.call_OP(OP.w_SETITEM, [wop_obj, wop_i, wop_v])
+        w_opimpl = self.call_OP(node, OP.w_SETITEM, [wop_obj, wop_i, wop_v])
         self.eval_opimpl(node, w_opimpl, [wop_obj, wop_i, wop_v])
 
     def exec_stmt_StmtExpr(self, stmt: ast.StmtExpr) -> None:
         self.eval_expr(stmt.value)
 
-    def exec_stmt_If(self, if_node: ast.If) -> None:
+    def exec_stmt_If(self, if_node: ast.If) -> Optional[W_Object]:
         wop_cond = self.eval_expr(if_node.test, varname='@if')
         assert isinstance(wop_cond.w_val, W_Bool)
         if self.vm.is_True(wop_cond.w_val):
-            for stmt in if_node.then_body:
-                self.exec_stmt(stmt)
+            return self.exec_body(if_node.then_body)
         else:
-            for stmt in if_node.else_body:
-                self.exec_stmt(stmt)
+            return self.exec_body(if_node.else_body)
 
-    def exec_stmt_While(self, while_node: ast.While) -> None:
+    def exec_stmt_While(self, while_node: ast.While) -> Optional[W_Object]:
         while True:
             wop_cond = self.eval_expr(while_node.test, varname='@while')
             assert isinstance(wop_cond.w_val, W_Bool)
             if self.vm.is_False(wop_cond.w_val):
-                break
-            for stmt in while_node.body:
-                self.exec_stmt(stmt)
+                return None
+            w_res = self.exec_body(while_node.body)
+            if w_res is not None:
+                return w_res
 
     # ==== expressions ====
 
@@ -397,13 +446,13 @@ class AbstractFrame:
         if sym.color == 'red' and self.redshifting:
             w_val = None
         else:
-            w_val = self.load_local(name.id)
+            w_val = self.load_local_slot(sym.slot)
         return W_OpArg(self.vm, sym.color, w_type, w_val, name.loc, sym=sym)
 
     def eval_Name_outer(self, name: ast.Name, sym: Symbol) -> W_OpArg:
         color: Color = 'blue'  # closed-over variables are always blue
         namespace = self.closure[-sym.level]
-        w_val = namespace[sym.name]
+        w_val = namespace[sym.slot]
         assert w_val is not None
         w_type = self.vm.dynamic_type(w_val)
         return W_OpArg(self.vm, color, w_type, w_val, name.loc, sym=sym)
@@ -435,7 +484,7 @@ class AbstractFrame:
         w_OP = OP_from_token(binop.op) # e.g., w_ADD, w_MUL, etc.
         wop_l = self.eval_expr(binop.left)
         wop_r = self.eval_expr(binop.right)
-        w_opimpl = self.vm.call_OP(w_OP, [wop_l, wop_r])
+        w_opimpl = self.call_OP(binop, w_OP, [wop_l, wop_r])
         return self.eval_opimpl(
             binop,
             w_opimpl,
@@ -465,7 +514,7 @@ class AbstractFrame:
         if wop_func.color == 'blue' and wop_func.w_val is B.w_STATIC_TYPE:
             return self._eval_STATIC_TYPE(wop_func, call)
         args_wop = [self.eval_expr(arg) for arg in call.args]
-        w_opimpl = self.vm.call_OP(OP.w_CALL, [wop_func]+args_wop)
+        w_opimpl = self.call_OP(call, OP.w_CALL, [wop_func]+args_wop)
         return self.eval_opimpl(call, w_opimpl, [wop_func]+args_wop)
 
     def _eval_STATIC_TYPE(self, wop_func: W_OpArg, call: ast.Call) -> W_OpArg:
@@ -476,7 +525,7 @@ class AbstractFrame:
                 raise SPyTypeError.simple(msg, f'{E} not allowed here', arg.loc)
 
         args_wop = [self.eval_expr(arg) for arg in call.args]
-        w_opimpl = self.vm.call_OP(OP.w_CALL, [wop_func]+args_wop)
+        w_opimpl = self.call_OP(call, OP.w_CALL, [wop_func]+args_wop)
         assert len(call.args) == 1
         w_argtype = args_wop[0].w_static_type
         return W_OpArg.from_w_obj(self.vm, w_argtype)
@@ -485,7 +534,8 @@ class AbstractFrame:
         wop_obj = self.eval_expr(op.target)
         wop_meth = self.eval_expr(op.method)
         args_wop = [self.eval_expr(arg) for arg in op.args]
-        w_opimpl = self.vm.call_OP(
+        w_opimpl = self.call_OP(
+            op,
             OP.w_CALL_METHOD,
             [wop_obj, wop_meth] + args_wop
         )
@@ -498,13 +548,13 @@ class AbstractFrame:
     def eval_expr_GetItem(self, op: ast.GetItem) -> W_OpArg:
         wop_obj = self.eval_expr(op.value)
         wop_i = self.eval_expr(op.index)
-        w_opimpl = self.vm.call_OP(OP.w_GETITEM, [wop_obj, wop_i])
+        w_opimpl = self.call_OP(op, OP.w_GETITEM, [wop_obj, wop_i])
         return self.eval_opimpl(op, w_opimpl, [wop_obj, wop_i])
 
     def eval_expr_GetAttr(self, op: ast.GetAttr) -> W_OpArg:
         wop_obj = self.eval_expr(op.value)
         wop_attr = self.eval_expr(op.attr)
-        w_opimpl = self.vm.call_OP(OP.w_GETATTR, [wop_obj, wop_attr])
+        w_opimpl = self.call_OP(op, OP.w_GETATTR, [wop_obj, wop_attr])
         return self.eval_opimpl(op, w_opimpl, [wop_obj, wop_attr])
 
     def eval_expr_List(self, op: ast.List) -> W_Object:
@@ -555,6 +605,9 @@ class ASTFrame(AbstractFrame):
                          w_func.closure)
         self.w_func = w_func
         self.funcdef = w_func.funcdef
+        if w_func.opcache is None:
+            w_func.opcache = OpCache(vm)
+        self.opcache = w_func.opcache
 
     def __repr__(self) -> str:
         cls = self.__class__.__name__
@@ -569,40 +622,50 @@ class ASTFrame(AbstractFrame):
     def run(self, args_w: Sequence[W_Object]) -> W_Object:
         self.declare_arguments()
         self.init_arguments(args_w)
-        try:
-            # This is suboptimal, but probably good enough for now: do a
-            # forward declaration of user-defined types, found by looking at
-            # 'classdef' statements. The problem is that by doing this, we
-            # don't consider nested classdefs (e.g., if it's inside an
-            # if). But even so, it's unclear whether it makes any sense? For
-            # example, what should the following code do?
-            #   @blue
-            #   def foo():
-            #       x: S
-            #       if random():
-            #           class S: ...
-            #
-            # Is the forward declaration of "S" available or not?  For now, we
-            # just ignore the problem and support only classdef done at the
-            # outermost level.
-            for stmt in self.funcdef.body:
-                if isinstance(stmt, ast.ClassDef):
-                    self.fwdecl_ClassDef(stmt)
-
-            for stmt in self.funcdef.body:
-                self.exec_stmt(stmt)
-            #
-            # we reached the end of the function. If it's void, we can return
-            # None, else it's an error.
-            if self.w_func.w_functype.w_restype in (B.w_void, B.w_dynamic):
-                return B.w_None
-            else:
-                loc = self.w_func.funcdef.loc.make_end_loc()
-                msg = 'reached the end of the function without a `return`'
-                raise SPyTypeError.simple(msg, 'no return', loc)
+        # This is suboptimal, but probably good enough for now: do a forward
+        # declaration of user-defined types, found by looking at 'classdef'
+        # statements. The problem is that by doing this, we don't consider
+        # nested classdefs (e.g., if it's inside an if). But even so, it's
+        # unclear whether it makes any sense? For example, what should the
+        # following code do?
+        #   @blue
+        #   def foo():
+        #       x: S
+        #       if random():
+        #           class S: ...
+        #
+        # Is the forward declaration of "S" available or not?  For now, we
+        # just ignore the problem and support only classdef done at the
+        # outermost level.
+        for stmt in self.funcdef.body:
+            if isinstance(stmt, ast.ClassDef):
+                self.fwdecl_ClassDef(stmt)
+
+        if self.vm.ast_compile:
+            w_res = run_stmts(self, self.get_compiled_body())
+        else:
+            w_res = self.exec_body(self.funcdef.body)
+        if w_res is not None:
+            return w_res
+        #
+        # we reached the end of the function. If it's void, we can return
+        # None, else it's an error.
+        if self.w_func.w_functype.w_restype in (B.w_void, B.w_dynamic):
+            return B.w_None
+        else:
+            loc = self.w_func.funcdef.loc.make_end_loc()
+            msg = 'reached the end of the function without a `return`'
+            raise SPyTypeError.simple(msg, 'no return', loc)
 
-        except Return as e:
-            return e.w_value
+    def get_compiled_body(self) -> list[STMT]:
+        """
+        Return the body of the function compiled into closures, see
+        spy.vm.astcompiler.
+        """
+        if self.w_func.compiled_body is None:
+            compiler = ASTCompiler(self.vm, self.w_func)
+            self.w_func.compiled_body = compiler.compile()
+        return self.w_func.compiled_body
 
     def declare_arguments(self) -> None:
         w_functype = self.w_func.w_functype
@@ -0,0 +1,99 @@
+"""
+Dispatch loop for the bytecode defined in spy.vm.bytecode.
+"""
+
+from typing import TYPE_CHECKING, Any, Sequence
+from spy.fqn import FQN
+from spy.errors import SPyTypeError
+from spy.vm.b import B
+from spy.vm.object import W_Object
+from spy.vm.list import W_List
+from spy.vm.bytecode import (SPyCode, LOAD_CONST, LOAD_FQN, LOAD_GLOBAL,
+                             STORE_GLOBAL, MOVE, CALL, BUILD_LIST, JUMP,
+                             JUMP_IF_FALSE, RETURN, END, instr_size)
+if TYPE_CHECKING:
+    from spy.vm.vm import SPyVM
+
+
+def run_code(vm: 'SPyVM', code: SPyCode,
+             args_w: Sequence[W_Object]) -> W_Object:
+    consts_w = code.consts_w
+    if consts_w is None:
+        consts_w = code.consts_w = [vm.wrap(c) for c in code.consts]
+    fqns_w = code.fqns_w
+    if fqns_w is None:
+        fqns_w = code.fqns_w = [lookup(vm, fqn) for fqn in code.fqns]
+    listtypes_w = code.listtypes_w
+    ops = code.code
+    regs: list[Any] = [None] * code.nregs
+    regs[:len(args_w)] = args_w
+    pc = 0
+    while True:
+        op = ops[pc]
+        if op == CALL:
+            n = ops[pc+3]
+            w_res = vm.fast_call(fqns_w[ops[pc+2]],
+                                 [regs[r] for r in ops[pc+4:pc+4+n]])
+            dst = ops[pc+1]
+            if dst != -1:
+                regs[dst] = w_res
+            pc += 4 + n
+        elif op == LOAD_CONST:
+            regs[ops[pc+1]] = consts_w[ops[pc+2]]
+            pc += 3
+        elif op == MOVE:
+            regs[ops[pc+1]] = regs[ops[pc+2]]
+            pc += 3
+        elif op == JUMP_IF_FALSE:
+            if regs[ops[pc+1]] is B.w_False:
+                pc = ops[pc+2]
+            else:
+                pc += 3
+        elif op == JUMP:
+            pc = ops[pc+1]
+        elif op == RETURN:
+            return regs[ops[pc+1]]
+        elif op == LOAD_GLOBAL:
+            regs[ops[pc+1]] = lookup(vm, code.fqns[ops[pc+3]])
+            pc += 4
+        elif op == STORE_GLOBAL:
+            vm.store_global(code.fqns[ops[pc+2]], regs[ops[pc+3]])
+            pc += 4
+        elif op == LOAD_FQN:
+            regs[ops[pc+1]] = fqns_w[ops[pc+2]]
+            pc += 3
+        elif op == BUILD_LIST:
+            n = ops[pc+3]
+            items_w = [regs[r] for r in ops[pc+4:pc+4+n]]
+            regs[ops[pc+1]] = W_List(listtypes_w[ops[pc+2]], items_w)
+            pc += 4 + n
+        elif op == END:
+            if code.w_functype.w_restype in (B.w_void, B.w_dynamic):
+                return B.w_None
+            loc = code.loc.make_end_loc()
+            msg = 'reached the end of the function without a `return`'
+            raise SPyTypeError.simple(msg, 'no return', loc)
+        else:
+            # PASS, DECLARE, POP
+            pc += instr_size(ops, pc)
+
+def lookup(vm: 'SPyVM', fqn: FQN) -> W_Object:
+    w_obj = vm.lookup_global(fqn)
+    assert w_obj is not None, f'{fqn} not found'
+    return w_obj
+
+
+class BytecodeImpl:
+    """
+    Callable suitable for W_ASTFunc.py_impl, which executes the given code
+    """
+
+    def __init__(self, vm: 'SPyVM', code: SPyCode) -> None:
+        self.vm = vm
+        self.code = code
+
+    def __repr__(self) -> str:
+        return f'<BytecodeImpl {self.code.fqn}>'
+
+    def __call__(self, args_w: Sequence[W_Object]) -> W_Object:
+        return run_code(self.vm, self.code, args_w)
@@ -1,6 +1,6 @@
 from collections import defaultdict
 import operator
-from typing import TYPE_CHECKING, Optional, Sequence
+from typing import TYPE_CHECKING, Optional, Sequence, Any
 from spy.vm.object import W_Object
 from spy.vm.function import W_Func
 from spy.textbuilder import Color
@@ -9,6 +9,7 @@ if TYPE_CHECKING:
 
 ARGS_W = Sequence[W_Object]
 ENTRY = tuple[ARGS_W, W_Object]
+KEY = tuple[Any, ...]
 
 DEBUG = False
 
@@ -16,21 +17,62 @@ class BlueCache:
     """
     Store and record the results of blue functions.
 
-    Currently this is very inefficient, because for every W_Func it records a
-    list of calls, and then during lookup it does a linear search.
+    For every W_Func we keep a hash index which maps the "structural key" of
+    args_w to the result. The key of each argument is computed by
+    W_Object.spy_key(): two arguments which have the same key are
+    guaranteed to be considered equal by vm.universal_eq.
 
-    We should use a SPy dict, as soon as we have it.
+    Some objects don't have a stable key (e.g. lists, which are mutable): the
+    calls which involve them are stored in a separate list, and for them we
+    fall back to a linear search which uses vm.universal_eq.
+
+    Eventually we should use a SPy dict, as soon as we have it.
     """
     vm: 'SPyVM'
-    data: defaultdict[W_Func, list[ENTRY]]
+    data: defaultdict[W_Func, list[ENTRY]]             # all the entries
+    index: defaultdict[W_Func, dict[KEY, W_Object]]    # hashable entries
+    unhashable: defaultdict[W_Func, list[ENTRY]]       # all the others
 
     def __init__(self, vm: 'SPyVM'):
         self.vm = vm
         self.data = defaultdict(list)
+        self.index = defaultdict(dict)
+        self.unhashable = defaultdict(list)
+
+    def copy(self, vm: 'SPyVM') -> 'BlueCache':
+        """
+        Return a copy of the cache for the given VM, see SPyVM.clone()
+        """
+        res = BlueCache(vm)
+        for w_func, entries in self.data.items():
+            res.data[w_func] = list(entries)
+        for w_func, funcindex in self.index.items():
+            res.index[w_func] = funcindex.copy()
+        for w_func, entries in self.unhashable.items():
+            res.unhashable[w_func] = list(entries)
+        return res
+
+    def get_key(self, args_w: ARGS_W) -> Optional[KEY]:
+        """
+        Compute the key of args_w, or None if any of the arguments is not
+        hashable.
+        """
+        keys = []
+        for w_arg in args_w:
+            k = w_arg.spy_key(self.vm)
+            if k is None:
+                return None
+            keys.append(k)
+        return tuple(keys)
 
     def record(self, w_func: W_Func, args_w: ARGS_W, w_result: W_Object) ->None:
         entry = (args_w, w_result)
         self.data[w_func].append(entry)
+        key = self.get_key(args_w)
+        if key is None:
+            self.unhashable[w_func].append(entry)
+        else:
+            self.index[w_func][key] = w_result
 
     def lookup(self, w_func: W_Func, got_args_w: ARGS_W) -> Optional[W_Object]:
         w_res = self._lookup(w_func, got_args_w)
@@ -39,7 +81,14 @@ class BlueCache:
         return w_res
 
     def _lookup(self, w_func: W_Func, got_args_w: ARGS_W) -> Optional[W_Object]:
-        entries = self.data[w_func]
+        key = self.get_key(got_args_w)
+        if key is not None:
+            funcindex = self.index.get(w_func)
+            if funcindex is None:
+                return None
+            return funcindex.get(key)
+        # slow path
+        entries = self.unhashable.get(w_func, [])
         for args_w, w_result in entries:
             if self.args_w_eq(args_w, got_args_w):
                 return w_result
@@ -0,0 +1,781 @@
+"""
+Compact bytecode for redshifted functions, and the .spyc file format.
+
+Redshifted code is very regular: all the operators have been turned into
+direct calls to FQNConsts and all the conversions are explicit. This makes it
+possible to represent the body of a redshifted W_ASTFunc as a flat list of
+ints, which is cheap to execute (see spy.vm.bcinterp) and to store on disk.
+
+Locals and temporaries live in registers: the first registers are the local
+variables of the function (params first, in order), followed by the
+temporaries needed to evaluate expressions. Each instruction is an opcode
+followed by a fixed number of operands, apart from CALL and BUILD_LIST, whose
+argument registers are stored inline after their count:
+
+    PASS                        no-op, corresponds to ast.Pass
+    DECLARE r t k               no-op, corresponds to ast.VarDef; k is 0 for
+                                'var' and 1 for 'const'
+    LOAD_CONST dst k            dst = consts[k]
+    LOAD_FQN dst f              dst = the global object fqns[f]
+    LOAD_GLOBAL dst n f         dst = the current value of the global var
+    STORE_GLOBAL n f src        set the global var to src
+    MOVE dst src                dst = src
+    POP src                     no-op, corresponds to an ast.StmtExpr
+    CALL dst f n r1..rn         dst = fqns[f](r1, ..., rn); dst == -1 means
+                                that the result is discarded
+    BUILD_LIST dst t n r1..rn   dst = [r1, ..., rn], of type listtypes[t]
+    JUMP target
+    JUMP_IF_FALSE src target
+    RETURN src
+    END                         end of the function, either return None or
+                                raise an error for non-void functions
+
+`n` is an index into the names, used only to reconstruct the AST.
+
+`locs` maps the position of the first instruction of each statement to its
+Loc, so that the reconstructed AST points to the original source code.
+
+The bytecode is designed so that it can be turned back into a redshifted
+AST (see Decompiler), which is used to reconstruct the W_ASTFuncs of a
+loaded .spyc and to dump them with SPyBackend.
+
+A .spyc file is the marshal of the module content: the redshifted functions
+plus the values of the global variables. All the references to other
+objects are stored as FQNs, which must exist in the VM which loads the file.
+"""
+
+from typing import TYPE_CHECKING, Any, Optional, Sequence
+from array import array
+import marshal
+from spy import ast
+from spy.fqn import FQN
+from spy.location import Loc
+from spy.errors import SPyImportError
+from spy.util import magic_dispatch
+from spy.irgen.symtable import SymTable, Symbol
+from spy.vm.b import B
+from spy.vm.object import W_Object, W_Type
+from spy.vm.list import W_ListType
+from spy.vm.module import W_Module
+from spy.vm.function import W_Func, W_ASTFunc, W_FuncType, FuncParam
+if TYPE_CHECKING:
+    from spy.vm.vm import SPyVM
+
+MAGIC = 'SPYC'
+# bump VERSION whenever the format or the decompiler change: it is part of
+# the key of the RedshiftCache, so that stale entries are never served
+VERSION = 3
+
+PASS = 0
+DECLARE = 1
+LOAD_CONST = 2
+LOAD_FQN = 3
+LOAD_GLOBAL = 4
+STORE_GLOBAL = 5
+MOVE = 6
+POP = 7
+CALL = 8
+BUILD_LIST = 9
+JUMP = 10
+JUMP_IF_FALSE = 11
+RETURN = 12
+END = 13
+
+OPNAMES = ['PASS', 'DECLARE', 'LOAD_CONST', 'LOAD_FQN', 'LOAD_GLOBAL',
+           'STORE_GLOBAL', 'MOVE', 'POP', 'CALL', 'BUILD_LIST', 'JUMP',
+           'JUMP_IF_FALSE', 'RETURN', 'END']
+
+VARKINDS: list[ast.VarKind] = ['var', 'const']
+
+# number of fixed operands of each opcode
+N_OPERANDS = [0, 3, 2, 2, 3, 3, 2, 1, 3, 3, 1, 2, 1, 0]
+
+def instr_size(code: Sequence[int], pc: int) -> int:
+    op = code[pc]
+    n = N_OPERANDS[op]
+    if op == CALL or op == BUILD_LIST:
+        n += code[pc + 3]
+    return n + 1
+
+
+class SPyCode:
+    """
+    The bytecode of a single redshifted function.
+    """
+    fqn: FQN
+    loc: Loc
+    w_functype: W_FuncType
+    varnames: list[str]
+    locals_types_w: list[W_Type]
+    nregs: int
+    code: list[int]
+    consts: list[Any]
+    names: list[str]
+    fqns: list[FQN]
+    listtypes_w: list[W_ListType]
+    locs: dict[int, Loc]
+    # caches used by bcinterp, initialized lazily. fqns_w contains both
+    # functions and other objects, hence Any.
+    consts_w: Optional[list[W_Object]]
+    fqns_w: Optional[list[Any]]
+
+    def __init__(self, fqn: FQN, loc: Loc, w_functype: W_FuncType,
+                 varnames: list[str], locals_types_w: list[W_Type],
+                 nregs: int, code: list[int], consts: list[Any],
+                 names: list[str], fqns: list[FQN],
+                 listtypes_w: list[W_ListType],
+                 locs: dict[int, Loc]) -> None:
+        self.fqn = fqn
+        self.loc = loc
+        self.w_functype = w_functype
+        self.varnames = varnames
+        self.locals_types_w = locals_types_w
+        self.nregs = nregs
+        self.code = code
+        self.consts = consts
+        self.names = names
+        self.fqns = fqns
+        self.listtypes_w = listtypes_w
+        self.locs = locs
+        self.consts_w = None
+        self.fqns_w = None
+
+    def __repr__(self) -> str:
+        return f'<SPyCode {self.fqn}>'
+
+    def disassemble(self) -> str:
+        lines = []
+        pc = 0
+        while pc < len(self.code):
+            size = instr_size(self.code, pc)
+            op = self.code[pc]
+            args = ' '.join(str(x) for x in self.code[pc+1:pc+size])
+            lines.append(f'{pc:4d} {OPNAMES[op]} {args}'.rstrip())
+            pc += size
+        return '\n'.join(lines)
+
+
+class BytecodeCompiler:
+    """
+    Compile a redshifted W_ASTFunc into SPyCode
+    """
+    vm: 'SPyVM'
+    w_func: W_ASTFunc
+    code: list[int]
+    regs: dict[str, int]
+    first_temp: int
+    next_temp: int
+    nregs: int
+
+    def __init__(self, vm: 'SPyVM', w_func: W_ASTFunc) -> None:
+        assert w_func.locals_types_w is not None, 'not redshifted'
+        self.vm = vm
+        self.w_func = w_func
+        self.symtable = w_func.funcdef.symtable
+        params = [p.name for p in w_func.w_functype.params]
+        others = [name for name in w_func.locals_types_w
+                  if name not in params]
+        self.varnames = params + others
+        self.regs = {name: i for i, name in enumerate(self.varnames)}
+        self.first_temp = self.next_temp = self.nregs = len(self.varnames)
+        self.code = []
+        self.consts: list[Any] = []
+        self.names: list[str] = []
+        self.fqns: list[FQN] = []
+        self.listtypes_w: list[W_ListType] = []
+        self.locs: dict[int, Loc] = {}
+        self.indexes: dict[Any, int] = {}
+
+    def compile(self) -> SPyCode:
+        assert self.w_func.locals_types_w is not None
+        for stmt in self.w_func.funcdef.body:
+            self.compile_stmt(stmt)
+        self.emit(END)
+        return SPyCode(
+            fqn = self.w_func.fqn,
+            loc = self.w_func.funcdef.loc,
+            w_functype = self.w_func.w_functype,
+            varnames = self.varnames,
+            locals_types_w = [self.w_func.locals_types_w[name]
+                              for name in self.varnames],
+            nregs = self.nregs,
+            code = self.code,
+            consts = self.consts,
+            names = self.names,
+            fqns = self.fqns,
+            listtypes_w = self.listtypes_w,
+            locs = self.locs,
+        )
+
+    def emit(self, *ops: int) -> int:
+        """
+        Emit an instruction and return its position
+        """
+        pc = len(self.code)
+        self.code.extend(ops)
+        return pc
+
+    def index(self, pool: list[Any], key: Any, value: Any) -> int:
+        i = self.indexes.get(key)
+        if i is None:
+            i = len(pool)
+            pool.append(value)
+            self.indexes[key] = i
+        return i
+
+    def const(self, value: Any) -> int:
+        # we need type(value) because e.g. 1 == 1.0 == True
+        return self.index(self.consts, ('c', type(value), value), value)
+
+    def name(self, name: str) -> int:
+        return self.index(self.names, ('n', name), name)
+
+    def fqn(self, fqn: FQN) -> int:
+        return self.index(self.fqns, ('f', fqn), fqn)
+
+    def listtype(self, w_type: W_ListType) -> int:
+        return self.index(self.listtypes_w, ('t', w_type), w_type)
+
+    def new_temp(self) -> int:
+        r = self.next_temp
+        self.next_temp += 1
+        self.nregs = max(self.nregs, self.next_temp)
+        return r
+
+    # ===== statements =====
+
+    def compile_stmt(self, stmt: ast.Stmt) -> None:
+        # temporaries don't survive across statements
+        self.next_temp = self.first_temp
+        self.locs[len(self.code)] = stmt.loc
+        magic_dispatch(self, 'compile_stmt', stmt)
+
+    def compile_body(self, body: list[ast.Stmt]) -> None:
+        for stmt in body:
+            self.compile_stmt(stmt)
+
+    def compile_stmt_Pass(self, stmt: ast.Pass) -> None:
+        self.emit(PASS)
+
+    def compile_stmt_VarDef(self, vardef: ast.VarDef) -> None:
+        if not isinstance(vardef.type, ast.FQNConst):
+            raise NotImplementedError('VarDef with a non-const type')
+        kind = VARKINDS.index(vardef.kind)
+        self.emit(DECLARE, self.regs[vardef.name], self.fqn(vardef.type.fqn),
+                  kind)
+
+    def compile_stmt_Assign(self, assign: ast.Assign) -> None:
+        varname = assign.target.value
+        sym = self.symtable.lookup(varname)
+        if sym.is_local:
+            self.compile_expr(assign.value, dst=self.regs[varname])
+        else:
+            assert sym.fqn is not None
+            src = self.compile_expr(assign.value)
+            self.emit(STORE_GLOBAL, self.name(varname), self.fqn(sym.fqn), src)
+
+    def compile_stmt_StmtExpr(self, stmt: ast.StmtExpr) -> None:
+        if isinstance(stmt.value, ast.Call):
+            self.compile_expr_Call(stmt.value, dst=-1)
+        else:
+            src = self.compile_expr(stmt.value)
+            self.emit(POP, src)
+
+    def compile_stmt_Return(self, ret: ast.Return) -> None:
+        src = self.compile_expr(ret.value)
+        self.emit(RETURN, src)
+
+    def compile_stmt_If(self, if_node: ast.If) -> None:
+        src = self.compile_expr(if_node.test)
+        jif = self.emit(JUMP_IF_FALSE, src, -1)
+        self.compile_body(if_node.then_body)
+        if if_node.else_body:
+            jump = self.emit(JUMP, -1)
+            self.code[jif+2] = len(self.code)
+            self.compile_body(if_node.else_body)
+            self.code[jump+1] = len(self.code)
+        else:
+            self.code[jif+2] = len(self.code)
+
+    def compile_stmt_While(self, while_node: ast.While) -> None:
+        start = len(self.code)
+        src = self.compile_expr(while_node.test)
+        jif = self.emit(JUMP_IF_FALSE, src, -1)
+        self.compile_body(while_node.body)
+        self.emit(JUMP, start)
+        self.code[jif+2] = len(self.code)
+
+    # ===== expressions =====
+
+    def compile_expr(self, expr: ast.Expr, dst: Optional[int] = None) -> int:
+        """
+        Emit the code to evaluate expr and return the register which contains
+        the result. If dst is given, the result is stored there.
+        """
+        return magic_dispatch(self, 'compile_expr', expr, dst)
+
+    def compile_expr_Constant(self, const: ast.Constant,
+                              dst: Optional[int]) -> int:
+        dst = self.new_temp() if dst is None else dst
+        self.emit(LOAD_CONST, dst, self.const(const.value))
+        return dst
+
+    def compile_expr_StrConst(self, const: ast.StrConst,
+                              dst: Optional[int]) -> int:
+        dst = self.new_temp() if dst is None else dst
+        self.emit(LOAD_CONST, dst, self.const(const.value))
+        return dst
+
+    def compile_expr_FQNConst(self, const: ast.FQNConst,
+                              dst: Optional[int]) -> int:
+        dst = self.new_temp() if dst is None else dst
+        self.emit(LOAD_FQN, dst, self.fqn(const.fqn))
+        return dst
+
+    def compile_expr_Name(self, name: ast.Name, dst: Optional[int]) -> int:
+        sym = self.symtable.lookup(name.id)
+        if sym.is_local:
+            reg = self.regs[name.id]
+            if dst is None:
+                return reg
+            self.emit(MOVE, dst, reg)
+            return dst
+        assert sym.fqn is not None
+        if dst is None:
+            dst = self.new_temp()
+        self.emit(LOAD_GLOBAL, dst, self.name(name.id), self.fqn(sym.fqn))
+        return dst
+
+    def compile_expr_Call(self, call: ast.Call, dst: Optional[int]) -> int:
+        if not isinstance(call.func, ast.FQNConst):
+            raise NotImplementedError('indirect calls')
+        dst = self.new_temp() if dst is None else dst
+        args = [self.compile_expr(arg) for arg in call.args]
+        self.emit(CALL, dst, self.fqn(call.func.fqn), len(args), *args)
+        return dst
+
+    def compile_expr_List(self, lst: ast.List, dst: Optional[int]) -> int:
+        # this must compute the same type as ASTFrame.eval_expr_List
+        dst = self.new_temp() if dst is None else dst
+        items = [self.compile_expr(item) for item in lst.items]
+        assert self.w_func.locals_types_w is not None
+        w_itemtype = None
+        for item in lst.items:
+            w_t = self.static_type(item)
+            if w_itemtype is None:
+                w_itemtype = w_t
+            w_itemtype = self.vm.union_type(w_itemtype, w_t)
+        assert w_itemtype is not None
+        w_listtype = self.vm.make_list_type(w_itemtype)
+        self.emit(BUILD_LIST, dst, self.listtype(w_listtype), len(items), *items)
+        return dst
+
+    def static_type(self, expr: ast.Expr) -> W_Type:
+        assert self.w_func.locals_types_w is not None
+        if isinstance(expr, ast.Constant):
+            return self.vm.dynamic_type(self.vm.wrap(expr.value))
+        elif isinstance(expr, ast.StrConst):
+            return B.w_str
+        elif isinstance(expr, ast.Name):
+            sym = self.symtable.lookup(expr.id)
+            if sym.is_local:
+                return self.w_func.locals_types_w[expr.id]
+            assert sym.fqn is not None
+            w_val = self.vm.lookup_global(sym.fqn)
+            assert w_val is not None
+            return self.vm.dynamic_type(w_val)
+        elif isinstance(expr, ast.FQNConst):
+            w_val = self.vm.lookup_global(expr.fqn)
+            assert w_val is not None
+            return self.vm.dynamic_type(w_val)
+        elif isinstance(expr, ast.Call):
+            assert isinstance(expr.func, ast.FQNConst)
+            w_func = self.vm.lookup_global(expr.func.fqn)
+            assert isinstance(w_func, W_Func)
+            return w_func.w_functype.w_restype
+        raise NotImplementedError(expr.__class__.__name__)
+
+
+class Decompiler:
+    """
+    Turn SPyCode back into a redshifted ast.FuncDef
+    """
+    code: SPyCode
+    loc: Loc
+    temps: dict[int, ast.Expr]
+    offsets: list[int]
+
+    def __init__(self, code: SPyCode) -> None:
+        self.code = code
+        self.loc = code.loc
+        self.nlocals = len(code.varnames)
+        self.temps = {}
+        # start offsets of all the instructions, and the offset of the
+        # previous instruction
+        self.prev: dict[int, int] = {}
+        pc = 0
+        last = -1
+        while pc < len(code.code):
+            self.prev[pc] = last
+            last = pc
+            pc += instr_size(code.code, pc)
+        self.prev[pc] = last
+
+    def decompile(self) -> ast.FuncDef:
+        code = self.code
+        body = self.decompile_block(0, len(code.code))
+        self.loc = loc = code.loc
+        args = [ast.FuncArg(loc, p.name, self.fqnconst(p.w_type.fqn))
+                for p in code.w_functype.params]
+        return ast.FuncDef(
+            loc = loc,
+            color = 'red',
+            name = code.fqn.symbol_name,
+            args = args,
+            return_type = self.fqnconst(code.w_functype.w_restype.fqn),
+            body = body,
+            symtable = self.make_symtable(),
+        )
+
+    def fqnconst(self, fqn: FQN) -> ast.FQNConst:
+        return ast.FQNConst(self.loc, fqn)
+
+    def make_symtable(self) -> SymTable:
+        code = self.code
+        loc = code.loc
+        symtable = SymTable(str(code.fqn))
+        for varname in code.varnames:
+            sym = Symbol(varname, 'red', loc=loc, type_loc=loc, level=0)
+            symtable.add(sym)
+        # global variables
+        pc = 0
+        while pc < len(code.code):
+            op = code.code[pc]
+            if op == LOAD_GLOBAL or op == STORE_GLOBAL:
+                if op == LOAD_GLOBAL:
+                    n, f = code.code[pc+2], code.code[pc+3]
+                else:
+                    n, f = code.code[pc+1], code.code[pc+2]
+                name = code.names[n]
+                if symtable.lookup_maybe(name) is None:
+                    sym = Symbol(name, 'red', loc=loc, type_loc=loc, level=1,
+                                 fqn=code.fqns[f])
+                    symtable.add(sym)
+            pc += instr_size(code.code, pc)
+        return symtable
+
+    def read(self, reg: int) -> ast.Expr:
+        if reg < self.nlocals:
+            return ast.Name(self.loc, self.code.varnames[reg])
+        return self.temps.pop(reg)
+
+    def write(self, reg: int, expr: ast.Expr,
+              body: list[ast.Stmt]) -> None:
+        if reg < self.nlocals:
+            target = ast.StrConst(self.loc, self.code.varnames[reg])
+            body.append(ast.Assign(self.loc, target, expr))
+        else:
+            self.temps[reg] = expr
+
+    def decompile_block(self, start: int, end: int) -> list[ast.Stmt]:
+        code = self.code
+        ops = code.code
+        body: list[ast.Stmt] = []
+        pc = start
+        while pc < end:
+            if not self.temps:
+                # this is the beginning of a statement
+                self.loc = code.locs.get(pc, self.loc)
+            loc = self.loc
+            op = ops[pc]
+            size = instr_size(ops, pc)
+            if op == PASS:
+                body.append(ast.Pass(loc))
+            elif op == DECLARE:
+                r, f, k = ops[pc+1], ops[pc+2], ops[pc+3]
+                body.append(ast.VarDef(loc, VARKINDS[k], code.varnames[r],
+                                       self.fqnconst(code.fqns[f])))
+            elif op == LOAD_CONST:
+                dst, k = ops[pc+1], ops[pc+2]
+                value = code.consts[k]
+                expr: ast.Expr
+                if type(value) is str:
+                    expr = ast.StrConst(loc, value)
+                else:
+                    expr = ast.Constant(loc, value)
+                self.write(dst, expr, body)
+            elif op == LOAD_FQN:
+                dst, f = ops[pc+1], ops[pc+2]
+                self.write(dst, self.fqnconst(code.fqns[f]), body)
+            elif op == LOAD_GLOBAL:
+                dst, n = ops[pc+1], ops[pc+2]
+                self.write(dst, ast.Name(loc, code.names[n]), body)
+            elif op == STORE_GLOBAL:
+                n, src = ops[pc+1], ops[pc+3]
+                target = ast.StrConst(loc, code.names[n])
+                body.append(ast.Assign(loc, target, self.read(src)))
+            elif op == MOVE:
+                dst, src = ops[pc+1], ops[pc+2]
+                self.write(dst, self.read(src), body)
+            elif op == POP:
+                body.append(ast.StmtExpr(loc, self.read(ops[pc+1])))
+            elif op == CALL or op == BUILD_LIST:
+                dst, x, n = ops[pc+1], ops[pc+2], ops[pc+3]
+                args = [self.read(r) for r in ops[pc+4:pc+4+n]]
+                if op == CALL:
+                    expr = ast.Call(loc, self.fqnconst(code.fqns[x]), args)
+                else:
+                    expr = ast.List(loc, args)
+                if dst == -1:
+                    body.append(ast.StmtExpr(loc, expr))
+                else:
+                    self.write(dst, expr, body)
+            elif op == RETURN:
+                body.append(ast.Return(loc, self.read(ops[pc+1])))
+            elif op == END:
+                pass
+            elif op == JUMP_IF_FALSE:
+                pc = self.decompile_jif(pc, body)
+                continue
+            else:
+                assert False, f'unexpected opcode: {OPNAMES[op]}'
+            pc += size
+        return body
+
+    def decompile_jif(self, pc: int, body: list[ast.Stmt]) -> int:
+        """
+        Decompile the If or While which starts at the JUMP_IF_FALSE at pc,
+        and return the position of the following instruction.
+        """
+        ops = self.code.code
+        loc = self.loc
+        test = self.read(ops[pc+1])
+        target = ops[pc+2]
+        start = pc + 3
+        last = self.prev[target]
+        if ops[last] == JUMP and ops[last+1] <= pc:
+            # backward jump to the test: this is a while loop
+            loop_body = self.decompile_block(start, last)
+            body.append(ast.While(loc, test, loop_body))
+            return target
+        elif ops[last] == JUMP and last >= start and ops[last+1] >= target:
+            # forward jump at the end of the then branch: if/else. Note that
+            # a backward JUMP here belongs to a while which ends the then
+            # branch, and it's handled by the plain If below
+            end = ops[last+1]
+            then_body = self.decompile_block(start, last)
+            else_body = self.decompile_block(target, end)
+            body.append(ast.If(loc, test, then_body, else_body))
+            return end
+        else:
+            then_body = self.decompile_block(start, target)
+            body.append(ast.If(loc, test, then_body, []))
+            return target
+
+
+def compile_func(vm: 'SPyVM', w_func: W_ASTFunc) -> SPyCode:
+    return BytecodeCompiler(vm, w_func).compile()
+
+def decompile(code: SPyCode) -> W_ASTFunc:
+    """
+    Reconstruct a redshifted W_ASTFunc, executed by the given code
+    """
+    funcdef = Decompiler(code).decompile()
+    locals_types_w = dict(zip(code.varnames, code.locals_types_w))
+    w_func = W_ASTFunc(code.w_functype, code.fqn, funcdef, (),
+                       locals_types_w=locals_types_w)
+    return w_func
+
+
+# ===== serialization =====
+
+def encode_loc(loc: Loc) -> tuple:
+    return (loc.filename, loc.line_start, loc.line_end,
+            loc.col_start, loc.col_end)
+
+def decode_loc(t: tuple) -> Loc:
+    return Loc(*t)
+
+
+class Serializer:
+    """
+    Turn the redshifted content of a module into bytes, see dump_module
+    """
+
+    def __init__(self, vm: 'SPyVM') -> None:
+        self.vm = vm
+
+    def encode_type(self, w_type: W_Type) -> Any:
+        """
+        Types are referenced by FQN, apart from list types which are
+        created on demand.
+        """
+        if isinstance(w_type, W_ListType):
+            return ('list', self.encode_type(w_type.w_itemtype))
+        if self.vm.lookup_global(w_type.fqn) is not w_type:
+            raise NotImplementedError(f'cannot serialize type {w_type.fqn}')
+        return str(w_type.fqn)
+
+    def encode_fqn(self, fqn: FQN) -> Any:
+        # types (e.g. list[i32]) might be registered in the globals only by
+        # the VM which did the redshift: we store enough info to recreate
+        # them
+        w_obj = self.vm.lookup_global(fqn)
+        if isinstance(w_obj, W_Type):
+            return (str(fqn), self.encode_type(w_obj))
+        return (str(fqn), None)
+
+    def encode_functype(self, w_functype: W_FuncType) -> Any:
+        params = tuple((p.name, self.encode_type(p.w_type), p.kind)
+                       for p in w_functype.params)
+        return (params, self.encode_type(w_functype.w_restype),
+                w_functype.color)
+
+    def encode_code(self, code: SPyCode) -> Any:
+        return (
+            str(code.fqn),
+            encode_loc(code.loc),
+            self.encode_functype(code.w_functype),
+            tuple(code.varnames),
+            tuple(self.encode_type(w_t) for w_t in code.locals_types_w),
+            code.nregs,
+            array('i', code.code).tobytes(),
+            tuple(code.consts),
+            tuple(code.names),
+            tuple(self.encode_fqn(fqn) for fqn in code.fqns),
+            tuple(self.encode_type(w_t) for w_t in code.listtypes_w),
+            tuple((pc, encode_loc(loc)) for pc, loc in code.locs.items()),
+        )
+
+    def dump_module(self, modname: str) -> bytes:
+        w_mod = self.vm.modules_w[modname]
+        funcs = []
+        vars = []
+        for fqn, w_obj in w_mod.items_w():
+            if isinstance(w_obj, W_ASTFunc):
+                if w_obj.color == 'red':
+                    code = compile_func(self.vm, w_obj)
+                    funcs.append(self.encode_code(code))
+                # blue functions are not needed by redshifted code
+            else:
+                w_type = self.vm.dynamic_type(w_obj)
+                if w_type in (B.w_i32, B.w_f64, B.w_bool, B.w_str):
+                    value = self.vm.unwrap(w_obj)
+                    if w_type is B.w_i32:
+                        value = int(value)
+                    vars.append((str(fqn), value))
+        data = (MAGIC, VERSION, modname, w_mod.filepath,
+                tuple(vars), tuple(funcs))
+        return marshal.dumps(data)
+
+
+class Deserializer:
+    """
+    Load a module from the bytes produced by Serializer
+    """
+
+    def __init__(self, vm: 'SPyVM') -> None:
+        self.vm = vm
+        self.new_types_w: dict[FQN, W_Type] = {}
+
+    def lookup(self, fqn: FQN) -> W_Object:
+        w_obj = self.vm.lookup_global(fqn)
+        if w_obj is None:
+            raise SPyImportError(f'cannot load .spyc: `{fqn}` not found')
+        return w_obj
+
+    def decode_type(self, t: Any) -> W_Type:
+        if isinstance(t, tuple):
+            return self.decode_listtype(t)
+        w_type = self.lookup(FQN(t))
+        assert isinstance(w_type, W_Type)
+        return w_type
+
+    def decode_listtype(self, t: Any) -> W_ListType:
+        kind, itemtype = t
+        assert kind == 'list'
+        return self.vm.make_list_type(self.decode_type(itemtype))
+
+    def decode_fqn(self, t: Any) -> FQN:
+        s, type_enc = t
+        fqn = FQN(s)
+        if type_enc is not None and self.vm.lookup_global(fqn) is None:
+            # the type will be added to the globals by load_module
+            self.new_types_w[fqn] = self.decode_type(type_enc)
+        return fqn
+
+    def decode_functype(self, t: Any) -> W_FuncType:
+        params_enc, restype_enc, color = t
+        params = [FuncParam(name, self.decode_type(t), kind)
+                  for name, t, kind in params_enc]
+        w_restype = self.decode_type(restype_enc)
+        return W_FuncType.new(params, w_restype, color=color)
+
+    def decode_code(self, t: Any) -> SPyCode:
+        (fqn, loc, functype, varnames, locals_types, nregs, code_bytes,
+         consts, names, fqns, types, locs) = t
+        code = array('i')
+        code.frombytes(code_bytes)
+        return SPyCode(
+            fqn = FQN(fqn),
+            loc = decode_loc(loc),
+            w_functype = self.decode_functype(functype),
+            varnames = list(varnames),
+            locals_types_w = [self.decode_type(t) for t in locals_types],
+            nregs = nregs,
+            code = code.tolist(),
+            consts = list(consts),
+            names = list(names),
+            fqns = [self.decode_fqn(t) for t in fqns],
+            listtypes_w = [self.decode_listtype(t) for t in types],
+            locs = {pc: decode_loc(loc) for pc, loc in locs},
+        )
+
+    def load_module(self, data: bytes) -> W_Module:
+        """
+        Load the module. In case of errors, SPyImportError is raised and
+        the VM is left untouched.
+        """
+        from spy.vm.bcinterp import BytecodeImpl
+        vm = self.vm
+        magic, version, modname, filepath, vars, funcs = marshal.loads(data)
+        if magic != MAGIC or version != VERSION:
+            raise SPyImportError(f'invalid .spyc file for module {modname}')
+        if modname in vm.modules_w:
+            raise SPyImportError(f'module {modname} already exists')
+        codes = [self.decode_code(t) for t in funcs]
+        #
+        # check that all the references can be resolved
+        defined = {FQN(name) for name, value in vars}
+        defined.update(code.fqn for code in codes)
+        defined.update(self.new_types_w)
+        for code in codes:
+            for fqn in code.fqns:
+                if fqn not in defined:
+                    self.lookup(fqn)
+        #
+        w_mod = W_Module(vm, modname, filepath)
+        vm.register_module(w_mod)
+        for fqn, w_type in self.new_types_w.items():
+            vm.add_global(fqn, w_type)
+        for name, value in vars:
+            vm.add_global(FQN(name), vm.wrap(value))
+        for code in codes:
+            w_func = decompile(code)
+            w_func.py_impl = BytecodeImpl(vm, code)
+            vm.add_global(code.fqn, w_func)
+        return w_mod
+
+
+def dump_module(vm: 'SPyVM', modname: str) -> bytes:
+    """
+    Serialize the given module, which must have been redshifted
+    """
+    return Serializer(vm).dump_module(modname)
+
+def load_module(vm: 'SPyVM', data: bytes) -> W_Module:
+    """
+    Load a module serialized by dump_module. The functions of the module are
+    executed by spy.vm.bcinterp.
+    """
+    return Deserializer(vm).load_module(data)
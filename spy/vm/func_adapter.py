@@ -42,6 +42,7 @@ class W_FuncAdapter(W_Func):
     The transformation rules are stored into a list of ArgSpec, which
     effectively encodes a mini-AST.
     """
+    __slots__ = ('w_func', 'args')
     fqn = FQN('builtins::__adapter__')
 
     def __init__(self, w_functype: W_FuncType, w_func: W_Func,
@@ -3,16 +3,20 @@ from typing import (TYPE_CHECKING, Any, Optional, Callable, Sequence, Literal,
                     Iterator, Self)
 from spy import ast
 from spy.location import Loc
+from spy.errors import SPyError
 from spy.ast import Color
 from spy.fqn import FQN, NSPart
 from spy.vm.object import W_Object, W_Type, builtin_method
 if TYPE_CHECKING:
     from spy.vm.vm import SPyVM
     from spy.vm.opimpl import W_OpImpl, W_OpArg
+    from spy.vm.opcache import OpCache
+    from spy.vm.astcompiler import STMT
 
-# dictionary which contains local vars in an ASTFrame. The type is defined
-# here because it's also used by W_ASTFunc.closure.
-Namespace = dict[str, Optional[W_Object]]
+# list which contains local vars in an ASTFrame, indexed by Symbol.slot. The
+# type is defined here because it's also used by W_ASTFunc.closure: a
+# closed-over variable is found at closure[-sym.level][sym.slot].
+Namespace = list[Optional[W_Object]]
 CLOSURE = tuple[Namespace, ...]
 
 FuncParamKind = Literal['simple', 'varargs']
@@ -161,6 +165,9 @@ class W_FuncType(W_Type):
 W_FuncType._w = W_Type.declare(FQN('builtins::functype'))
 
 class W_Func(W_Object):
+    # W_FuncAdapter uses __slots__, so we need them here too (see W_Object).
+    # The other subclasses get a __dict__ as usual.
+    __slots__ = ('w_functype', 'fqn', 'def_loc')
     __spy_storage_category__ = 'reference'
 
     w_functype: W_FuncType
@@ -226,6 +233,16 @@ class W_ASTFunc(W_Func):
     # types of local variables: this is non-None IIF the function has been
     # redshifted.
     locals_types_w: Optional[dict[str, W_Type]]
+    # inline cache of opimpls, created lazily by ASTFrame
+    opcache: Optional['OpCache']
+    # body compiled into closures, created lazily by ASTFrame
+    compiled_body: Optional[list['STMT']]
+    # Python implementation of a redshifted function, see spy.backend.python
+    py_impl: Optional[Callable[[Sequence[W_Object]], W_Object]]
+    # lazy redshift, see W_ASTFunc.tier_up_maybe
+    ncalls: int
+    w_redshifted: Optional['W_ASTFunc']
+    redshift_failed: bool
 
     def __init__(self,
                  w_functype: W_FuncType,
@@ -241,6 +258,12 @@ class W_ASTFunc(W_Func):
         self.funcdef = funcdef
         self.closure = closure
         self.locals_types_w = locals_types_w
+        self.opcache = None
+        self.compiled_body = None
+        self.py_impl = None
+        self.ncalls = 0
+        self.w_redshifted = None
+        self.redshift_failed = False
 
     @property
     def redshifted(self) -> bool:
@@ -257,9 +280,55 @@ class W_ASTFunc(W_Func):
 
     def raw_call(self, vm: 'SPyVM', args_w: Sequence[W_Object]) -> W_Object:
         from spy.vm.astframe import ASTFrame
-        frame = ASTFrame(vm, self)
+        if self.py_impl is not None:
+            return self.py_impl(args_w)
+        w_func = self
+        if vm.redshift_threshold is not None and not self.redshifted:
+            w_func = self.tier_up_maybe(vm, vm.redshift_threshold)
+        frame = ASTFrame(vm, w_func)
         return frame.run(args_w)
 
+    def tier_up_maybe(self, vm: 'SPyVM', threshold: int) -> 'W_ASTFunc':
+        """
+        Lazy per-function redshift.
+
+        Red functions are interpreted normally for their first `threshold`
+        calls. After that, we redshift them and execute the redshifted
+        version, in which all the opimpls are already resolved.
+
+        The redshifted function also replaces the original one in
+        vm.globals_w, but references to the original W_ASTFunc might be
+        around (e.g. inside opimpls), so we also remember it in
+        self.w_redshifted.
+
+        In interp mode errors are lazy, while redshift reports them
+        eagerly; moreover, redshift does not support yet everything which
+        the interpreter supports (e.g. tuples), and raises
+        NotImplementedError. In both cases we just keep interpreting the
+        function, so that errors are raised only if and when the offending
+        code is executed. Any other exception is a bug and is propagated.
+        """
+        from spy.doppler import redshift
+        if self.w_redshifted is not None:
+            return self.w_redshifted
+        if self.color == 'blue' or self.redshift_failed:
+            return self
+        self.ncalls += 1
+        if self.ncalls <= threshold:
+            return self
+        try:
+            w_newfunc = redshift(vm, self)
+        except (SPyError, NotImplementedError):
+            self.redshift_failed = True
+            return self
+        assert w_newfunc.redshifted
+        self.w_redshifted = w_newfunc
+        # the two functions are semantically equivalent, so we don't need to
+        # go through vm.store_global and invalidate the caches
+        if vm.globals_w.get(self.fqn) is self:
+            vm._set_global(self.fqn, w_newfunc)
+        return w_newfunc
+
 
 class W_BuiltinFunc(W_Func):
     """
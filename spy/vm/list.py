@@ -67,6 +67,7 @@ class W_BaseList(W_Object):
     The specialized types are created by calling the builtin make_list_type:
     see its docstring for details.
     """
+    __slots__ = ()
     __spy_storage_category__ = 'reference'
 
     def __init__(self, items_w: Any) -> None:
@@ -82,6 +83,7 @@ class W_BaseList(W_Object):
 T = TypeVar('T', bound='W_Object')
 
 class W_List(W_BaseList, Generic[T]):
+    __slots__ = ('w_listtype', 'items_w')
     w_listtype: W_ListType
     items_w: list[T]
 
@@ -102,6 +104,11 @@ class W_List(W_BaseList, Generic[T]):
     def spy_unwrap(self, vm: 'SPyVM') -> list[Any]:
         return [vm.unwrap(w_item) for w_item in self.items_w]
 
+    def spy_key(self, vm: 'SPyVM') -> Any:
+        # lists compare by value (see w_EQ) but they are mutable, so they
+        # cannot be hashed
+        return None
+
     @staticmethod
     def _get_listtype(wop_list: W_OpArg) -> W_ListType:
         w_listtype = wop_list.w_static_type
@@ -19,6 +19,9 @@ class W_Module(W_Object):
     vm: 'SPyVM'
     name: str
     filepath: str
+    # FQNs of the module content, in insertion order (used as an ordered
+    # set). It is kept in sync by vm.add_global and vm.store_global.
+    fqns: dict[FQN, None]
     _frozen: bool
     __spy_storage_category__ = 'reference'
 
@@ -26,6 +29,7 @@ class W_Module(W_Object):
         self.vm = vm
         self.name = name
         self.filepath = filepath
+        self.fqns = {}
 
     def __repr__(self) -> str:
         return f'<spy module {self.name}>'
@@ -85,13 +89,16 @@ class W_Module(W_Object):
         self.vm.store_global(fqn, w_value)
 
     def keys(self) -> Iterable[FQN]:
-        for fqn in self.vm.globals_w.keys():
-            if fqn.modname == self.name:
-                yield fqn
+        for fqn, w_obj in self.items_w():
+            yield fqn
 
     def items_w(self) -> Iterable[tuple[FQN, W_Object]]:
-        for fqn, w_obj in self.vm.globals_w.items():
-            if fqn.modname == self.name:
+        globals_w = self.vm.globals_w
+        for fqn in self.fqns:
+            # the global might have been removed by writing to
+            # vm.globals_w directly
+            w_obj = globals_w.get(fqn)
+            if w_obj is not None:
                 yield fqn, w_obj
 
     def pp(self) -> None:
@@ -1,6 +1,5 @@
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING
 from spy.vm.b import B
-from spy.vm.object import W_Object, W_Type
 from spy.vm.primitive import W_F64, W_Bool
 from . import OP
 if TYPE_CHECKING:
@@ -8,51 +7,56 @@ if TYPE_CHECKING:
 
 # the following style is a bit too verbose. We could greatly reduce code
 # duplication by using some metaprogramming, but it might become too
-# magic. Or, it would be nice to have automatic unwrapping.
-# Let's to the dumb&verbose thing for now
-
-def _f64_op(vm: 'SPyVM', w_a: W_Object, w_b: W_Object, fn: Any) -> Any:
-    a = vm.unwrap_f64(w_a)
-    b = vm.unwrap_f64(w_b)
-    res = fn(a, b)
-    return vm.wrap(res)
+# magic. See also opimpl_i32.py.
 
 @OP.builtin_func
 def w_f64_add(vm: 'SPyVM', w_a: W_F64, w_b: W_F64) -> W_F64:
-    return _f64_op(vm, w_a, w_b, lambda a, b: a + b)
+    return W_F64(w_a.value + w_b.value)
 
 @OP.builtin_func
 def w_f64_sub(vm: 'SPyVM', w_a: W_F64, w_b: W_F64) -> W_F64:
-    return _f64_op(vm, w_a, w_b, lambda a, b: a - b)
+    return W_F64(w_a.value - w_b.value)
 
 @OP.builtin_func
 def w_f64_mul(vm: 'SPyVM', w_a: W_F64, w_b: W_F64) -> W_F64:
-    return _f64_op(vm, w_a, w_b, lambda a, b: a * b)
+    return W_F64(w_a.value * w_b.value)
 
 @OP.builtin_func
 def w_f64_div(vm: 'SPyVM', w_a: W_F64, w_b: W_F64) -> W_F64:
-    return _f64_op(vm, w_a, w_b, lambda a, b: a / b)
+    return W_F64(w_a.value / w_b.value)
 
 @OP.builtin_func
 def w_f64_eq(vm: 'SPyVM', w_a: W_F64, w_b: W_F64) -> W_Bool:
-    return _f64_op(vm, w_a, w_b, lambda a, b: a == b)
+    if w_a.value == w_b.value:
+        return B.w_True
+    return B.w_False
 
 @OP.builtin_func
 def w_f64_ne(vm: 'SPyVM', w_a: W_F64, w_b: W_F64) -> W_Bool:
-    return _f64_op(vm, w_a, w_b, lambda a, b: a != b)
+    if w_a.value != w_b.value:
+        return B.w_True
+    return B.w_False
 
 @OP.builtin_func
 def w_f64_lt(vm: 'SPyVM', w_a: W_F64, w_b: W_F64) -> W_Bool:
-    return _f64_op(vm, w_a, w_b, lambda a, b: a < b)
+    if w_a.value < w_b.value:
+        return B.w_True
+    return B.w_False
 
 @OP.builtin_func
 def w_f64_le(vm: 'SPyVM', w_a: W_F64, w_b: W_F64) -> W_Bool:
-    return _f64_op(vm, w_a, w_b, lambda a, b: a <= b)
+    if w_a.value <= w_b.value:
+        return B.w_True
+    return B.w_False
 
 @OP.builtin_func
 def w_f64_gt(vm: 'SPyVM', w_a: W_F64, w_b: W_F64) -> W_Bool:
-    return _f64_op(vm, w_a, w_b, lambda a, b: a > b)
+    if w_a.value > w_b.value:
+        return B.w_True
+    return B.w_False
 
 @OP.builtin_func
 def w_f64_ge(vm: 'SPyVM', w_a: W_F64, w_b: W_F64) -> W_Bool:
-    return _f64_op(vm, w_a, w_b, lambda a, b: a >= b)
+    if w_a.value >= w_b.value:
+        return B.w_True
+    return B.w_False
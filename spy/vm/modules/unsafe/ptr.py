@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING, ClassVar, Optional, Annotated, Self
+from typing import TYPE_CHECKING, ClassVar, Optional, Annotated, Self, Any
 import fixedint
 from spy.errors import SPyPanicError
 from spy.fqn import FQN
@@ -91,6 +91,7 @@ class W_BasePtr(W_Object):
     Since it's a generic type, 'ptr' itself is not supposed to be instantiated.
     Concrete pointers such as 'ptr[i32]' are instances of W_Ptr.
     """
+    __slots__ = ()
 
     def __init__(self) -> None:
         raise Exception("You cannot instantiate W_BasePtr, use W_Ptr")
@@ -104,6 +105,7 @@ class W_Ptr(W_BasePtr):
     """
     An actual ptr
     """
+    __slots__ = ('w_ptrtype', 'addr', 'length')
     __spy_storage_category__ = 'value'
 
     # XXX: this works only if we target 32bit platforms such as wasm32, but we
@@ -139,6 +141,10 @@ class W_Ptr(W_BasePtr):
     def spy_unwrap(self, vm: 'SPyVM') -> 'W_BasePtr':
         return self
 
+    def spy_key(self, vm: 'SPyVM') -> Any:
+        # see w_EQ: two ptrs are equal if they have the same type and addr
+        return (self.w_ptrtype, int(self.addr))
+
     @staticmethod
     def _get_ptrtype(wop_ptr: W_OpArg) -> W_PtrType:
         w_ptrtype = wop_ptr.w_static_type
@@ -81,8 +81,13 @@ def builtin_method(name: str, *, color: Color = 'red') -> Any:
 
 class W_Object:
     """
-    The root of SPy object hierarchy
+    The root of SPy object hierarchy.
+
+    Some W_* classes are allocated at very high rates, so they use
+    __slots__: for this to work, all their bases need __slots__ as well,
+    including W_Object. The other subclasses don't need to declare them.
     """
+    __slots__ = ()
 
     _w: ClassVar['W_Type']                         # set by @builtin_type
 
@@ -108,6 +113,22 @@ class W_Object:
         raise Exception(f"Cannot unwrap app-level objects of type {spy_type} "
                         f"(interp-level type: {py_type})")
 
+    def spy_key(self, vm: 'SPyVM') -> Any:
+        """
+        Return an interp-level hashable key which identifies this object,
+        or None if the object cannot be hashed.
+
+        Two objects with equal keys MUST be equal according to
+        vm.universal_eq. This is used e.g. by BlueCache to index the
+        arguments of blue functions.
+
+        By default, reference objects are keyed by identity, and value
+        objects are not hashable: subclasses can override this.
+        """
+        if self.__spy_storage_category__ == 'reference':
+            return self
+        return None
+
 
     # ==== OPERATOR SUPPORT ====
     #
@@ -239,6 +260,9 @@ class W_Type(W_Object):
     _pyclass: Optional[Type[W_Object]]
     spy_members: dict[str, 'Member']
     _dict_w: Optional[dict[str, W_Object]]
+    # the ancestry of the type, computed lazily by _compute_mro
+    _mro_w: Optional[tuple['W_Type', ...]]
+    _mro_ids: Optional[frozenset[int]]
 
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         cls = self.__class__.__name__
@@ -275,6 +299,8 @@ class W_Type(W_Object):
         w_type.fqn = fqn
         w_type._pyclass = None
         w_type._dict_w = None
+        w_type._mro_w = None
+        w_type._mro_ids = None
         return w_type
 
     @classmethod
@@ -361,6 +387,40 @@ class W_Type(W_Object):
         assert isinstance(basecls._w, W_Type)
         return basecls._w
 
+    @property
+    def mro_w(self) -> tuple['W_Type', ...]:
+        """
+        The type itself followed by all its bases, up to <object>
+        """
+        if self._mro_w is None:
+            self._compute_mro()
+            assert self._mro_w is not None
+        return self._mro_w
+
+    def has_ancestor(self, w_type: 'W_Type') -> bool:
+        """
+        Return True if w_type is in the mro of self. This is O(1).
+        """
+        if self._mro_ids is None:
+            self._compute_mro()
+            assert self._mro_ids is not None
+        return id(w_type) in self._mro_ids
+
+    def _compute_mro(self) -> None:
+        # This cannot be done by define(), because the bases are not
+        # necessarily defined yet: e.g., all the @builtin_type are defined
+        # before <object>. It's safe to cache the result, because the base of
+        # a defined type never changes.
+        w_base = self.w_base
+        if isinstance(w_base, W_Type):
+            mro_w = (self,) + w_base.mro_w
+        else:
+            mro_w = (self,)
+        self._mro_w = mro_w
+        # W_Types compare by identity, but some of them (e.g. W_FuncType)
+        # have a custom __hash__ which is slow to compute: use the ids
+        self._mro_ids = frozenset(id(w_t) for w_t in mro_w)
+
     def __repr__(self) -> str:
         hints = [] if self.is_defined() else ['fwdecl']
         hints += self.repr_hints()
@@ -0,0 +1,96 @@
+from typing import TYPE_CHECKING, Optional, Sequence, Any
+from spy import ast
+from spy.vm.function import W_Func
+from spy.vm.opimpl import W_OpArg
+if TYPE_CHECKING:
+    from spy.vm.vm import SPyVM
+
+KEY = tuple[Any, ...]
+# the cached opimpl, plus the opargs which produced it: we keep them alive
+# because the keys contain the id() of their static types
+ENTRY = tuple[W_Func, Sequence[W_OpArg]]
+
+
+class OpCache:
+    """
+    Inline cache of the opimpls used by the AST nodes of a function.
+
+    Every time ASTFrame evaluates e.g. a BinOp, it needs to call the
+    corresponding OPERATOR to get an opimpl. This goes through vm.call_OP,
+    which allocates new W_OpArgs and does a lookup in the BlueCache: this is
+    wasteful, because inside a loop the same node is executed over and over
+    again with the same static types.
+
+    For each node we keep a small dict which maps the keys of the opargs
+    (see W_OpArg.spy_key) to the opimpl. The keys are the same which would
+    be used by the BlueCache, so a hit always returns the same opimpl that
+    vm.call_OP would return.
+
+    If a node sees more than MAX_ENTRIES different keys, it is considered
+    megamorphic and we stop caching it.
+
+    Invalidation: the whole cache is flushed whenever vm.globals_version
+    changes, i.e. when a global type or function is redefined.
+    """
+    MAX_ENTRIES = 4
+
+    vm: 'SPyVM'
+    version: int
+    nodes: dict[ast.Node, Optional[dict[KEY, ENTRY]]]
+    # nodes fabricated by ASTFrame, see AbstractFrame._unpack_item_expr
+    fabricated: dict[tuple[ast.Node, int], ast.Expr]
+
+    def __init__(self, vm: 'SPyVM') -> None:
+        self.vm = vm
+        self.version = vm.globals_version
+        self.nodes = {}
+        self.fabricated = {}
+
+    def get_key(self, w_OP: W_Func,
+                args_wop: Sequence[W_OpArg]) -> Optional[KEY]:
+        """
+        Compute the key of args_wop, taking into account that vm.call_OP
+        turns some of the arguments into red ones. Return None if any of the
+        arguments is not hashable.
+        """
+        n_blue = self.vm.OP_n_blue_args(w_OP)
+        keys: list[Any] = [w_OP]
+        for i, wop in enumerate(args_wop):
+            if i < n_blue:
+                k = wop.spy_key(self.vm)
+                if k is None:
+                    return None
+            else:
+                k = ('red', id(wop.w_static_type))
+            keys.append(k)
+        return tuple(keys)
+
+    def call_OP(self, node: ast.Node, w_OP: W_Func,
+                args_wop: Sequence[W_OpArg]) -> W_Func:
+        """
+        Like vm.call_OP, but cached on the given node
+        """
+        if self.version != self.vm.globals_version:
+            self.nodes.clear()
+            self.version = self.vm.globals_version
+
+        entries = self.nodes.get(node, {})
+        if entries is None:
+            # megamorphic
+            return self.vm.call_OP(w_OP, args_wop)
+
+        key = self.get_key(w_OP, args_wop)
+        if key is None:
+            return self.vm.call_OP(w_OP, args_wop)
+
+        entry = entries.get(key)
+        if entry is not None:
+            return entry[0]
+
+        w_opimpl = self.vm.call_OP(w_OP, args_wop)
+        if len(entries) >= self.MAX_ENTRIES:
+            self.nodes[node] = None
+        else:
+            entries[key] = (w_opimpl, args_wop)
+            self.nodes[node] = entries
+        return w_opimpl
@@ -27,7 +27,7 @@ blue and can be optimized away during redshifting.
 from typing import (Annotated, Optional, ClassVar, no_type_check, TypeVar, Any,
                     TYPE_CHECKING)
 from spy import ast
-from spy.location import Loc
+from spy.location import Loc, LazyLoc
 from spy.irgen.symtable import Symbol, Color
 from spy.errors import SPyTypeError
 from spy.vm.b import OPERATOR, B
@@ -74,9 +74,10 @@ class W_OpArg(W_Object):
 
     Blue OpArg always have an associated value.
     """
+    __slots__ = ('color', 'w_static_type', '_loc', '_w_val', 'sym')
     color: Color
     w_static_type: Annotated[W_Type, Member('static_type')]
-    loc: Loc
+    _loc: Loc | LazyLoc
     _w_val: Optional[W_Object]
     sym: Optional[Symbol]
 
@@ -85,7 +86,7 @@ class W_OpArg(W_Object):
                  color: Color,
                  w_static_type: W_Type,
                  w_val: Optional[W_Object],
-                 loc: Loc,
+                 loc: Loc | LazyLoc,
                  *,
                  sym: Optional[Symbol] = None,
                  ) -> None:
@@ -99,13 +100,13 @@ class W_OpArg(W_Object):
         self.color = color
         self.w_static_type = w_static_type
         self._w_val = w_val
-        self.loc = loc
+        self._loc = loc
         self.sym = sym
 
     @classmethod
     def from_w_obj(cls, vm: 'SPyVM', w_obj: W_Object) -> 'W_OpArg':
         w_type = vm.dynamic_type(w_obj)
-        return W_OpArg(vm, 'blue', w_type, w_obj, Loc.here(-2))
+        return W_OpArg(vm, 'blue', w_type, w_obj, LazyLoc.here(-2))
 
     def __repr__(self) -> str:
         if self.is_blue():
@@ -118,10 +119,29 @@ class W_OpArg(W_Object):
     def is_blue(self) -> bool:
         return self.color == 'blue'
 
+    @property
+    def loc(self) -> Loc:
+        loc = self._loc
+        if isinstance(loc, LazyLoc):
+            loc = self._loc = loc.materialize()
+        return loc
+
+    def spy_key(self, vm: 'SPyVM') -> Any:
+        """
+        See w_oparg_eq: static types are compared by identity, and blue
+        OpArgs also compare their values.
+        """
+        if self.color == 'red':
+            return ('red', id(self.w_static_type))
+        k = self.w_blueval.spy_key(vm)
+        if k is None:
+            return None
+        return ('blue', id(self.w_static_type), k)
+
     def as_red(self, vm: 'SPyVM') -> 'W_OpArg':
         if self.color == 'red':
             return self
-        return W_OpArg(vm, 'red', self.w_static_type, self._w_val, self.loc,
+        return W_OpArg(vm, 'red', self.w_static_type, self._w_val, self._loc,
                        sym=self.sym)
 
     @property
@@ -207,6 +227,7 @@ def w_oparg_eq(vm: 'SPyVM', wop1: W_OpArg, wop2: W_OpArg) -> W_Bool:
 
 @OPERATOR.builtin_type('OpImpl', lazy_definition=True)
 class W_OpImpl(W_Object):
+    __slots__ = ('_w_func', '_args_wop', 'is_direct_call')
     NULL: ClassVar['W_OpImpl']
     _w_func: Optional[W_Func]
     _args_wop: Optional[list[W_OpArg]]
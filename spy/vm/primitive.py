@@ -1,4 +1,4 @@
-from typing import Annotated, ClassVar, TYPE_CHECKING
+from typing import Annotated, ClassVar, TYPE_CHECKING, Any
 import fixedint
 from spy.fqn import FQN
 from spy.vm.object import W_Object, W_Type
@@ -25,26 +25,72 @@ class W_Void(W_Object):
     def spy_unwrap(self, vm: 'SPyVM') -> None:
         return None
 
+    def spy_key(self, vm: 'SPyVM') -> Any:
+        return self
+
 B.add('None', W_Void.__new__(W_Void))
 
 
 @B.builtin_type('i32')
 class W_I32(W_Object):
-    value: fixedint.Int32
+    """
+    The value is stored as a plain Python int, which is always in the range
+    of a signed 32 bit integer: wrap-around is implemented by masking, see
+    W_I32.make().
+
+    Small integers are preallocated and shared, similarly to CPython. Since
+    W_I32 is immutable, it is always safe to use W_I32.make() instead of
+    instantiating the class directly.
+    """
+    __slots__ = ('value',)
+    value: int
+
+    SMALL_MIN: ClassVar[int] = -128
+    SMALL_MAX: ClassVar[int] = 1024
+    SMALL_INTS: ClassVar[list['W_I32']]
 
     def __init__(self, value: int | fixedint.Int32) -> None:
         assert type(value) in (int, fixedint.Int32)
-        self.value = fixedint.Int32(value)
+        self.value = i32_wrap(int(value))
+
+    @staticmethod
+    def make(value: int) -> 'W_I32':
+        """
+        Return a W_I32 for the given int, wrapping it around if needed.
+        """
+        if not (I32_MIN <= value <= I32_MAX):
+            value = i32_wrap(value)
+        if W_I32.SMALL_MIN <= value <= W_I32.SMALL_MAX:
+            return W_I32.SMALL_INTS[value - W_I32.SMALL_MIN]
+        w_obj = W_I32.__new__(W_I32)
+        w_obj.value = value
+        return w_obj
 
     def __repr__(self) -> str:
         return f'W_I32({self.value})'
 
     def spy_unwrap(self, vm: 'SPyVM') -> fixedint.Int32:
-        return self.value
+        return fixedint.Int32(self.value)
+
+    def spy_key(self, vm: 'SPyVM') -> Any:
+        return ('i32', self.value)
+
+I32_MIN = -2**31
+I32_MAX = 2**31 - 1
+
+def i32_wrap(value: int) -> int:
+    """
+    Wrap-around the given int into the range of a signed 32 bit integer
+    """
+    return ((value - I32_MIN) & 0xFFFFFFFF) + I32_MIN
+
+W_I32.SMALL_INTS = [W_I32(i) for i in range(W_I32.SMALL_MIN,
+                                             W_I32.SMALL_MAX + 1)]
 
 
 @B.builtin_type('f64')
 class W_F64(W_Object):
+    __slots__ = ('value',)
     value: float
 
     def __init__(self, value: float) -> None:
@@ -57,9 +103,13 @@ class W_F64(W_Object):
     def spy_unwrap(self, vm: 'SPyVM') -> float:
         return self.value
 
+    def spy_key(self, vm: 'SPyVM') -> Any:
+        return ('f64', self.value)
+
 
 @B.builtin_type('bool')
 class W_Bool(W_Object):
+    __slots__ = ('value',)
     value: bool
 
     def __init__(self, value: bool) -> None:
@@ -79,6 +129,10 @@ class W_Bool(W_Object):
     def spy_unwrap(self, vm: 'SPyVM') -> bool:
         return self.value
 
+    def spy_key(self, vm: 'SPyVM') -> Any:
+        # W_Bool is a singleton
+        return self
+
     def not_(self, vm: 'SPyVM') -> 'W_Bool':
         if self.value:
             return B.w_False
@@ -97,6 +151,9 @@ class W_NotImplementedType(W_Object):
         # create additional instances
         raise Exception("You cannot instantiate W_NotImplementedType")
 
+    def spy_key(self, vm: 'SPyVM') -> Any:
+        return self
+
 B.add('NotImplemented', W_NotImplementedType.__new__(W_NotImplementedType))
 
 
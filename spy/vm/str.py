@@ -36,6 +36,7 @@ class W_Str(W_Object):
             const char utf8[];
         } spy_Str;
     """
+    __slots__ = ('vm', 'ptr')
     vm: 'SPyVM'
     ptr: int
 
@@ -69,6 +70,9 @@ class W_Str(W_Object):
     def spy_unwrap(self, vm: 'SPyVM') -> str:
         return self._as_str()
 
+    def spy_key(self, vm: 'SPyVM') -> Any:
+        return ('str', self.get_utf8())
+
     @builtin_method('__GETITEM__', color='blue')
     @staticmethod
     def w_GETITEM(vm: 'SPyVM', wop_obj: W_OpArg, wop_i: W_OpArg) -> W_OpImpl:
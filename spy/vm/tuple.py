@@ -18,7 +18,7 @@ class W_Tuple(W_Object):
 
     Eventally, it will become a "real" type-safe, generic type.
     """
-
+    __slots__ = ('items_w',)
     items_w: list[W_Object]
 
     def __init__(self, items_w: list[W_Object]) -> None:
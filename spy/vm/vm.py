@@ -1,13 +1,14 @@
 import py
+import time
+from collections import deque
 from typing import Any, Optional, Iterable, Sequence
-import itertools
 from dataclasses import dataclass
 from types import FunctionType
 import fixedint
 from spy.fqn import FQN
-from spy.location import Loc
+from spy.location import LazyLoc
 from spy import libspy
-from spy.doppler import redshift
+from spy.doppler import redshift, get_references
 from spy.errors import SPyTypeError
 from spy.vm.object import W_Object, W_Type
 from spy.vm.primitive import W_F64, W_I32, W_Bool, W_Dynamic
@@ -36,6 +37,27 @@ W_OpArg._w.define(W_OpArg)
 W_FuncType._w.define(W_FuncType)
 
 
+@dataclass
+class VMSnapshot:
+    """
+    The state of a SPyVM, captured by SPyVM.snapshot()
+    """
+    globals_w: dict[FQN, W_Object]
+    globals_rev: dict[int, list[FQN]]
+    unique_FQN_counters: dict[FQN, int]
+    # (name, filepath, fqns) of each module
+    modules: list[tuple[str, str, dict[FQN, None]]]
+    bluecache: BlueCache
+    globals_version: int
+    path: list[str]
+    ast_compile: bool
+    redshift_threshold: Optional[int]
+    parse_cache: bool
+    # the image of the libspy linear memory, or None if it's identical to
+    # the one of a fresh instance
+    mem: Optional[bytes]
+
+
 class SPyVM:
     """
     A Virtual Machine to execute SPy code.
@@ -43,18 +65,51 @@ class SPyVM:
     Each instance of the VM contains an instance of libspy.wasm: all the
     non-scalar objects (e.g. strings) are stored in the WASM linear memory.
     """
-    ll: libspy.LLSPyInstance
+    # the libspy instance is created lazily, see the ll property
+    _ll: Optional[libspy.LLSPyInstance]
+    # memory image to load into _ll when it's created, see from_snapshot
+    _ll_mem: Optional[bytes]
     globals_w: dict[FQN, W_Object]
+    # reverse index of globals_w: id(w_obj) -> FQNs which contain it, in
+    # insertion order. Always update it through _set_global.
+    globals_rev: dict[int, list[FQN]]
+    # red functions which still need to be redshifted, see redshift()
+    redshift_worklist: deque[tuple[FQN, W_ASTFunc]]
+    # time spent to redshift each function, in seconds
+    redshift_timings: dict[FQN, float]
+    # next suffix to try for each base FQN, see get_unique_FQN
+    unique_FQN_counters: dict[FQN, int]
     modules_w: dict[str, W_Module]
     path: list[str]
     bluecache: BlueCache
+    # incremented every time a global type or function is redefined, used
+    # to invalidate the OpCaches
+    globals_version: int
+    # if True, ASTFrame runs the functions compiled into closures, see
+    # spy.vm.astcompiler
+    ast_compile: bool
+    # if not None, red functions are redshifted lazily after this many
+    # calls, see W_ASTFunc.tier_up_maybe
+    redshift_threshold: Optional[int]
+    # if True, import_() reuses the AST and the symtables of the modules
+    # from __spycache__, see spy.cache.ParseCache
+    parse_cache: bool
 
     def __init__(self) -> None:
-        self.ll = libspy.LLSPyInstance(libspy.LLMOD)
+        self._ll = None
+        self._ll_mem = None
         self.globals_w = {}
+        self.globals_rev = {}
+        self.redshift_worklist = deque()
+        self.redshift_timings = {}
+        self.unique_FQN_counters = {}
         self.modules_w = {}
         self.path = []
         self.bluecache = BlueCache(self)
+        self.globals_version = 0
+        self.ast_compile = True
+        self.redshift_threshold = None
+        self.parse_cache = False
         self.make_module(BUILTINS)   # builtins::
         self.make_module(OPERATOR)   # operator::
         self.make_module(TYPES)      # types::
@@ -62,6 +117,97 @@ class SPyVM:
         self.make_module(RAW_BUFFER) # rawbuffer::
         self.make_module(JSFFI)      # jsffi::
 
+    @property
+    def ll(self) -> libspy.LLSPyInstance:
+        """
+        The instance of libspy.wasm. Instantiating it is relatively
+        expensive, and many VMs never need it, so it is done on demand.
+        """
+        if self._ll is None:
+            self._ll = libspy.LLSPyInstance(libspy.get_LLMOD())
+            if self._ll_mem is not None:
+                self._ll.mem.write_all(self._ll_mem)
+                self._ll_mem = None
+        return self._ll
+
+    def snapshot(self) -> VMSnapshot:
+        """
+        Capture the current state of the VM. New independent VMs can be
+        created from it by from_snapshot(), which is much cheaper than
+        creating and initializing a new VM from scratch.
+
+        The W_Objects are shared between the VM and its clones, in the same
+        way as the builtin objects are shared between all VMs. For this
+        reason, it's not possible to snapshot a VM which contains objects
+        bound to it, such as modules, functions or strings created by
+        user code.
+        """
+        if self.redshift_worklist:
+            raise ValueError('cannot snapshot a VM with pending redshifts')
+        for w_obj in self._all_cached_objects():
+            if isinstance(w_obj, (W_ASTFunc, W_Str, W_Module)):
+                raise ValueError(f'cannot snapshot a VM containing {w_obj}')
+        mem = self._ll_mem
+        if self._ll is not None:
+            mem = self._ll.mem.read_all()
+            if mem == libspy.get_initial_memory():
+                mem = None
+        return VMSnapshot(
+            globals_w = self.globals_w.copy(),
+            globals_rev = {key: list(fqns)
+                           for key, fqns in self.globals_rev.items()},
+            unique_FQN_counters = self.unique_FQN_counters.copy(),
+            modules = [(w_mod.name, w_mod.filepath, w_mod.fqns.copy())
+                       for w_mod in self.modules_w.values()],
+            bluecache = self.bluecache.copy(self),
+            globals_version = self.globals_version,
+            path = list(self.path),
+            ast_compile = self.ast_compile,
+            redshift_threshold = self.redshift_threshold,
+            parse_cache = self.parse_cache,
+            mem = mem,
+        )
+
+    def _all_cached_objects(self) -> Iterable[W_Object]:
+        yield from self.globals_w.values()
+        for entries in self.bluecache.data.values():
+            for args_w, w_result in entries:
+                yield from args_w
+                yield w_result
+
+    @classmethod
+    def from_snapshot(cls, snap: VMSnapshot) -> 'SPyVM':
+        """
+        Create a new VM whose state is a copy of the given snapshot
+        """
+        vm = cls.__new__(cls)
+        vm._ll = None
+        vm._ll_mem = snap.mem
+        vm.globals_w = snap.globals_w.copy()
+        vm.globals_rev = {key: list(fqns)
+                          for key, fqns in snap.globals_rev.items()}
+        vm.redshift_worklist = deque()
+        vm.redshift_timings = {}
+        vm.unique_FQN_counters = snap.unique_FQN_counters.copy()
+        vm.modules_w = {}
+        for name, filepath, fqns in snap.modules:
+            w_mod = W_Module(vm, name, filepath)
+            w_mod.fqns = fqns.copy()
+            vm.modules_w[name] = w_mod
+        vm.path = list(snap.path)
+        vm.bluecache = snap.bluecache.copy(vm)
+        vm.globals_version = snap.globals_version
+        vm.ast_compile = snap.ast_compile
+        vm.redshift_threshold = snap.redshift_threshold
+        vm.parse_cache = snap.parse_cache
+        return vm
+
+    def clone(self) -> 'SPyVM':
+        """
+        Shortcut for SPyVM.from_snapshot(self.snapshot())
+        """
+        return self.from_snapshot(self.snapshot())
+
     def import_(self, modname: str) -> W_Module:
         from spy.irgen.irgen import make_w_mod_from_file
         if modname in self.modules_w:
@@ -78,29 +224,57 @@ class SPyVM:
     def redshift(self) -> None:
         """
         Perform a redshift on all W_ASTFunc.
-        """
-        def should_redshift(w_func: W_ASTFunc) -> bool:
-            # we don't want to redshift @blue functions
-            return w_func.color != 'blue' and not w_func.redshifted
-
-        def get_funcs() -> Iterable[tuple[FQN, W_ASTFunc]]:
-            for fqn, w_func in self.globals_w.items():
-                if isinstance(w_func, W_ASTFunc) and should_redshift(w_func):
-                    yield fqn, w_func
 
-        while True:
-            funcs = list(get_funcs())
-            if not funcs:
-                break
-            self._redshift_some(funcs)
+        The red functions are enqueued in redshift_worklist by _set_global
+        as soon as they are added to the globals, so this includes the
+        functions which are created by the redshift itself (e.g. closures
+        returned by blue functions).
+        """
+        worklist = self.redshift_worklist
+        while worklist:
+            fqn, w_func = worklist.popleft()
+            if self.globals_w.get(fqn) is not w_func:
+                # it has been replaced in the meantime, e.g. by tier-up
+                continue
+            self._redshift_one(fqn, w_func)
+
+    def redshift_reachable(self, roots: Iterable[FQN]) -> set[FQN]:
+        """
+        Like redshift(), but only for the functions which are reachable from
+        the given roots, following the references of the redshifted code
+        (see doppler.get_references).
 
-    def _redshift_some(self, funcs: list[tuple[FQN, W_ASTFunc]]) -> None:
-        for fqn, w_func in funcs:
-            assert w_func.color != 'blue'
-            assert not w_func.redshifted
-            w_newfunc = redshift(self, w_func)
-            assert w_newfunc.redshifted
-            self.globals_w[fqn] = w_newfunc
+        Return the FQNs of all the reachable globals.
+        """
+        reachable = set()
+        todo = list(roots)
+        while todo:
+            fqn = todo.pop()
+            if fqn in reachable:
+                continue
+            reachable.add(fqn)
+            w_obj = self.lookup_global(fqn)
+            if not isinstance(w_obj, W_ASTFunc) or w_obj.color == 'blue':
+                continue
+            if not w_obj.redshifted:
+                w_obj = self._redshift_one(fqn, w_obj)
+            todo.extend(get_references(w_obj))
+        # remove the functions which we redshifted from the worklist, so
+        # that only the unreachable ones are left for a later redshift()
+        self.redshift_worklist = deque(
+            (fqn, w_func) for fqn, w_func in self.redshift_worklist
+            if self.globals_w.get(fqn) is w_func
+        )
+        return reachable
+
+    def _redshift_one(self, fqn: FQN, w_func: W_ASTFunc) -> W_ASTFunc:
+        a = time.perf_counter()
+        w_newfunc = redshift(self, w_func)
+        b = time.perf_counter()
+        assert w_newfunc.redshifted
+        self.redshift_timings[fqn] = b - a
+        self._set_global(fqn, w_newfunc)
+        return w_newfunc
 
     def register_module(self, w_mod: W_Module) -> None:
         assert w_mod.name not in self.modules_w
@@ -115,23 +289,53 @@ class SPyVM:
     def get_unique_FQN(self, fqn: FQN) -> FQN:
         """
         Get an unique variant of the given FQN, adding a suffix if necessary.
+
+        Suffixes are never reused: we remember the next one to try for each
+        base FQN, and skip the ones which are already in the globals (e.g.
+        because they were loaded from a .spyc).
         """
-        # XXX this is potentially quadratic if we create tons of
-        # conflicting FQNs, but for now we don't care
-        for n in itertools.count():
-            fqn2 = fqn.with_suffix(str(n))
+        base = fqn.with_suffix('')
+        n = self.unique_FQN_counters.get(base, 0)
+        while True:
+            fqn2 = base.with_suffix(str(n))
+            n += 1
             if fqn2 not in self.globals_w:
-                return fqn2
-        assert False, 'unreachable'
+                break
+        self.unique_FQN_counters[base] = n
+        return fqn2
 
     def add_global(self, fqn: FQN, w_value: W_Object) -> None:
         assert fqn.modname in self.modules_w
         w_existing = self.globals_w.get(fqn)
         if w_existing is None:
-            self.globals_w[fqn] = w_value
+            self._set_global(fqn, w_value)
         else:
             raise ValueError(f"'{fqn}' already exists")
 
+    def _set_global(self, fqn: FQN, w_value: W_Object) -> None:
+        """
+        Low-level: update globals_w, globals_rev, W_Module.fqns and
+        redshift_worklist, without any check.
+        """
+        w_old = self.globals_w.get(fqn)
+        if w_old is w_value:
+            return
+        if w_old is not None:
+            fqns = self.globals_rev.get(id(w_old), [])
+            if fqn in fqns:
+                fqns.remove(fqn)
+            if not fqns:
+                self.globals_rev.pop(id(w_old), None)
+        else:
+            w_mod = self.modules_w.get(fqn.modname)
+            if w_mod is not None:
+                w_mod.fqns[fqn] = None
+        self.globals_w[fqn] = w_value
+        self.globals_rev.setdefault(id(w_value), []).append(fqn)
+        if (isinstance(w_value, W_ASTFunc) and w_value.color != 'blue' and
+            not w_value.redshifted):
+            self.redshift_worklist.append((fqn, w_value))
+
     def lookup_global(self, fqn: FQN) -> Optional[W_Object]:
         if fqn.is_module():
             return self.modules_w.get(fqn.modname)
@@ -139,11 +343,16 @@ class SPyVM:
             return self.globals_w.get(fqn)
 
     def reverse_lookup_global(self, w_val: W_Object) -> Optional[FQN]:
-        # XXX we should maintain a reverse-lookup table instead of doing a
-        # linear search
-        for fqn, w_obj in self.globals_w.items():
-            if w_val == w_obj:
+        for fqn in self.globals_rev.get(id(w_val), ()):
+            # entries might be stale if someone wrote to globals_w directly
+            if self.globals_w.get(fqn) is w_val:
                 return fqn
+        # types are compared by value (e.g. W_FuncType): an equal type is
+        # always stored under the same FQN
+        if isinstance(w_val, W_Type):
+            w_obj = self.globals_w.get(w_val.fqn)
+            if w_obj is not None and w_obj == w_val:
+                return w_val.fqn
         return None
 
     def make_fqn_const(self, w_val: W_Object) -> FQN:
@@ -176,14 +385,17 @@ class SPyVM:
             fqn = w_val.fqn
             assert w_val.fqn not in self.globals_w
         else:
-            assert False, 'implement me'
+            raise NotImplementedError('implement me')
 
         assert fqn is not None
         self.add_global(fqn, w_val)
         return fqn
 
     def store_global(self, fqn: FQN, w_value: W_Object) -> None:
-        self.globals_w[fqn] = w_value
+        w_old = self.globals_w.get(fqn)
+        if w_old is not w_value and isinstance(w_old, (W_Type, W_Func)):
+            self.globals_version += 1
+        self._set_global(fqn, w_value)
 
     def dynamic_type(self, w_obj: W_Object) -> W_Type:
         assert isinstance(w_obj, W_Object)
@@ -194,12 +406,7 @@ class SPyVM:
         assert isinstance(w_sub, W_Type)
         if w_super is B.w_dynamic:
             return True
-        w_class = w_sub
-        while w_class is not B.w_None:
-            if w_class is w_super:
-                return True
-            w_class = w_class.w_base  # type:ignore
-        return False
+        return w_sub.has_ancestor(w_super)
 
     def union_type(self, w_t1: W_Type, w_t2: W_Type) -> W_Type:
         """
@@ -209,14 +416,11 @@ class SPyVM:
             return w_t2
         if self.issubclass(w_t2, w_t1):
             return w_t1
-        #
-        # w_base is either a type or B.w_None. Ideally, we would like to write:
-        #     assert w_t1.w_base is not B.w_None
-        # but in that case mypy cannot deduct that w_base IS actually a type.
-        # The workaround is to check with isinstance
-        assert isinstance(w_t1.w_base, W_Type)
-        assert isinstance(w_t2.w_base, W_Type)
-        return self.union_type(w_t1.w_base, w_t2.w_base)
+        # the first base of w_t1 which is also a base of w_t2
+        for w_base in w_t1.mro_w:
+            if w_t2.has_ancestor(w_base):
+                return w_base
+        assert False, f'{w_t1} and {w_t2} have no common base'
 
     def isinstance(self, w_obj: W_Object, w_type: W_Type) -> bool:
         w_t1 = self.dynamic_type(w_obj)
@@ -253,8 +457,10 @@ class SPyVM:
             return value
         elif value is None:
             return B.w_None
-        elif T in (int, fixedint.Int32):
-            return W_I32(value)
+        elif T is int:
+            return W_I32.make(value)
+        elif T is fixedint.Int32:
+            return W_I32.make(int(value))
         elif T is float:
             return W_F64(value)
         elif T is bool:
@@ -354,20 +560,27 @@ class SPyVM:
         #      name blue
         #
         #   3. everything else becomes red
-        OP = OPERATOR
-        new_args_wop = [wop.as_red(self) for wop in args_wop]
-
-        if w_OP in (OP.w_CALL, OP.w_CALL_METHOD, OP.w_GETATTR,
-                    OP.w_GETITEM, OP.w_SETATTR, OP.w_SETITEM):
-            new_args_wop[0] = args_wop[0]
-        if w_OP in (OP.w_GETATTR, OP.w_SETATTR, OP.w_CALL_METHOD):
-            new_args_wop[1] = args_wop[1]
+        n_blue = self.OP_n_blue_args(w_OP)
+        new_args_wop = [wop.as_red(self) for wop in args_wop[n_blue:]]
+        new_args_wop = list(args_wop[:n_blue]) + new_args_wop
         # </TEMPORARY HACK>
 
         w_func = self.fast_call(w_OP, new_args_wop)
         assert isinstance(w_func, W_Func)
         return w_func
 
+    def OP_n_blue_args(self, w_OP: W_Func) -> int:
+        """
+        Return how many of the leading arguments of w_OP are kept blue by
+        call_OP, see the <TEMPORARY HACK> there.
+        """
+        OP = OPERATOR
+        if w_OP in (OP.w_GETATTR, OP.w_SETATTR, OP.w_CALL_METHOD):
+            return 2
+        if w_OP in (OP.w_CALL, OP.w_GETITEM, OP.w_SETITEM):
+            return 1
+        return 0
+
     def call_generic(self, w_func: W_Func,
                      generic_args_w: list[W_Object],
                      args_w: list[W_Object]) -> W_Object:
@@ -397,7 +610,8 @@ class SPyVM:
         return w_func.raw_call(self, args_w)
 
     def _w_oparg(self, w_x: W_Dynamic) -> W_OpArg:
-        return W_OpArg(self, 'red', self.dynamic_type(w_x), None, Loc.here(-3))
+        return W_OpArg(self, 'red', self.dynamic_type(w_x), None,
+                       LazyLoc.here(-3))
 
     def eq(self, w_a: W_Dynamic, w_b: W_Dynamic) -> W_Bool:
         wop_a = self._w_oparg(w_a)